@@ -0,0 +1,62 @@
+# bench_currency.py
+"""
+Compare le nettoyage des revenus cellule par cellule (clean_revenue)
+avec le parsing vectorisé (parse_revenue_series).
+
+Usage: python -m api.benchmarks.bench_currency --rows 500000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from api.processors.currency import parse_revenue_series
+from api.processors.data_processor import DataProcessor
+
+
+def make_revenue_column(rows: int, seed: int = 0) -> pd.Series:
+    """Colonne de revenus réaliste : nombres, montants formatés et quelques cellules vides."""
+    rng = np.random.default_rng(seed)
+    amounts = np.round(rng.lognormal(3.5, 1.0, rows), 2)
+    formats = rng.integers(0, 4, rows)
+    cells = np.empty(rows, dtype=object)
+    cells[formats == 0] = amounts[formats == 0]
+    cells[formats == 1] = [f"€{a:,.2f}" for a in amounts[formats == 1]]
+    cells[formats == 2] = [f"{a:.2f}" for a in amounts[formats == 2]]
+    cells[formats == 3] = [f"$ {a:,.2f}" for a in amounts[formats == 3]]
+    cells[rng.random(rows) < 0.01] = ''
+    return pd.Series(cells, dtype=object)
+
+
+def run(rows: int, currency: str = 'USD') -> dict:
+    column = make_revenue_column(rows)
+    processor = DataProcessor()
+
+    start = time.perf_counter()
+    legacy = column.apply(processor.clean_revenue)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    values, invalid = parse_revenue_series(column, currency)
+    vectorized_seconds = time.perf_counter() - start
+
+    mismatches = int((~np.isclose(legacy.values, values.fillna(0.0).values)).sum())
+    return {
+        'rows': rows,
+        'legacy_seconds': round(legacy_seconds, 4),
+        'vectorized_seconds': round(vectorized_seconds, 4),
+        'speedup': round(legacy_seconds / vectorized_seconds, 2) if vectorized_seconds > 0 else None,
+        'invalid_cells': int(invalid.sum()),
+        'mismatches': mismatches
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 500_000])
+    parser.add_argument('--currency', default='USD')
+    args = parser.parse_args()
+    for rows in args.rows:
+        print(run(rows, args.currency))
@@ -0,0 +1,73 @@
+# bench_rate_tests.py
+"""
+Compare le test exact de Fisher (tableau par tableau) avec le chi-deux
+vectorisé de RateTestEngine, pour situer le seuil RATE_TEST_EXACT_MAX_TOTAL :
+temps de calcul et écart de p-value (et de confiance affichée) selon l'effectif.
+
+Usage: python -m api.benchmarks.bench_rate_tests --users 1000 10000 1000000 --tables 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+import scipy.stats as stats
+
+from api.processors.rate_tests import chi_square_yates
+
+
+def make_tables(users: int, tables: int, imbalance: float = 0.0, seed: int = 0) -> tuple:
+    """
+    Tableaux 2x2 réalistes : taux de conversion de 1 à 10 %, uplift de -10 à +10 %,
+    et des bras dont la taille s'écarte du contrôle d'au plus imbalance (ex: 0.2 = ±20 %).
+    """
+    rng = np.random.default_rng(seed)
+    base_rate = rng.uniform(0.01, 0.10, tables)
+    var_rate = np.clip(base_rate * rng.uniform(0.9, 1.1, tables), 0, 1)
+    var_users = np.round(users * rng.uniform(1 - imbalance, 1 + imbalance, tables)).astype(np.int64)
+    var_success = rng.binomial(var_users, var_rate).astype(np.float64)
+    ctrl_success = rng.binomial(users, base_rate).astype(np.float64)
+    return var_success, var_users.astype(np.float64), ctrl_success, np.full(tables, float(users))
+
+
+def run(users: int, tables: int = 200, imbalance: float = 0.0) -> dict:
+    var_success, var_total, ctrl_success, ctrl_total = make_tables(users, tables, imbalance)
+
+    start = time.perf_counter()
+    exact = np.array([
+        stats.fisher_exact([
+            [int(a), int(n1 - a)],
+            [int(c), int(n2 - c)]
+        ])[1]
+        for a, n1, c, n2 in zip(var_success, var_total, ctrl_success, ctrl_total)
+    ])
+    exact_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    asymptotic = chi_square_yates(var_success, var_total - var_success, ctrl_success, ctrl_total - ctrl_success)
+    asymptotic_seconds = time.perf_counter() - start
+
+    gap = np.abs(exact - asymptotic)
+    # Écart sur la confiance affichée (en points de pourcentage, arrondie à 2 décimales)
+    shown_gap = np.abs(np.round((1 - exact) * 100, 2) - np.round((1 - asymptotic) * 100, 2))
+    return {
+        'users_per_arm': users,
+        'tables': tables,
+        'imbalance': imbalance,
+        'fisher_seconds': round(exact_seconds, 4),
+        'chi2_seconds': round(asymptotic_seconds, 4),
+        'speedup': round(exact_seconds / asymptotic_seconds, 1) if asymptotic_seconds > 0 else None,
+        'max_p_value_gap': float(gap.max()),
+        'max_confidence_gap': float(shown_gap.max())
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, nargs='+', default=[100, 1_000, 5_000, 10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--tables', type=int, default=200)
+    parser.add_argument('--imbalance', type=float, nargs='+', default=[0.0, 0.2])
+    args = parser.parse_args()
+    for imbalance in args.imbalance:
+        for users in args.users:
+            print(run(users, args.tables, imbalance))
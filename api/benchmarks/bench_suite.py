@@ -0,0 +1,417 @@
+# bench_suite.py
+"""
+Suite de micro-benchmarks : méthodes publiques de DataProcessor et endpoints
+d'analyse, sur des charges synthétiques reproductibles (workload.py) de
+plusieurs tailles.
+
+Chaque cas est exécuté une fois à blanc puis --repeats fois ; les résultats
+(médiane, minimum, moyenne, écart-type) sont écrits en JSON. Avec --baseline,
+la médiane de chaque cas est comparée à celle de la référence et le code de
+sortie vaut 1 si un cas ralentit de plus de --threshold (en relatif) et de plus
+de --min-delta secondes (bruit des cas très courts).
+
+Les endpoints sont appelés en mémoire (TestClient, sans réseau) avec le cache
+de résultats désactivé, sans quoi seule la première répétition calcule.
+
+Usage:
+    python -m api.benchmarks.bench_suite --sizes small medium --output bench.json
+    python -m api.benchmarks.bench_suite --sizes small medium --baseline bench.json --threshold 0.2
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from api.benchmarks.workload import WORKLOAD_SIZES, make_frames
+from api.processors.analysis_context import detect_control
+from api.processors.data_processor import DataProcessor
+
+RESULTS_FORMAT_VERSION = 1
+
+SUITES = ('processor', 'endpoint')
+
+# Utilisateurs par commande dans les charges générées (taux de conversion ~5 %)
+USERS_PER_TRANSACTION = 20
+
+
+class BenchmarkCase(NamedTuple):
+    """Cas mesuré : run(fixture) est chronométré, cleanup(fixture, valeur) ne l'est pas."""
+    name: str
+    run: Callable[[Dict[str, Any]], Any]
+    cleanup: Optional[Callable[[Dict[str, Any], Any], None]] = None
+
+
+class BenchmarkError(RuntimeError):
+    """Un cas a échoué : sa durée ne serait pas comparable."""
+
+
+def _succeeded(name: str, result: Any) -> Any:
+    if isinstance(result, dict) and result.get('success') is False:
+        raise BenchmarkError(f"{name}: {result.get('error')}")
+    return result
+
+
+def _session_data(fixture: Dict[str, Any]) -> Dict[str, Any]:
+    return {'raw_data': {'overall': fixture['overall_df'], 'transaction': fixture['transaction_df']}}
+
+
+def _shards(overall_df: pd.DataFrame, transaction_df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Deux tranches qui partitionnent les transactions et les effectifs overall."""
+    ids = transaction_df['transaction_id'].astype(str)
+    first = ids < ids.iloc[len(ids) // 2]
+    half = overall_df.copy()
+    half[['users', 'user_add_to_carts']] = overall_df[['users', 'user_add_to_carts']] // 2
+    rest = overall_df.copy()
+    rest[['users', 'user_add_to_carts']] = overall_df[['users', 'user_add_to_carts']] - half[['users', 'user_add_to_carts']]
+    return [
+        {'raw_data': {'overall': half, 'transaction': transaction_df[first]}},
+        {'raw_data': {'overall': rest, 'transaction': transaction_df[~first]}}
+    ]
+
+
+def make_fixture(transactions: int, arms: Sequence[str], seed: int) -> Dict[str, Any]:
+    """Charge générée, données nettoyées (comme une session) et états intermédiaires des cas."""
+    overall, transaction = make_frames(
+        arms=arms,
+        users=max(transactions * USERS_PER_TRANSACTION // len(arms), 1000),
+        transactions=transactions,
+        seed=seed
+    )
+    processor = DataProcessor()
+    workload = {'overall_data': overall.to_dict('records'), 'transaction_data': transaction.to_dict('records')}
+    _, overall_df, transaction_df = processor.process_data_with_frames(
+        workload['overall_data'], workload['transaction_data'], include_raw_data=False
+    )
+    fixture = {
+        'processor': processor,
+        'workload': workload,
+        'rows': len(transaction),
+        'overall_df': overall_df,
+        'transaction_df': transaction_df,
+        'raw_transaction_df': transaction
+    }
+    data = _session_data(fixture)
+    fixture['virtual_table'] = processor.build_virtual_table(data)
+    fixture['states'] = processor.stream_bootstrap_states([fixture['virtual_table']])
+    fixture['control'] = detect_control(overall_df)
+    fixture['users_by_variation'] = dict(zip(overall_df['variation'].astype(str), overall_df['users'].astype(float)))
+    fixture['summaries'] = [
+        _succeeded('summarize_shard', processor.summarize_shard(shard))['summary']
+        for shard in _shards(overall_df, transaction_df)
+    ]
+    return fixture
+
+
+def _processor_case(name: str, call: Callable[[DataProcessor, Dict[str, Any]], Any]) -> BenchmarkCase:
+    return BenchmarkCase(name, lambda fixture: _succeeded(name, call(fixture['processor'], fixture)))
+
+
+PROCESSOR_CASES = [
+    _processor_case('process_data', lambda p, f: p.process_data(
+        f['workload']['overall_data'], f['workload']['transaction_data'], include_raw_data=False
+    )),
+    _processor_case('clean_dataframe', lambda p, f: p.clean_dataframe(f['raw_transaction_df'].copy())),
+    _processor_case('validate_transaction_data', lambda p, f: p.validate_transaction_data(f['workload']['transaction_data'])),
+    _processor_case('aggregate_transactions', lambda p, f: p.aggregate_transactions(f['workload']['transaction_data'])),
+    _processor_case('build_segment_index', lambda p, f: p.build_segment_index(f['transaction_df'])),
+    _processor_case('apply_filters', lambda p, f: p.apply_filters(f['transaction_df'], {'device_category': ['mobile']})),
+    _processor_case('create_analysis_table', lambda p, f: p.create_analysis_table(_session_data(f))),
+    _processor_case('calculate_overview_metrics', lambda p, f: p.calculate_overview_metrics(_session_data(f))),
+    _processor_case('calculate_revenue_metrics', lambda p, f: p.calculate_revenue_metrics(_session_data(f))),
+    _processor_case('compare_variations', lambda p, f: p.compare_variations(_session_data(f))),
+    _processor_case('calculate_segment_cube', lambda p, f: p.calculate_segment_cube(_session_data(f))),
+    _processor_case('calculate_revenue_distribution', lambda p, f: p.calculate_revenue_distribution(_session_data(f))),
+    _processor_case('run_pipeline', lambda p, f: p.run_pipeline(_session_data(f))),
+    _processor_case('append_test_batch', lambda p, f: p.append_test_batch(None, 'benchmark', _session_data(f))),
+    _processor_case('summarize_shard', lambda p, f: p.summarize_shard(_session_data(f))),
+    _processor_case('merge_shard_summaries', lambda p, f: p.merge_shard_summaries({'summaries': f['summaries']})),
+    _processor_case('stream_bootstrap_states', lambda p, f: p.stream_bootstrap_states([f['virtual_table']])),
+    _processor_case('calculate_streaming_intervals', lambda p, f: p.calculate_streaming_intervals(
+        f['states'], f['users_by_variation'], f['control']
+    ))
+]
+
+
+def _request(method: str, path: Callable[[Dict[str, Any]], str], body: Optional[Callable[[Dict[str, Any]], Any]] = None):
+    def run(fixture: Dict[str, Any]):
+        response = fixture['client'].request(
+            method, path(fixture), json=body(fixture) if body is not None else None
+        )
+        if response.status_code != 200:
+            raise BenchmarkError(f"{method} {path(fixture)}: {response.status_code} {response.text[:200]}")
+        return response
+    return run
+
+
+def _session_body(fixture: Dict[str, Any]) -> Dict[str, Any]:
+    return {'session_id': fixture['session_id']}
+
+
+def _analyze_body(fixture: Dict[str, Any]) -> Dict[str, Any]:
+    return {**fixture['workload'], 'currency': 'EUR', 'include_raw_data': False}
+
+
+def _delete_session(fixture: Dict[str, Any], response: Any) -> None:
+    fixture['client'].delete(f"/sessions/{response.json()['session_id']}")
+
+
+def _session_endpoint(path: str) -> BenchmarkCase:
+    return BenchmarkCase(f"POST {path}", _request('POST', lambda f: path, _session_body))
+
+
+ENDPOINT_CASES = [
+    BenchmarkCase('POST /analyze', _request('POST', lambda f: '/analyze', _analyze_body), _delete_session),
+    BenchmarkCase('POST /validate-data', _request('POST', lambda f: '/validate-data', lambda f: f['workload']['transaction_data'])),
+    BenchmarkCase('POST /aggregate-transactions', _request(
+        'POST', lambda f: '/aggregate-transactions', lambda f: f['workload']['transaction_data']
+    )),
+    BenchmarkCase('POST /sessions/{id}/aggregate-transactions', _request(
+        'POST', lambda f: f"/sessions/{f['session_id']}/aggregate-transactions"
+    )),
+    BenchmarkCase('GET /sessions/{id}/virtual-table', _request(
+        'GET', lambda f: f"/sessions/{f['session_id']}/virtual-table?limit=1000&sort_by=revenue&descending=true"
+    )),
+    _session_endpoint('/create-analysis'),
+    _session_endpoint('/calculate-overview'),
+    _session_endpoint('/calculate-revenue'),
+    _session_endpoint('/compare-variations'),
+    _session_endpoint('/calculate-segments'),
+    _session_endpoint('/revenue-distribution'),
+    _session_endpoint('/analysis-pipeline'),
+    _session_endpoint('/summaries/shard'),
+    # Sans session : la table virtuelle est reconstruite à chaque appel
+    BenchmarkCase('POST /calculate-revenue (raw_data)', _request('POST', lambda f: '/calculate-revenue', lambda f: {
+        'raw_data': {'overall': f['workload']['overall_data'], 'transaction': f['workload']['transaction_data']}
+    }))
+]
+
+
+def time_case(case: BenchmarkCase, fixture: Dict[str, Any], repeats: int, warmup: int = 1) -> Dict[str, Any]:
+    """Exécute un cas warmup + repeats fois et retourne les statistiques de durée (secondes)."""
+    samples = []
+    for iteration in range(warmup + repeats):
+        gc.collect()
+        start = time.perf_counter()
+        value = case.run(fixture)
+        elapsed = time.perf_counter() - start
+        if case.cleanup is not None:
+            case.cleanup(fixture, value)
+        del value
+        if iteration >= warmup:
+            samples.append(elapsed)
+    return {
+        'repeats': repeats,
+        'median_seconds': statistics.median(samples),
+        'min_seconds': min(samples),
+        'mean_seconds': statistics.fmean(samples),
+        'stdev_seconds': statistics.stdev(samples) if len(samples) > 1 else 0.0
+    }
+
+
+def _parse_size(value: str) -> int:
+    if value in WORKLOAD_SIZES:
+        return WORKLOAD_SIZES[value]
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Unknown size {value!r} (use {', '.join(WORKLOAD_SIZES)} or a number of transactions)")
+
+
+def _size_name(transactions: int) -> str:
+    names = {count: name for name, count in WORKLOAD_SIZES.items()}
+    return names.get(transactions, str(transactions))
+
+
+def _environment() -> Dict[str, Any]:
+    from api.services.executor import EXECUTOR_KIND, MAX_WORKERS
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'executor': EXECUTOR_KIND,
+        'workers': MAX_WORKERS
+    }
+
+
+def run_suite(
+    sizes: Sequence[int],
+    suites: Sequence[str] = SUITES,
+    cases: Optional[Sequence[str]] = None,
+    repeats: int = 5,
+    warmup: int = 1,
+    arms: Sequence[str] = ('Control', 'B'),
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Mesure les cas demandés à chaque taille.
+
+    Args:
+        sizes: Nombres de transactions des charges générées
+        suites: 'processor' et/ou 'endpoint'
+        cases: Sous-chaînes de noms de cas à garder (tous par défaut)
+        repeats: Répétitions mesurées par cas
+        warmup: Exécutions à blanc par cas
+        arms: Variations des charges générées
+        seed: Graine du générateur
+
+    Returns:
+        Dict[str, Any]: Résultats (format RESULTS_FORMAT_VERSION)
+    """
+    selected = {
+        'processor': PROCESSOR_CASES if 'processor' in suites else [],
+        'endpoint': ENDPOINT_CASES if 'endpoint' in suites else []
+    }
+    if cases:
+        selected = {suite: [case for case in entries if any(part in case.name for part in cases)] for suite, entries in selected.items()}
+
+    client = None
+    if selected['endpoint']:
+        # Avant l'import de api.main : le cache est dimensionné à l'import
+        os.environ.setdefault('RESULT_CACHE_MAX_MB', '0')
+        from fastapi.testclient import TestClient
+        from api.main import app
+        client = TestClient(app)
+        client.__enter__()
+
+    results = []
+    try:
+        for transactions in sizes:
+            fixture = make_fixture(transactions, arms, seed)
+            if client is not None:
+                fixture['client'] = client
+                fixture['session_id'] = _request('POST', lambda f: '/analyze', _analyze_body)(fixture).json()['session_id']
+
+            for suite, entries in selected.items():
+                for case in entries:
+                    timing = time_case(case, fixture, repeats, warmup)
+                    entry = {
+                        'key': f"{suite}:{case.name}:{transactions}",
+                        'suite': suite,
+                        'name': case.name,
+                        'size': _size_name(transactions),
+                        'transactions': transactions,
+                        'rows': fixture['rows'],
+                        **timing
+                    }
+                    results.append(entry)
+                    print(f"{suite:<9} {case.name:<45} {entry['size']:>8} {timing['median_seconds'] * 1000:>10.2f} ms", file=sys.stderr)
+
+            if client is not None:
+                client.delete(f"/sessions/{fixture['session_id']}")
+    finally:
+        if client is not None:
+            client.__exit__(None, None, None)
+
+    return {
+        'format_version': RESULTS_FORMAT_VERSION,
+        'created_at': time.time(),
+        'seed': seed,
+        'arms': list(arms),
+        'environment': _environment(),
+        'results': results
+    }
+
+
+def compare_results(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = 0.2,
+    min_delta: float = 0.005
+) -> List[Dict[str, Any]]:
+    """
+    Compare les médianes aux résultats de référence (cas présents des deux côtés).
+
+    Un cas est en régression si sa médiane dépasse celle de la référence de plus
+    de threshold (relatif) et de plus de min_delta secondes, en amélioration dans
+    le cas symétrique.
+    """
+    if baseline.get('format_version') != RESULTS_FORMAT_VERSION:
+        raise ValueError(f"Unsupported baseline format version: {baseline.get('format_version')}")
+
+    reference = {entry['key']: entry for entry in baseline['results']}
+    comparison = []
+    for entry in results['results']:
+        base = reference.get(entry['key'])
+        if base is None:
+            continue
+        current, previous = entry['median_seconds'], base['median_seconds']
+        ratio = current / previous if previous > 0 else float('inf')
+        status = 'ok'
+        if ratio > 1 + threshold and current - previous > min_delta:
+            status = 'regression'
+        elif ratio < 1 / (1 + threshold) and previous - current > min_delta:
+            status = 'improvement'
+        comparison.append({
+            'key': entry['key'],
+            'baseline_seconds': previous,
+            'current_seconds': current,
+            'ratio': round(ratio, 4),
+            'status': status
+        })
+    return comparison
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=_parse_size, nargs='+', default=[WORKLOAD_SIZES['small'], WORKLOAD_SIZES['medium']],
+                        help=f"{', '.join(WORKLOAD_SIZES)} ou un nombre de transactions")
+    parser.add_argument('--suites', nargs='+', choices=SUITES, default=list(SUITES))
+    parser.add_argument('--cases', nargs='+', help="Sous-chaînes des noms de cas à exécuter")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--arms', nargs='+', default=['Control', 'B'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Fichier JSON des résultats (sortie standard par défaut)")
+    parser.add_argument('--baseline', help="Résultats de référence (JSON produit par --output)")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Ralentissement relatif toléré (0.2 = +20 %%)")
+    parser.add_argument('--min-delta', type=float, default=0.005, help="Écart absolu minimal (secondes) d'une régression")
+    args = parser.parse_args(argv)
+    if args.repeats < 1:
+        parser.error("--repeats must be >= 1")
+
+    # Les journaux INFO des calculs fausseraient les durées et noieraient la sortie
+    logging.disable(logging.INFO)
+
+    results = run_suite(args.sizes, args.suites, args.cases, args.repeats, args.warmup, args.arms, args.seed)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        results['comparison'] = compare_results(results, baseline, args.threshold, args.min_delta)
+        results['threshold'] = args.threshold
+        regressions = [entry for entry in results['comparison'] if entry['status'] == 'regression']
+        for entry in results['comparison']:
+            if entry['status'] != 'ok':
+                print(
+                    f"{entry['status']:<11} {entry['key']}: {entry['baseline_seconds'] * 1000:.2f} ms -> "
+                    f"{entry['current_seconds'] * 1000:.2f} ms (x{entry['ratio']})",
+                    file=sys.stderr
+                )
+        if baseline.get('environment') != results['environment']:
+            print("warning: baseline was recorded in a different environment", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# workload.py
+"""
+Générateur de charges synthétiques reproductibles (graine fixe) : données
+overall et transactions (une ligne par article) au format de /analyze.
+
+Les paniers comptent un nombre variable d'articles, la popularité des produits
+suit une loi de Zipf et les revenus ont une queue lourde (log-normale plus
+quelques commandes de type Pareto), comme les exports GA réels.
+
+Usage: python -m api.benchmarks.workload --transactions 10000 --arms Control B C > workload.json
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEVICE_CATEGORIES = ('mobile', 'desktop', 'tablet')
+DEVICE_WEIGHTS = (0.6, 0.35, 0.05)
+
+ITEM_CATEGORIES = ('Beds', 'Sofas', 'Mattresses', 'Pillows', 'Tables', 'Lighting')
+
+# Taille des tests (transactions) utilisée par défaut par les benchmarks
+WORKLOAD_SIZES = {
+    'small': 1_000,
+    'medium': 10_000,
+    'large': 100_000
+}
+
+
+def make_catalog(products: int, revenue_sigma: float, rng: np.random.Generator) -> pd.DataFrame:
+    """Catalogue : nom, catégorie, prix unitaire (log-normal) et popularité (Zipf)."""
+    popularity = 1.0 / np.arange(1, products + 1) ** 1.1
+    return pd.DataFrame({
+        'item_name': [f"Product {i:04d}" for i in range(products)],
+        'item_category2': np.asarray(ITEM_CATEGORIES, dtype=object)[rng.integers(0, len(ITEM_CATEGORIES), products)],
+        'price': np.round(rng.lognormal(3.5, revenue_sigma, products), 2),
+        'popularity': popularity / popularity.sum()
+    })
+
+
+def draw_order_items(row_order: np.ndarray, popularity: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Produit de chaque ligne, tiré selon la popularité, distinct au sein d'une commande.
+
+    Les lignes qui répètent un produit déjà présent dans leur commande sont
+    retirées jusqu'à ce qu'il n'y ait plus de doublon (chaque commande doit
+    compter au plus len(popularity) lignes).
+    """
+    products = len(popularity)
+    product = rng.choice(products, len(row_order), p=popularity)
+    while True:
+        _, first = np.unique(row_order * products + product, return_index=True)
+        duplicate = np.ones(len(product), dtype=bool)
+        duplicate[first] = False
+        if not duplicate.any():
+            return product
+        product[duplicate] = rng.choice(products, int(duplicate.sum()), p=popularity)
+
+
+def make_frames(
+    arms: Sequence[str] = ('Control', 'B'),
+    users: int = 50_000,
+    transactions: int = 5_000,
+    items_per_order: float = 2.0,
+    revenue_sigma: float = 1.0,
+    tail_share: float = 0.01,
+    lift: float = 0.02,
+    add_to_cart_rate: float = 0.08,
+    products: int = 200,
+    seed: int = 0
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Génère les tables overall et transaction d'un test.
+
+    Args:
+        arms: Variations (la première est le contrôle)
+        users: Utilisateurs par variation (à ±2 % près)
+        transactions: Nombre total de commandes, tous bras confondus
+        items_per_order: Nombre moyen d'articles distincts par commande (>= 1)
+        revenue_sigma: Dispersion (log) des prix du catalogue
+        tail_share: Part des lignes dont le montant suit une queue de Pareto
+        lift: Effet relatif de chaque variation sur la conversion et les prix
+        add_to_cart_rate: Taux d'ajout au panier du contrôle
+        products: Taille du catalogue
+        seed: Graine du générateur
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: (overall, transaction)
+    """
+    if not arms:
+        raise ValueError("At least one arm is required")
+    if items_per_order < 1:
+        raise ValueError(f"items_per_order must be >= 1: {items_per_order}")
+    if transactions > users * len(arms):
+        raise ValueError("More transactions than users")
+
+    rng = np.random.default_rng(seed)
+    catalog = make_catalog(products, revenue_sigma, rng)
+    effects = np.array([1.0] + [1.0 + lift] * (len(arms) - 1))
+
+    arm_users = np.round(users * rng.uniform(0.98, 1.02, len(arms))).astype(np.int64)
+    overall = pd.DataFrame({
+        'variation': list(arms),
+        'users': arm_users,
+        'user_add_to_carts': rng.binomial(arm_users, np.clip(add_to_cart_rate * effects, 0, 1))
+    })
+
+    # Commandes par bras, proportionnelles aux utilisateurs et à l'effet de conversion
+    weights = arm_users * effects
+    orders_per_arm = rng.multinomial(transactions, weights / weights.sum())
+    order_arm = np.repeat(np.arange(len(arms)), orders_per_arm)
+    order_device = rng.choice(len(DEVICE_CATEGORIES), transactions, p=DEVICE_WEIGHTS)
+
+    # Articles distincts par commande (au plus la taille du catalogue), puis une ligne par article
+    lines = np.minimum(1 + rng.poisson(items_per_order - 1, transactions), products)
+    row_order = np.repeat(np.arange(transactions), lines)
+    rows = len(row_order)
+    product = draw_order_items(row_order, catalog['popularity'].to_numpy(), rng)
+    quantity = rng.geometric(0.75, rows)
+
+    price = catalog['price'].to_numpy()[product] * effects[order_arm[row_order]]
+    tail = rng.random(rows) < tail_share
+    price[tail] *= 1 + rng.pareto(1.5, int(tail.sum()))
+
+    transaction = pd.DataFrame({
+        'transaction_id': [f"T{seed}-{order:08d}" for order in row_order],
+        'variation': np.asarray(arms, dtype=object)[order_arm[row_order]],
+        'device_category': np.asarray(DEVICE_CATEGORIES, dtype=object)[order_device[row_order]],
+        'item_category2': catalog['item_category2'].to_numpy()[product],
+        'item_name': catalog['item_name'].to_numpy()[product],
+        'quantity': quantity,
+        'revenue': np.round(price * quantity, 2)
+    })
+    return overall, transaction
+
+
+def make_workload(**kwargs: Any) -> Dict[str, List[Dict[str, Any]]]:
+    """Charge utile de /analyze (overall_data, transaction_data) ; mêmes paramètres que make_frames."""
+    overall, transaction = make_frames(**kwargs)
+    return {
+        'overall_data': overall.to_dict('records'),
+        'transaction_data': transaction.to_dict('records')
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--arms', nargs='+', default=['Control', 'B'])
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--transactions', type=int, default=5_000)
+    parser.add_argument('--items-per-order', type=float, default=2.0)
+    parser.add_argument('--revenue-sigma', type=float, default=1.0)
+    parser.add_argument('--tail-share', type=float, default=0.01)
+    parser.add_argument('--lift', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    json.dump(make_workload(
+        arms=args.arms,
+        users=args.users,
+        transactions=args.transactions,
+        items_per_order=args.items_per_order,
+        revenue_sigma=args.revenue_sigma,
+        tail_share=args.tail_share,
+        lift=args.lift,
+        seed=args.seed
+    ), sys.stdout)
@@ -1,14 +1,34 @@
 import sys
 import os
+import asyncio
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, File, Form, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import Dict, Any, List, Optional
 from api.processors.data_processor import DataProcessor
-from fastapi.responses import JSONResponse
+from api.services.executor import AnalysisExecutor, ExecutorSaturatedError, AnalysisTimeoutError, ExecutorUnavailableError
+from api.services.result_cache import ResultCache
+from api.services.session_store import SessionStore, AnalysisSession
+from api.services.incremental_store import IncrementalStore, InvalidTestIdError, validate_test_id
+from api.services.dataset_store import DatasetStore, DATASET_FRAMES
+from api.services.uploads import save_upload, remove_upload, temp_output_path, iter_file_blocks, UploadTooLargeError
+from api.services.arrow_transport import (
+    ARROW_STREAM_MEDIA_TYPE, ArrowUnavailableError, arrow_available, wants_arrow, is_arrow_body,
+    frame_to_arrow, arrow_to_frame, arrow_response
+)
+from api.services.table_pages import (
+    VIRTUAL_TABLE_PAGE_ROWS, VIRTUAL_TABLE_MAX_PAGE_ROWS, InvalidCursorError,
+    project_columns, page_bounds, next_cursor, iter_ndjson
+)
+from api.processors.file_loader import UnsupportedFormatError
+from api.processors.stage_timing import stage
+from api.services.request_metrics import RequestMetrics, StageTimingMiddleware, TimedRoute, PROMETHEUS_CONTENT_TYPE
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.encoders import jsonable_encoder
+import pandas as pd
 import logging
 import uvicorn
 
@@ -17,6 +37,28 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
+# Routes instrumentées : étapes parse et encode, label endpoint des métriques
+app.router.route_class = TimedRoute
+
+# Pool d'exécution des analyses : garde la boucle asyncio disponible (/health, etc.)
+executor = AnalysisExecutor()
+
+# Cache des résultats déjà calculés, indexé par le contenu de la requête
+result_cache = ResultCache()
+
+# Sessions d'analyse : les données nettoyées restent côté serveur après /analyze
+session_store = SessionStore()
+
+# États cumulés des tests en cours (mis à jour lot par lot), un verrou par test
+test_store = IncrementalStore()
+test_locks: Dict[str, asyncio.Lock] = {}
+
+# Jeux de données archivés des tests terminés, rouverts en mémoire projetée
+dataset_store = DatasetStore()
+dataset_locks: Dict[str, asyncio.Lock] = {}
+
+# Histogrammes des durées des requêtes et de leurs étapes (/metrics)
+request_metrics = RequestMetrics()
 
 origins = [
     "http://localhost:3000",  # URL de votre frontend local
@@ -32,6 +74,115 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Durées par étape de chaque requête (en-tête Server-Timing si SERVER_TIMING_HEADER=1)
+app.add_middleware(StageTimingMiddleware, metrics=request_metrics)
+
+@app.on_event("startup")
+async def open_stores():
+    test_store.prepare_root()
+    dataset_store.prepare_root()
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    executor.shutdown()
+
+async def run_analysis(method_name: str, *args: Any, **kwargs: Any) -> Any:
+    """Exécute une méthode de DataProcessor dans le pool, avec backpressure et timeout."""
+    try:
+        return await executor.run(method_name, *args, **kwargs)
+    except ExecutorSaturatedError as e:
+        logger.warning(f"Analysis rejected: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, too many analyses in progress",
+            headers={"Retry-After": "1"}
+        )
+    except ExecutorUnavailableError as e:
+        logger.error(f"Analysis executor unavailable: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Analysis workers restarted, please retry",
+            headers={"Retry-After": "1"}
+        )
+    except AnalysisTimeoutError as e:
+        logger.error(f"Analysis timeout: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
+
+def cached_response(cache_key: str, media_type: str = "application/json") -> Optional[Response]:
+    """Retourne la réponse en cache pour cette clé, s'il y en a une."""
+    body = result_cache.get(cache_key)
+    if body is None:
+        return None
+    return Response(content=body, media_type=media_type, headers={"X-Cache": "HIT"})
+
+def cache_json_response(cache_key: str, result: Dict[str, Any]) -> Response:
+    """Encode le résultat une seule fois, le met en cache et le renvoie."""
+    with stage('encode'):
+        body = JSONResponse(content=jsonable_encoder(result)).body
+    result_cache.put(cache_key, body)
+    return Response(content=body, media_type="application/json", headers={"X-Cache": "MISS"})
+
+def cache_arrow_response(cache_key: str, result: Dict[str, Any]) -> Response:
+    """Encode la table virtuelle en flux Arrow (métriques dans les métadonnées du schéma) et la met en cache."""
+    metadata = {key: value for key, value in result.items() if key != 'virtual_table'}
+    with stage('encode'):
+        body = frame_to_arrow(result['virtual_table'], metadata)
+    result_cache.put(cache_key, body)
+    return Response(content=body, media_type=ARROW_STREAM_MEDIA_TYPE, headers={"X-Cache": "MISS"})
+
+def negotiate_arrow(request: Request) -> bool:
+    """True si le client demande une réponse Arrow ; 406 si pyarrow n'est pas disponible."""
+    if not wants_arrow(request):
+        return False
+    if not arrow_available():
+        raise HTTPException(status_code=406, detail="Arrow responses are not available on this server")
+    return True
+
+async def read_records_body(request: Request):
+    """Lit un corps de requête tabulaire : flux Arrow IPC ou liste JSON d'objets."""
+    with stage('parse'):
+        if is_arrow_body(request):
+            try:
+                return arrow_to_frame(await request.body())
+            except ArrowUnavailableError as e:
+                raise HTTPException(status_code=415, detail=str(e))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        data = await request.json()
+    if not isinstance(data, list):
+        raise HTTPException(status_code=422, detail="Le corps de la requête doit être une liste d'objets")
+    return data
+
+def get_session_or_404(session_id: str) -> AnalysisSession:
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Session {session_id} not found or expired"
+        )
+    return session
+
+def resolve_session_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Remplace raw_data par les données de la session lorsque session_id est fourni."""
+    session_id = data.get('session_id')
+    if not session_id:
+        return data
+    session = get_session_or_404(session_id)
+    return {**data, 'raw_data': session.raw_data(), 'segment_index': session.segment_index}
+
+async def open_session(result: Dict[str, Any], overall_df, transaction_df) -> AnalysisSession:
+    """Conserve les données nettoyées (et l'index des filtres) pour les appels suivants."""
+    segment_index = None
+    if not transaction_df.empty:
+        segment_index = await run_analysis('build_segment_index', transaction_df)
+    try:
+        session = session_store.create(overall_df, transaction_df, segment_index)
+    except MemoryError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    result['session_id'] = session.session_id
+    result['session_ttl_seconds'] = session_store.ttl_seconds
+    return session
+
 class Filter(BaseModel):
     device_category: List[str] = Field(default_factory=list)
     item_category2: List[str] = Field(default_factory=list)
@@ -41,6 +192,7 @@ class AnalysisRequest(BaseModel):
     transaction_data: List[Dict[str, Any]] = Field(default_factory=list, description="Données de transaction")
     currency: str = Field(..., description="Code de la devise")
     filters: Optional[Filter] = Field(default_factory=Filter)
+    include_raw_data: bool = Field(True, description="Renvoyer les données nettoyées dans la réponse")
 
     class Config:
         schema_extra = {
@@ -59,7 +211,8 @@ class AnalysisRequest(BaseModel):
 async def analyze_data(request: AnalysisRequest):
     try:
         logger.info("Réception d'une demande d'analyse")
-        logger.debug("Données reçues: %s", jsonable_encoder(request))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Données reçues: %s", jsonable_encoder(request))
         
         if not request.overall_data:
             raise HTTPException(
@@ -67,16 +220,21 @@ async def analyze_data(request: AnalysisRequest):
                 detail="Les données globales (overall_data) sont requises"
             )
 
-        processor = DataProcessor()
-        
-        result = processor.process_data(
+        result, overall_df, transaction_df = await run_analysis(
+            'process_data_with_frames',
             request.overall_data,
-            request.transaction_data
+            request.transaction_data,
+            request.include_raw_data,
+            request.currency
         )
+
+        session = await open_session(result, overall_df, transaction_df)
         
-        logger.info("Analyse terminée avec succès")
+        logger.info(f"Analyse terminée avec succès (session {session.session_id})")
         return JSONResponse(content=jsonable_encoder(result))
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de l'analyse: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -84,10 +242,391 @@ async def analyze_data(request: AnalysisRequest):
             detail=f"Erreur lors de l'analyse des données: {str(e)}"
         )
 
+@app.post("/upload/analyze")
+async def upload_analyze(
+    overall_file: UploadFile = File(..., description="Export global (CSV, CSV.gz ou Parquet)"),
+    transaction_file: Optional[UploadFile] = File(None, description="Export des transactions (CSV, CSV.gz ou Parquet)"),
+    currency: str = Form(..., description="Code de la devise"),
+    include_raw_data: bool = Form(False, description="Renvoyer les données nettoyées dans la réponse")
+):
+    """
+    Variante de /analyze par téléversement de fichiers : les exports sont lus
+    directement en DataFrames, par morceaux, sans passer par des lignes JSON.
+    """
+    overall_path = transaction_path = None
+    try:
+        logger.info(f"Réception de fichiers: {overall_file.filename}, {transaction_file.filename if transaction_file else '-'}")
+        try:
+            overall_path = await save_upload(overall_file)
+            if transaction_file is not None and transaction_file.filename:
+                transaction_path = await save_upload(transaction_file)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        try:
+            result, overall_df, transaction_df = await run_analysis(
+                'process_files_with_frames',
+                overall_path,
+                transaction_path,
+                include_raw_data,
+                currency,
+                overall_file.filename,
+                transaction_file.filename if transaction_path else None
+            )
+        except UnsupportedFormatError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+        session = await open_session(result, overall_df, transaction_df)
+
+        logger.info(f"Analyse des fichiers terminée avec succès (session {session.session_id})")
+        return JSONResponse(content=jsonable_encoder(result))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur lors de l'analyse des fichiers: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de l'analyse des fichiers: {str(e)}"
+        )
+    finally:
+        remove_upload(overall_path)
+        remove_upload(transaction_path)
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """Histogrammes des durées (requêtes et étapes) au format d'exposition Prometheus."""
+    return Response(content=request_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/executor-stats")
+async def executor_stats():
+    return executor.stats()
+
+@app.get("/cache-stats")
+async def cache_stats():
+    return result_cache.stats()
+
+@app.get("/session-stats")
+async def session_stats():
+    return session_store.stats()
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    return get_session_or_404(session_id).describe()
+
+@app.get("/sessions/{session_id}/memory")
+async def get_session_memory(session_id: str):
+    """Mémoire occupée par colonne (types compacts) : dimensionnement des workers."""
+    return get_session_or_404(session_id).memory()
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found or expired")
+    return {"success": True}
+
+def load_test_state(test_id: str):
+    try:
+        return test_store.load(test_id)
+    except InvalidTestIdError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/tests/{test_id}/append")
+async def append_test_batch(test_id: str, data: Dict[str, Any]):
+    """
+    Ajoute un lot (raw_data overall et transaction du jour, batch_id optionnel)
+    à l'état cumulé d'un test et renvoie les métriques recalculées.
+    """
+    try:
+        if DataProcessor._is_missing(data.get('raw_data', {}).get('transaction')):
+            raise HTTPException(
+                status_code=400,
+                detail="Missing transaction or overall data"
+            )
+
+        # Identifiant validé avant de créer un verrou (sinon test_locks grossit à chaque id invalide)
+        try:
+            validate_test_id(test_id)
+        except InvalidTestIdError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        async with test_locks.setdefault(test_id, asyncio.Lock()):
+            state = load_test_state(test_id)
+            batch_id = data.get('batch_id')
+            if state is not None and batch_id is not None and batch_id in state.batches:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Batch {batch_id} already appended to test {test_id}"
+                )
+
+            result = await run_analysis('append_test_batch', state, test_id, data)
+
+            if not result['success']:
+                raise HTTPException(
+                    status_code=500,
+                    detail=result['error']
+                )
+            test_store.save(result.pop('state'))
+
+        logger.info(f"Batch appended to test {test_id}: {result['test']['batches'][-1]}")
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in append_test_batch endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+@app.get("/tests/{test_id}/metrics")
+async def get_test_metrics(test_id: str):
+    """Métriques d'un test en cours à partir de son état cumulé."""
+    try:
+        state = load_test_state(test_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail=f"Test {test_id} not found")
+
+        result = await run_analysis('calculate_test_metrics', state)
+
+        if not result['success']:
+            raise HTTPException(
+                status_code=500,
+                detail=result['error']
+            )
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_test_metrics endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+@app.delete("/tests/{test_id}")
+async def delete_test(test_id: str):
+    try:
+        deleted = test_store.delete(test_id)
+    except InvalidTestIdError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Test {test_id} not found")
+    test_locks.pop(test_id, None)
+    return {"success": True}
+
+def unfiltered_virtual_table_key() -> str:
+    """Clé de la table virtuelle sans filtre, telle que calculée par /sessions/{id}/virtual-table."""
+    return result_cache.key('virtual-table', {'device_category': [], 'item_category2': []})
+
+def describe_dataset_or_404(test_id: str) -> Dict[str, Any]:
+    try:
+        description = dataset_store.describe(test_id)
+    except InvalidTestIdError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if description is None:
+        raise HTTPException(status_code=404, detail=f"Dataset {test_id} not found")
+    return description
+
+@app.post("/datasets/{test_id}")
+async def save_dataset(test_id: str, data: Dict[str, Any]):
+    """
+    Archive sur disque les données nettoyées d'une session (overall, transaction)
+    et sa table virtuelle, pour rouvrir le test plus tard sans réimporter les exports.
+    """
+    try:
+        # Identifiant validé avant de créer un verrou (sinon dataset_locks grossit à chaque id invalide)
+        try:
+            validate_test_id(test_id)
+        except InvalidTestIdError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if not data.get('session_id'):
+            raise HTTPException(status_code=400, detail="Missing session_id")
+        session = get_session_or_404(data['session_id'])
+
+        virtual_table = session.cached_virtual_table(unfiltered_virtual_table_key())
+        if virtual_table is None and not session.transaction_df.empty:
+            virtual_table = await run_analysis('build_virtual_table', {
+                'raw_data': session.raw_data(),
+                'segment_index': session.segment_index
+            })
+        frames = {'overall': session.overall_df, 'transaction': session.transaction_df}
+        if virtual_table is not None:
+            frames['virtual_table'] = virtual_table
+
+        async with dataset_locks.setdefault(test_id, asyncio.Lock()):
+            description = dataset_store.save(test_id, frames, data.get('metadata'))
+
+        logger.info(f"Session {session.session_id} archived as dataset {test_id}")
+        return {'success': True, 'dataset': description}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in save_dataset endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+@app.get("/datasets")
+async def list_datasets():
+    return dataset_store.list_datasets()
+
+@app.get("/datasets/{test_id}")
+async def get_dataset(test_id: str):
+    return describe_dataset_or_404(test_id)
+
+@app.post("/datasets/{test_id}/open")
+async def open_dataset(test_id: str):
+    """
+    Rouvre un test archivé dans une nouvelle session : les colonnes sont
+    projetées en mémoire depuis le disque, sans analyse des exports d'origine.
+    """
+    try:
+        # 400 / 404 sans créer de verrou pour un identifiant invalide ou inconnu
+        describe_dataset_or_404(test_id)
+        # Pas d'enregistrement du même test entre la lecture du manifeste et celle des colonnes
+        async with dataset_locks.setdefault(test_id, asyncio.Lock()):
+            description = describe_dataset_or_404(test_id)
+            frames = dataset_store.load(test_id, [name for name in DATASET_FRAMES if name in description['frames']])
+        if frames is None:
+            raise HTTPException(status_code=404, detail=f"Dataset {test_id} not found")
+
+        result = {'success': True, 'dataset': description}
+        session = await open_session(result, frames['overall'], frames['transaction'])
+        if 'virtual_table' in frames:
+            session_store.cache_virtual_table(session, unfiltered_virtual_table_key(), frames['virtual_table'])
+
+        logger.info(f"Dataset {test_id} opened in session {session.session_id}")
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in open_dataset endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+@app.delete("/datasets/{test_id}")
+async def delete_dataset(test_id: str):
+    try:
+        deleted = dataset_store.delete(test_id)
+    except InvalidTestIdError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Dataset {test_id} not found")
+    dataset_locks.pop(test_id, None)
+    return {"success": True}
+
+@app.get("/sessions/{session_id}/virtual-table")
+async def get_virtual_table(
+    session_id: str,
+    request: Request,
+    cursor: Optional[str] = Query(None, description="Curseur renvoyé par la page précédente"),
+    limit: Optional[int] = Query(None, ge=1, le=VIRTUAL_TABLE_MAX_PAGE_ROWS, description="Nombre de lignes"),
+    columns: Optional[str] = Query(None, description="Colonnes à renvoyer, séparées par des virgules"),
+    device_category: List[str] = Query([]),
+    item_category2: List[str] = Query([]),
+    format: str = Query('json', pattern='^(json|ndjson)$', description="'json' (page) ou 'ndjson' (flux)")
+):
+    """
+    Table virtuelle (une ligne par transaction) de la session, par pages.
+
+    En mode 'json', renvoie une page et le curseur de la suivante ; en mode
+    'ndjson', diffuse les lignes à partir du curseur (toutes par défaut).
+    """
+    try:
+        session = get_session_or_404(session_id)
+        if session.transaction_df.empty:
+            raise HTTPException(status_code=400, detail="Aucune donnée de transaction dans la session")
+
+        filters = {'device_category': device_category, 'item_category2': item_category2}
+        table_key = result_cache.key('virtual-table', filters)
+        table = session.cached_virtual_table(table_key)
+        if table is None:
+            table = await run_analysis('build_virtual_table', {
+                'raw_data': session.raw_data(),
+                'segment_index': session.segment_index,
+                'filters': filters
+            })
+            session_store.cache_virtual_table(session, table_key, table)
+
+        selected = project_columns(table, [col.strip() for col in columns.split(',')] if columns else None)
+        if format == 'json' and limit is None:
+            limit = VIRTUAL_TABLE_PAGE_ROWS
+        start, stop = page_bounds(table, cursor, limit)
+        page_cursor = next_cursor(table, stop)
+        headers = {'X-Total-Rows': str(len(table))}
+        if page_cursor:
+            headers['X-Next-Cursor'] = page_cursor
+
+        if format == 'ndjson':
+            return StreamingResponse(
+                iter_ndjson(table, start, stop, selected),
+                media_type="application/x-ndjson",
+                headers=headers
+            )
+        page = table.iloc[start:stop][selected]
+        if negotiate_arrow(request):
+            return arrow_response(page, {'next_cursor': page_cursor, 'total_rows': len(table)}, headers=headers)
+        return JSONResponse(content=jsonable_encoder({
+            'success': True,
+            'data': page.to_dict('records'),
+            'columns': selected,
+            'next_cursor': page_cursor,
+            'total_rows': len(table)
+        }), headers=headers)
+
+    except HTTPException:
+        raise
+    except (InvalidCursorError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture de la table virtuelle: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/sessions/{session_id}/aggregate-transactions")
+async def aggregate_session_transactions(session_id: str):
+    try:
+        session = get_session_or_404(session_id)
+        if session.transaction_df.empty:
+            raise HTTPException(
+                status_code=400,
+                detail="Aucune donnée de transaction dans la session"
+            )
+
+        result = await run_analysis('aggregate_transactions', session.transaction_df)
+
+        return {
+            "success": True,
+            "data": result,
+            "meta": {
+                "input_records": len(session.transaction_df),
+                "output_records": len(result)
+            }
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur lors de l'agrégation: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de l'agrégation: {str(e)}"
+        )
+
 @app.exception_handler(422)
 async def validation_exception_handler(request, exc):
     return JSONResponse(
@@ -99,12 +638,14 @@ async def validation_exception_handler(request, exc):
     )
 
 @app.post("/aggregate-transactions")
-async def aggregate_transactions(data: List[Dict[str, Any]]):
+async def aggregate_transactions(request: Request):
     try:
+        # Liste JSON d'objets, ou flux Arrow IPC (Content-Type: application/vnd.apache.arrow.stream)
+        data = await read_records_body(request)
         logger.info(f"Réception de la demande d'agrégation avec {len(data)} enregistrements")
 
         # Validation des données
-        if not data:
+        if len(data) == 0:
             raise HTTPException(
                 status_code=400,
                 detail="Aucune donnée fournie pour l'agrégation"
@@ -112,14 +653,14 @@ async def aggregate_transactions(data: List[Dict[str, Any]]):
 
         # Vérification des champs requis
         required_fields = ['transaction_id', 'item_category2']
-        if not all(field in data[0] for field in required_fields):
+        available_fields = data.columns if isinstance(data, pd.DataFrame) else data[0]
+        if not all(field in available_fields for field in required_fields):
             raise HTTPException(
                 status_code=400,
                 detail=f"Champs requis manquants. Requis: {required_fields}"
             )
 
-        processor = DataProcessor()
-        result = processor.aggregate_transactions(data)
+        result = await run_analysis('aggregate_transactions', data)
 
         logger.info(f"Agrégation réussie. {len(result)} enregistrements agrégés")
         
@@ -141,6 +682,114 @@ async def aggregate_transactions(data: List[Dict[str, Any]]):
             detail=f"Erreur lors de l'agrégation: {str(e)}"
         )
 
+@app.post("/upload/aggregate-transactions")
+async def upload_aggregate_transactions(
+    transaction_file: UploadFile = File(..., description="Export des lignes produit (CSV, CSV.gz, Parquet ou Arrow)"),
+    mode: str = Form('hash', pattern='^(sorted|hash)$', description="'sorted' (export trié par transaction_id) ou 'hash'")
+):
+    """
+    Agrégation par transaction d'un export plus grand que la mémoire : le fichier
+    est lu par morceaux et le résultat (celui de /aggregate-transactions) est
+    renvoyé en flux NDJSON, une transaction par ligne.
+    """
+    transaction_path = output_path = None
+    try:
+        logger.info(f"Réception d'un export à agréger par morceaux: {transaction_file.filename} (mode {mode})")
+        try:
+            transaction_path = await save_upload(transaction_file)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        output_path = temp_output_path('.ndjson')
+        try:
+            meta = await run_analysis(
+                'aggregate_transactions_file',
+                transaction_path,
+                transaction_file.filename,
+                output_path,
+                mode
+            )
+        except UnsupportedFormatError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+        logger.info(f"Agrégation par morceaux réussie. {meta['output_records']} enregistrements agrégés")
+        response = StreamingResponse(
+            iter_file_blocks(output_path),
+            media_type="application/x-ndjson",
+            headers={
+                'X-Input-Records': str(meta['input_records']),
+                'X-Output-Records': str(meta['output_records'])
+            },
+            background=BackgroundTask(remove_upload, output_path)
+        )
+        output_path = None
+        return response
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur lors de l'agrégation par morceaux: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de l'agrégation: {str(e)}"
+        )
+    finally:
+        remove_upload(transaction_path)
+        remove_upload(output_path)
+
+@app.post("/upload/revenue-intervals")
+async def upload_revenue_intervals(
+    overall_file: UploadFile = File(..., description="Export global (CSV, CSV.gz, Parquet ou Arrow)"),
+    transaction_file: UploadFile = File(..., description="Export des lignes produit (CSV, CSV.gz, Parquet ou Arrow)"),
+    currency: str = Form(..., description="Code de la devise"),
+    mode: str = Form('hash', pattern='^(sorted|hash)$', description="'sorted' (export trié par transaction_id) ou 'hash'")
+):
+    """
+    AOV, ARPU et revenu total (intervalles et confiance bootstrap) d'un export
+    plus grand que la mémoire : les lignes produit sont agrégées par morceaux
+    et le bootstrap de Poisson est accumulé en flux, sans table virtuelle.
+    """
+    overall_path = transaction_path = None
+    try:
+        logger.info(f"Réception d'un export pour intervalles en flux: {transaction_file.filename} (mode {mode})")
+        try:
+            overall_path = await save_upload(overall_file)
+            transaction_path = await save_upload(transaction_file)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        try:
+            result = await run_analysis(
+                'calculate_streaming_revenue_file',
+                overall_path,
+                transaction_path,
+                overall_file.filename,
+                transaction_file.filename,
+                currency,
+                mode
+            )
+        except UnsupportedFormatError as e:
+            raise HTTPException(status_code=415, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+        logger.info(f"Intervalles en flux calculés: {result['transactions']} transactions")
+        return JSONResponse(content=jsonable_encoder(result))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur lors du calcul des intervalles en flux: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors du calcul des intervalles: {str(e)}"
+        )
+    finally:
+        remove_upload(overall_path)
+        remove_upload(transaction_path)
+
 @app.post("/test-aggregation")
 async def test_aggregation():
     """Route de test pour vérifier l'agrégation"""
@@ -181,11 +830,14 @@ async def test_aggregation():
         )
 
 class OverviewRequest(BaseModel):
-    overall: List[Dict[str, Any]]
+    overall: List[Dict[str, Any]] = []
     transaction: Optional[List[Dict[str, Any]]] = []
+    session_id: Optional[str] = None
+    filters: Optional[Filter] = None
+    include_virtual_table: bool = False
 
 @app.post("/calculate-overview")
-async def calculate_overview(data: OverviewRequest):
+async def calculate_overview(data: OverviewRequest, request: Request):
     try:
         logger.info("Received overview calculation request")
         logger.info(f"Overall data length: {len(data.overall)}")
@@ -197,7 +849,7 @@ async def calculate_overview(data: OverviewRequest):
         if data.transaction:
             logger.info(f"Sample transaction data: {data.transaction[0]}")
         
-        if not data.overall:
+        if not data.overall and not data.session_id:
             raise HTTPException(
                 status_code=400,
                 detail="Overall data is required"
@@ -210,14 +862,32 @@ async def calculate_overview(data: OverviewRequest):
                 'transaction': data.transaction
             }
         }
+        if data.session_id:
+            formatted_data = {'session_id': data.session_id}
+        if data.filters:
+            formatted_data['filters'] = data.filters.model_dump()
+        if data.include_virtual_table:
+            formatted_data['include_virtual_table'] = True
         
-        processor = DataProcessor()
+        arrow = negotiate_arrow(request)
+        cache_key = result_cache.key('calculate-overview' + (':arrow' if arrow else ''), formatted_data)
+        formatted_data = resolve_session_data(formatted_data)
+        cached = cached_response(cache_key, ARROW_STREAM_MEDIA_TYPE if arrow else "application/json")
+        if cached is not None:
+            logger.info("Overview served from cache")
+            return cached
+
+        if arrow:
+            formatted_data['virtual_table_format'] = 'frame'
+
         try:
-            result = processor.calculate_overview_metrics(formatted_data)
+            result = await run_analysis('calculate_overview_metrics', formatted_data)
             
             if result['success']:
                 logger.info("Overview calculation successful")
-                return result
+                if arrow:
+                    return cache_arrow_response(cache_key, result)
+                return cache_json_response(cache_key, result)
             else:
                 logger.error(f"Overview calculation failed: {result.get('error')}")
                 raise HTTPException(
@@ -225,6 +895,8 @@ async def calculate_overview(data: OverviewRequest):
                     detail=result.get('error', 'Unknown error occurred')
                 )
                 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Processor error: {str(e)}", exc_info=True)
             raise HTTPException(
@@ -239,7 +911,7 @@ async def calculate_overview(data: OverviewRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/calculate-revenue")
-async def calculate_revenue(data: Dict[str, Any]) -> Dict[str, Any]:
+async def calculate_revenue(data: Dict[str, Any], request: Request) -> Dict[str, Any]:
     """
     Calcule les métriques de revenu avec les tests statistiques appropriés.
     """
@@ -247,14 +919,25 @@ async def calculate_revenue(data: Dict[str, Any]) -> Dict[str, Any]:
         logger.info("Starting revenue calculation")
         logger.info(f"Input data structure: {list(data.keys())}")
         
-        if not data.get('raw_data', {}).get('transaction'):
+        arrow = negotiate_arrow(request)
+        cache_key = result_cache.key('calculate-revenue' + (':arrow' if arrow else ''), data)
+        data = resolve_session_data(data)
+
+        if DataProcessor._is_missing(data.get('raw_data', {}).get('transaction')):
             raise HTTPException(
                 status_code=500,
                 detail="Missing transaction or overall data"
             )
         
-        processor = DataProcessor()
-        result = processor.calculate_revenue_metrics(data)
+        cached = cached_response(cache_key, ARROW_STREAM_MEDIA_TYPE if arrow else "application/json")
+        if cached is not None:
+            logger.info("Revenue metrics served from cache")
+            return cached
+
+        if arrow:
+            data = {**data, 'virtual_table_format': 'frame'}
+
+        result = await run_analysis('calculate_revenue_metrics', data)
         
         if not result['success']:
             raise HTTPException(
@@ -265,10 +948,15 @@ async def calculate_revenue(data: Dict[str, Any]) -> Dict[str, Any]:
         logger.info("Revenue calculation successful")
         logger.info(f"Number of variations: {len(result['data'])}")
         logger.info(f"Control variation: {result['control']}")
-        logger.info(f"Virtual table size: {len(result['virtual_table'])}")
+        if 'virtual_table' in result:
+            logger.info(f"Virtual table size: {len(result['virtual_table'])}")
         
-        return result
+        if arrow:
+            return cache_arrow_response(cache_key, result)
+        return cache_json_response(cache_key, result)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in calculate_revenue endpoint: {str(e)}")
         raise HTTPException(
@@ -276,12 +964,264 @@ async def calculate_revenue(data: Dict[str, Any]) -> Dict[str, Any]:
             detail=str(e)
         )
 
+@app.post("/calculate-segments")
+async def calculate_segments(data: Dict[str, Any]):
+    """
+    Calcule le cube des segments device_category x item_category2 (avec marges '*').
+    """
+    try:
+        logger.info("Starting segment cube calculation")
+
+        cache_key = result_cache.key('calculate-segments', data)
+        data = resolve_session_data(data)
+
+        if DataProcessor._is_missing(data.get('raw_data', {}).get('transaction')):
+            raise HTTPException(
+                status_code=400,
+                detail="Missing transaction or overall data"
+            )
+
+        cached = cached_response(cache_key)
+        if cached is not None:
+            logger.info("Segment cube served from cache")
+            return cached
+
+        result = await run_analysis('calculate_segment_cube', data)
+
+        if not result['success']:
+            raise HTTPException(
+                status_code=500,
+                detail=result['error']
+            )
+
+        logger.info(f"Segment cube calculated for {len(result['variations'])} variations")
+        return cache_json_response(cache_key, result)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in calculate_segments endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+@app.post("/compare-variations")
+async def compare_variations(data: Dict[str, Any]):
+    """
+    Compare toutes les variations au contrôle en un appel, avec des confiances
+    ajustées (correction 'holm', 'bonferroni' ou 'none').
+    """
+    try:
+        logger.info(f"Starting variations comparison (correction: {data.get('correction') or 'holm'})")
+
+        cache_key = result_cache.key('compare-variations', data)
+        data = resolve_session_data(data)
+
+        if DataProcessor._is_missing(data.get('raw_data', {}).get('transaction')):
+            raise HTTPException(
+                status_code=400,
+                detail="Missing transaction or overall data"
+            )
+
+        cached = cached_response(cache_key)
+        if cached is not None:
+            logger.info("Variations comparison served from cache")
+            return cached
+
+        result = await run_analysis('compare_variations', data)
+
+        if not result['success']:
+            raise HTTPException(
+                status_code=500,
+                detail=result['error']
+            )
+
+        logger.info(f"Variations compared against {result['control']}")
+        return cache_json_response(cache_key, result)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in compare_variations endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+@app.post("/revenue-distribution")
+async def revenue_distribution(data: Dict[str, Any]):
+    """
+    Répartition des transactions par tranche de revenu pour toutes les tranches
+    à la fois : bornes explicites (edges) ou découpage automatique
+    (binning 'quantile' ou 'log', bins tranches).
+
+    Différences avec le calcul tranche par tranche (calculate_revenue_distribution_stats) :
+    - les tranches sont semi-ouvertes [min, max[ (la dernière inclut sa borne
+      haute) au lieu de [min, max] inclusives : un revenu égal à une borne
+      intérieure n'est plus compté dans deux tranches ;
+    - la confiance de chaque tranche vient d'un test de taux sur cette tranche
+      (Fisher / chi-deux, test_method) et non plus du Mann-Whitney U sur toute
+      la distribution, désormais renvoyé à part (distribution_confidence).
+    """
+    try:
+        logger.info(f"Starting revenue distribution (binning: {'explicit' if data.get('edges') is not None else data.get('binning') or 'quantile'})")
+
+        cache_key = result_cache.key('revenue-distribution', data)
+        data = resolve_session_data(data)
+
+        if DataProcessor._is_missing(data.get('raw_data', {}).get('transaction')):
+            raise HTTPException(
+                status_code=400,
+                detail="Missing transaction or overall data"
+            )
+
+        cached = cached_response(cache_key)
+        if cached is not None:
+            logger.info("Revenue distribution served from cache")
+            return cached
+
+        result = await run_analysis('calculate_revenue_distribution', data)
+
+        if not result['success']:
+            raise HTTPException(
+                status_code=500,
+                detail=result['error']
+            )
+
+        logger.info(f"Revenue distribution calculated for {len(result['buckets'])} buckets")
+        return cache_json_response(cache_key, result)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in revenue_distribution endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+@app.post("/summaries/shard")
+async def summarize_shard(data: Dict[str, Any]):
+    """
+    Résumé fusionnable (moments, effectifs, sketch de quantiles des revenus)
+    d'une tranche d'export, à combiner ensuite avec /summaries/merge.
+    """
+    try:
+        cache_key = result_cache.key('summaries-shard', data)
+        data = resolve_session_data(data)
+
+        if DataProcessor._is_missing(data.get('raw_data', {}).get('transaction')):
+            raise HTTPException(
+                status_code=400,
+                detail="Missing transaction or overall data"
+            )
+
+        cached = cached_response(cache_key)
+        if cached is not None:
+            return cached
+
+        result = await run_analysis('summarize_shard', data)
+
+        if not result['success']:
+            raise HTTPException(
+                status_code=500,
+                detail=result['error']
+            )
+        return cache_json_response(cache_key, result)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in summarize_shard endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+@app.post("/summaries/merge")
+async def merge_summaries(data: Dict[str, Any]):
+    """
+    Fusionne des résumés de tranches et calcule les métriques du test
+    (Welch, Fisher / chi-deux, quantiles de revenu).
+    """
+    try:
+        if not isinstance(data.get('summaries'), list) or not data['summaries']:
+            raise HTTPException(
+                status_code=400,
+                detail="summaries must be a non-empty list"
+            )
+
+        result = await run_analysis('merge_shard_summaries', data)
+
+        if not result['success']:
+            raise HTTPException(
+                status_code=422,
+                detail=result['error']
+            )
+
+        logger.info(f"{result['shards']} shard summaries merged")
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in merge_summaries endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+@app.post("/analysis-pipeline")
+async def analysis_pipeline(data: Dict[str, Any], request: Request):
+    """
+    Calcule en un appel les sections demandées ('overview', 'revenue',
+    'aggregation', 'segments') à partir d'un même jeu de données nettoyé.
+    """
+    try:
+        logger.info(f"Starting analysis pipeline (sections: {data.get('sections') or 'all'})")
+
+        cache_key = result_cache.key('analysis-pipeline', data)
+        data = resolve_session_data(data)
+
+        if DataProcessor._is_missing(data.get('raw_data', {}).get('transaction')):
+            raise HTTPException(
+                status_code=400,
+                detail="Missing transaction or overall data"
+            )
+
+        cached = cached_response(cache_key)
+        if cached is not None:
+            logger.info("Analysis pipeline served from cache")
+            return cached
+
+        result = await run_analysis('run_pipeline', data)
+
+        if not result['success']:
+            raise HTTPException(
+                status_code=500,
+                detail=result['error']
+            )
+
+        logger.info(f"Analysis pipeline completed: {result['sections']}")
+        return cache_json_response(cache_key, result)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in analysis_pipeline endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
 @app.post("/validate-data")
 async def validate_data(data: List[Dict[str, Any]]):
     try:
-        processor = DataProcessor()
-        validation_results = processor.validate_transaction_data(data)
+        validation_results = await run_analysis('validate_transaction_data', data)
         return validation_results
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -291,8 +1231,7 @@ async def validate_data(data: List[Dict[str, Any]]):
 @app.post("/create-analysis")
 async def create_analysis(data: Dict[str, Any]):
     try:
-        processor = DataProcessor()
-        analysis_table = processor.create_analysis_table(data)
+        analysis_table = await run_analysis('create_analysis_table', resolve_session_data(data))
         
         return {
             'success': True,
@@ -307,6 +1246,8 @@ async def create_analysis(data: Dict[str, Any]):
                 }
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -0,0 +1,166 @@
+# aggregation.py
+
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+LABEL_SEPARATOR = ' | '
+
+
+def group_codes(df: pd.DataFrame, key: str) -> Tuple[pd.core.groupby.DataFrameGroupBy, np.ndarray, int]:
+    """
+    Regroupe df par key et retourne, pour chaque ligne, le numéro de son groupe.
+
+    Les numéros suivent l'ordre des lignes de groupby(...).agg(...) (clés triées) ;
+    les lignes dont la clé est nulle reçoivent -1, comme groupby les ignore.
+
+    Returns:
+        Tuple: (objet groupby, code de groupe par ligne, nombre de groupes)
+    """
+    grouped = df.groupby(key, sort=True)
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    return grouped, codes, grouped.ngroups
+
+
+def concat_unique_labels(
+    values: pd.Series,
+    codes: np.ndarray,
+    n_groups: int,
+    max_items: Optional[int] = None,
+    separator: str = LABEL_SEPARATOR
+) -> np.ndarray:
+    """
+    Concatène les valeurs distinctes de chaque groupe, triées, sans callback Python par groupe.
+
+    Équivaut, pour chaque groupe, à
+    ' | '.join(sorted(set(str(v) for v in x if pd.notna(v) and str(v).strip())))
+    avec, si max_items est fourni, les max_items premières valeurs suivies de
+    ' (+N autres)'.
+
+    Les valeurs sont factorisées en codes entiers (les conversions en texte ne
+    portent que sur les valeurs distinctes), les paires (groupe, valeur) sont
+    dédoublonnées par np.unique, puis les libellés sont assemblés position par
+    position sur des tableaux de chaînes.
+
+    Args:
+        values: Colonne à concaténer (alignée sur codes)
+        codes: Code de groupe de chaque ligne (-1 : ligne ignorée)
+        n_groups: Nombre de groupes
+        max_items: Nombre maximum de valeurs affichées par groupe
+        separator: Séparateur des valeurs
+
+    Returns:
+        np.ndarray: Libellé (str) de chaque groupe
+    """
+    labels = np.full(n_groups, '', dtype=object)
+    value_codes, uniques = pd.factorize(values.to_numpy(dtype=object), use_na_sentinel=True)
+    if len(uniques) == 0 or n_groups == 0:
+        return labels
+
+    # Texte des valeurs distinctes ; des valeurs différentes peuvent avoir le même texte
+    unique_text = np.array([str(value) for value in uniques], dtype=object)
+    text_codes, text_uniques = pd.factorize(unique_text, sort=True)
+    blank = np.array([not text.strip() for text in text_uniques], dtype=bool)
+    row_text = np.where(value_codes >= 0, text_codes[np.maximum(value_codes, 0)], -1)
+    keep = (row_text >= 0) & (codes >= 0)
+    keep[keep] = ~blank[row_text[keep]]
+
+    # Paires (groupe, texte) distinctes, triées par groupe puis par texte (ordre de sorted())
+    n_text = len(text_uniques)
+    pairs = np.unique(codes[keep] * n_text + row_text[keep])
+    pair_group = pairs // n_text
+    pair_text = pairs % n_text
+    counts = np.bincount(pair_group, minlength=n_groups)
+    position = np.arange(len(pairs)) - (np.cumsum(counts) - counts)[pair_group]
+
+    # Assemblage position par position : la k-ième valeur de chaque groupe en une opération
+    shown = position if max_items is None else np.where(position < max_items, position, -1)
+    order = np.argsort(shown, kind='stable')
+    bounds = np.searchsorted(shown[order], np.arange(shown.max(initial=-1) + 2))
+    for k in range(len(bounds) - 1):
+        at_k = order[bounds[k]:bounds[k + 1]]
+        groups = pair_group[at_k]
+        texts = text_uniques[pair_text[at_k]]
+        labels[groups] = texts if k == 0 else labels[groups] + separator + texts
+
+    if max_items is not None:
+        over = np.flatnonzero(counts > max_items)
+        if len(over):
+            hidden = (counts[over] - max_items).astype(str).astype(object)
+            labels[over] = labels[over] + ' (+' + hidden + ' autres)'
+    return labels
+
+
+def products_summary(unique_products: pd.Series, quantity: pd.Series) -> np.ndarray:
+    """
+    Libellé '<n> produit(s) (<q> unité(s))' de chaque transaction, calculé colonne par colonne.
+    """
+    products = unique_products.to_numpy()
+    units = quantity.to_numpy()
+    return (
+        products.astype(np.int64).astype(str).astype(object)
+        + np.where(products > 1, ' produits (', ' produit (').astype(object)
+        + units.astype(np.int64).astype(str).astype(object)
+        + np.where(units > 1, ' unités)', ' unité)').astype(object)
+    )
+
+
+# Colonnes dont la première valeur non nulle est conservée, et colonnes concaténées (si présentes)
+FIRST_VALUE_COLUMNS = ('variation', 'device_category')
+CONCAT_COLUMNS = ('item_category2', 'item_name', 'item_bundle', 'item_name_simple')
+
+
+def aggregate_items(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrège les lignes produit en une ligne par transaction_id (triée par clé).
+
+    df est modifié (colonnes numériques converties, unique_products ajoutée) :
+    l'appelant passe une copie ou un DataFrame qui lui appartient.
+
+    Returns:
+        pd.DataFrame: transaction_id, revenue, quantity, unique_products,
+            variation, device_category, colonnes concaténées et products_summary
+    """
+    # Convertir les colonnes numériques en type numérique
+    df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce')
+    df['revenue'] = pd.to_numeric(df['revenue'], errors='coerce')
+
+    # Créer une colonne pour le nombre de produits uniques
+    df['unique_products'] = 1
+
+    # Définir les colonnes à concaténer (uniquement celles qui existent)
+    available_concat_columns = []
+    for col in CONCAT_COLUMNS:
+        if col in df.columns:
+            available_concat_columns.append(col)
+
+    # Créer le dictionnaire d'agrégation avec les colonnes disponibles
+    agg_dict = {
+        'revenue': 'sum',
+        'quantity': 'sum',
+        'unique_products': 'count'  # Compte le nombre de produits uniques
+    }
+
+    # Ajouter les colonnes de première valeur si elles existent
+    for col in FIRST_VALUE_COLUMNS:
+        if col in df.columns:
+            agg_dict[col] = 'first'
+
+    # Grouper par transaction_id (agrégations numériques natives de pandas)
+    groupby, codes, n_groups = group_codes(df, 'transaction_id')
+    grouped = groupby.agg(agg_dict).reset_index()
+
+    # Colonnes concaténées (limitées à 3 valeurs) calculées sur les codes des groupes
+    for col in available_concat_columns:
+        grouped[col] = concat_unique_labels(df[col], codes, n_groups, max_items=3)
+
+    # Ajouter une colonne pour afficher le nombre total de produits
+    grouped['products_summary'] = products_summary(grouped['unique_products'], grouped['quantity'])
+
+    # Arrondir les valeurs numériques
+    grouped['revenue'] = grouped['revenue'].round(2)
+
+    return grouped
@@ -0,0 +1,60 @@
+# analysis_context.py
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def detect_control(overall_df: pd.DataFrame) -> str:
+    """Nom de la variation contrôle (première variation contenant 'control')."""
+    return str(overall_df[overall_df['variation'].str.contains('control', case=False)]['variation'].iloc[0])
+
+
+class AnalysisContext:
+    """
+    Données d'une analyse préparées une seule fois et partagées par toutes les métriques.
+
+    La table virtuelle est partitionnée par variation en un seul groupby ; le
+    contrôle est détecté une fois et ses transactions ne sont plus refiltrées
+    à chaque itération sur les variations.
+    """
+
+    def __init__(self, virtual_table: pd.DataFrame, overall_df: pd.DataFrame, transaction_df: pd.DataFrame):
+        self.virtual_table = virtual_table
+        self.overall_df = overall_df
+        self.transaction_df = transaction_df
+        self.control_variation = detect_control(overall_df)
+        self.variations: List = list(overall_df['variation'].unique())
+
+        self._partitions: Dict = {
+            variation: rows for variation, rows in virtual_table.groupby('variation', sort=False, observed=True)
+        }
+        self._no_transactions = virtual_table.iloc[0:0]
+
+        # Première ligne overall de chaque variation
+        first_rows = np.flatnonzero(~overall_df['variation'].duplicated().to_numpy())
+        self._overall_rows: Dict = {
+            overall_df['variation'].iloc[pos]: overall_df.iloc[pos] for pos in first_rows
+        }
+
+    def transactions(self, variation) -> pd.DataFrame:
+        """Transactions (lignes de la table virtuelle) d'une variation."""
+        return self._partitions.get(variation, self._no_transactions)
+
+    def overall(self, variation) -> pd.Series:
+        """Ligne overall d'une variation."""
+        return self._overall_rows[variation]
+
+    @property
+    def control_transactions(self) -> pd.DataFrame:
+        return self.transactions(self.control_variation)
+
+    @property
+    def control_overall(self) -> pd.Series:
+        return self.overall(self.control_variation)
+
+    def users_by_variation(self) -> Dict[str, float]:
+        return {str(variation): float(row['users']) for variation, row in self._overall_rows.items()}
@@ -0,0 +1,241 @@
+# arm_comparison.py
+
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+from typing import Dict, Any, List, Optional, Tuple, Union
+import logging
+from api.processors.analysis_context import AnalysisContext
+from api.processors.rank_engine import RankEngine
+from api.processors.rate_tests import RateTestEngine
+
+logger = logging.getLogger(__name__)
+
+# Corrections des comparaisons multiples (toutes les variations contre le contrôle)
+CORRECTIONS = ('holm', 'bonferroni', 'none')
+
+
+def adjust_p_values(p_values: np.ndarray, correction: str = 'holm') -> np.ndarray:
+    """
+    Ajuste une famille de p-values pour les comparaisons multiples.
+
+    Les p-values non finies (test impossible) sont ignorées : elles ne comptent
+    pas dans la taille de la famille et restent NaN.
+
+    Args:
+        p_values: p-values brutes (une par variation)
+        correction: 'holm' (step-down), 'bonferroni' ou 'none'
+
+    Returns:
+        np.ndarray: p-values ajustées, bornées à 1
+    """
+    if correction not in CORRECTIONS:
+        raise ValueError(f"Unknown correction: {correction}")
+    p_values = np.asarray(p_values, dtype=np.float64)
+    if correction == 'none':
+        return p_values.copy()
+
+    adjusted = np.full(len(p_values), np.nan)
+    finite = np.flatnonzero(np.isfinite(p_values))
+    m = len(finite)
+    if m == 0:
+        return adjusted
+    if correction == 'bonferroni':
+        adjusted[finite] = np.minimum(p_values[finite] * m, 1.0)
+        return adjusted
+
+    # Holm : p(i) * (m - i) dans l'ordre croissant, rendu monotone
+    order = finite[np.argsort(p_values[finite], kind='stable')]
+    scaled = (m - np.arange(m)) * p_values[order]
+    adjusted[order] = np.minimum(np.maximum.accumulate(scaled), 1.0)
+    return adjusted
+
+
+def welch_from_moments(
+    mean: np.ndarray,
+    var: np.ndarray,
+    n: np.ndarray,
+    ctrl_mean: float,
+    ctrl_var: float,
+    ctrl_n: float
+) -> Dict[str, np.ndarray]:
+    """
+    Test t de Welch de chaque variation contre le contrôle à partir des moments.
+
+    Équivaut à stats.ttest_ind(var, ctrl, equal_var=False) pour chaque
+    variation, en une seule opération vectorisée.
+
+    Returns:
+        Dict[str, np.ndarray]: statistic, df et p_value par variation (NaN si non calculable)
+    """
+    mean, var, n = (np.asarray(a, dtype=np.float64) for a in (mean, var, n))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_term = var / n
+        ctrl_term = ctrl_var / ctrl_n
+        se2 = var_term + ctrl_term
+        statistic = (mean - ctrl_mean) / np.sqrt(se2)
+        df = se2 ** 2 / (var_term ** 2 / (n - 1) + ctrl_term ** 2 / (ctrl_n - 1))
+        p_value = 2 * stats.t.sf(np.abs(statistic), df)
+    return {'statistic': statistic, 'df': df, 'p_value': p_value}
+
+
+def _arm_moments(virtual_table: pd.DataFrame, variations: List) -> pd.DataFrame:
+    """Nombre de transactions, somme, moyenne et variance des revenus et quantités de chaque bras."""
+    moments = virtual_table.groupby('variation', sort=False, observed=True)[['revenue', 'quantity']].agg(['count', 'sum', 'mean', 'var'])
+    return moments.reindex(variations)
+
+
+def _finite(value: float, digits: Optional[int] = None) -> Optional[float]:
+    """Valeur JSON : None si le test n'a pas pu être calculé."""
+    value = float(value)
+    if not np.isfinite(value):
+        return None
+    return round(value, digits) if digits is not None else value
+
+
+def _uplift(value: np.ndarray, control_value: float) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        uplift = (value - control_value) / control_value * 100
+    return np.where(control_value > 0, uplift, 0.0)
+
+
+def _rate_p_values(
+    rate_tests: RateTestEngine,
+    successes: np.ndarray,
+    totals: np.ndarray,
+    ctrl_successes: float,
+    ctrl_total: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Test de taux de chaque variation contre le contrôle (NaN si la table est invalide)."""
+    p_values = np.full(len(successes), np.nan)
+    methods = np.full(len(successes), None, dtype=object)
+    valid = (successes >= 0) & (successes <= totals)
+    if 0 <= ctrl_successes <= ctrl_total and valid.any():
+        p_values[valid], methods[valid] = rate_tests.test(successes[valid], totals[valid], ctrl_successes, ctrl_total)
+    return p_values, methods
+
+
+def _mann_whitney_p_values(context: AnalysisContext, ranks: RankEngine, column: str, variations: List) -> np.ndarray:
+    """Test de Mann-Whitney U de chaque variation contre le contrôle (le contrôle est trié une seule fois)."""
+    control = context.control_variation
+    ctrl_values = context.control_transactions[column].values
+    p_values = np.full(len(variations), np.nan)
+    for i, variation in enumerate(variations):
+        var_values = context.transactions(variation)[column].values
+        if len(var_values) and len(ctrl_values):
+            p_values[i] = ranks.mann_whitney(var_values, ctrl_values, (column, variation), (column, control)).pvalue
+    return p_values
+
+
+def _metric_results(
+    variations: List,
+    value: np.ndarray,
+    control_value: float,
+    test: Union[str, np.ndarray],
+    p_values: np.ndarray,
+    correction: str,
+    welch: Optional[Dict[str, np.ndarray]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Résultats d'une métrique pour chaque variation, avec p-values brutes et ajustées."""
+    adjusted = adjust_p_values(p_values, correction)
+    uplift = _uplift(value, control_value)
+    results = {}
+    for i, variation in enumerate(variations):
+        result = {
+            'value': float(value[i]),
+            'control_value': float(control_value),
+            'uplift': float(uplift[i]),
+            'test': test if isinstance(test, str) else test[i],
+            'p_value': _finite(p_values[i]),
+            'confidence': _finite((1 - p_values[i]) * 100, 2),
+            'adjusted_p_value': _finite(adjusted[i]),
+            'adjusted_confidence': _finite((1 - adjusted[i]) * 100, 2)
+        }
+        if welch is not None:
+            result['welch'] = {
+                'statistic': _finite(welch['statistic'][i]),
+                'df': _finite(welch['df'][i]),
+                'p_value': _finite(welch['p_value'][i])
+            }
+        results[str(variation)] = result
+    return results
+
+
+def compare_arms(
+    context: AnalysisContext,
+    correction: str = 'holm',
+    rate_tests: Optional[RateTestEngine] = None
+) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Compare toutes les variations au contrôle en un seul appel.
+
+    Les statistiques suffisantes de chaque bras sont calculées en un groupby,
+    celles du contrôle une seule fois ; les tests de Welch sont vectorisés sur
+    l'ensemble des bras, le contrôle n'est trié qu'une fois pour les tests de
+    Mann-Whitney U, les taux sont comparés par Fisher exact ou chi-deux
+    selon les effectifs (RateTestEngine), et les confiances sont ajustées (Holm ou Bonferroni) sur la
+    famille des variations pour chaque métrique.
+
+    Args:
+        context: Contexte d'analyse partagé
+        correction: Correction des comparaisons multiples (CORRECTIONS)
+        rate_tests: Moteur des tests de taux (configuration par défaut si None)
+
+    Returns:
+        Dict: métrique -> variation -> résultat
+    """
+    if correction not in CORRECTIONS:
+        raise ValueError(f"Unknown correction: {correction}")
+
+    control = context.control_variation
+    variations = [variation for variation in context.variations if variation != control]
+    moments = _arm_moments(context.virtual_table, variations + [control])
+    arms, ctrl = moments.iloc[:-1], moments.iloc[-1]
+
+    users = np.array([float(context.overall(v)['users']) for v in variations])
+    carts = np.array([float(context.overall(v)['user_add_to_carts']) for v in variations])
+    ctrl_users = float(context.control_overall['users'])
+    ctrl_carts = float(context.control_overall['user_add_to_carts'])
+
+    transactions = arms[('revenue', 'count')].fillna(0).to_numpy(dtype=np.float64)
+    ctrl_transactions = float(0 if pd.isna(ctrl[('revenue', 'count')]) else ctrl[('revenue', 'count')])
+    ranks = RankEngine()
+    rate_tests = rate_tests or RateTestEngine()
+
+    results = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_values, methods = _rate_p_values(rate_tests, carts, users, ctrl_carts, ctrl_users)
+        results['add_to_cart_rate'] = _metric_results(
+            variations, carts / users * 100, ctrl_carts / ctrl_users * 100, methods, p_values, correction
+        )
+        p_values, methods = _rate_p_values(rate_tests, transactions, users, ctrl_transactions, ctrl_users)
+        results['transaction_rate'] = _metric_results(
+            variations, transactions / users * 100, ctrl_transactions / ctrl_users * 100, methods, p_values, correction
+        )
+
+        for metric, column in (('aov', 'revenue'), ('avg_products', 'quantity')):
+            mean = arms[(column, 'mean')].to_numpy(dtype=np.float64)
+            var = arms[(column, 'var')].to_numpy(dtype=np.float64)
+            welch = welch_from_moments(mean, var, transactions, ctrl[(column, 'mean')], ctrl[(column, 'var')], ctrl_transactions)
+            results[metric] = _metric_results(
+                variations, np.nan_to_num(mean), float(np.nan_to_num(ctrl[(column, 'mean')])),
+                'mann_whitney', _mann_whitney_p_values(context, ranks, column, variations), correction, welch
+            )
+
+        # ARPU : revenu par utilisateur, les utilisateurs sans transaction comptant pour 0
+        revenue_sum = arms[('revenue', 'sum')].fillna(0).to_numpy(dtype=np.float64)
+        ctrl_revenue_sum = float(np.nan_to_num(ctrl[('revenue', 'sum')]))
+        arpu = revenue_sum / users
+        ctrl_arpu = ctrl_revenue_sum / ctrl_users
+        sum_squares = np.nan_to_num(arms[('revenue', 'var')].to_numpy(dtype=np.float64)) * np.maximum(transactions - 1, 0) \
+            + transactions * np.nan_to_num(arms[('revenue', 'mean')].to_numpy(dtype=np.float64)) ** 2
+        ctrl_sum_squares = float(np.nan_to_num(ctrl[('revenue', 'var')])) * max(ctrl_transactions - 1, 0) \
+            + ctrl_transactions * float(np.nan_to_num(ctrl[('revenue', 'mean')])) ** 2
+        arpu_var = (sum_squares - users * arpu ** 2) / (users - 1)
+        ctrl_arpu_var = (ctrl_sum_squares - ctrl_users * ctrl_arpu ** 2) / (ctrl_users - 1)
+        welch = welch_from_moments(arpu, arpu_var, users, ctrl_arpu, ctrl_arpu_var, ctrl_users)
+        results['arpu'] = _metric_results(
+            variations, arpu, ctrl_arpu, 'welch', welch['p_value'], correction, welch
+        )
+
+    return results
@@ -0,0 +1,279 @@
+# bootstrap.py
+
+import os
+import numpy as np
+from typing import Dict, Optional, Tuple, Iterator, Iterable
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Nombre de rééchantillonnages par défaut (identique à l'ancienne boucle Python)
+DEFAULT_N_BOOTSTRAP = 1000
+
+# Budget mémoire d'un lot de rééchantillonnages (indices + valeurs rassemblées)
+DEFAULT_MAX_BATCH_BYTES = int(float(os.getenv("BOOTSTRAP_MAX_BATCH_MB", 64)) * 1024 * 1024)
+
+# Octets par cellule d'un lot : indice int64 + valeur float64 rassemblée
+_BYTES_PER_CELL = 16
+
+# Octets par cellule d'une matrice de poids de Poisson (int64)
+_BYTES_PER_WEIGHT = 8
+
+
+class ReplicateSums:
+    """
+    Résultat d'un bootstrap : pour chaque rééchantillonnage, le poids total
+    (nombre d'observations tirées) et la somme de chaque colonne.
+    """
+
+    def __init__(self, weights: np.ndarray, sums: Dict[str, np.ndarray]):
+        self.weights = weights
+        self.sums = sums
+
+    def total(self, column: str) -> np.ndarray:
+        """Somme de la colonne pour chaque rééchantillonnage."""
+        return self.sums[column]
+
+    def mean(self, column: str) -> np.ndarray:
+        """Moyenne de la colonne pour chaque rééchantillonnage (0 si le poids est nul)."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = self.sums[column] / self.weights
+        return np.where(self.weights > 0, means, 0.0)
+
+
+class ResamplePlan:
+    """
+    Plan de rééchantillonnage d'un bras.
+
+    Les indices sont entièrement déterminés par la graine : le plan peut être
+    rejoué à l'identique (nombres aléatoires communs) et toutes les colonnes
+    d'un même bras sont rassemblées avec les mêmes indices en une seule passe.
+    """
+
+    def __init__(self, n_rows: int, n_bootstrap: int, seed: int, max_batch_bytes: int, size: Optional[int] = None):
+        self.n_rows = int(n_rows)
+        self.size = self.n_rows if size is None else int(size)
+        if self.n_rows == 0 or self.size == 0:
+            raise ValueError("Impossible de rééchantillonner un échantillon vide")
+        self.n_bootstrap = n_bootstrap
+        self.seed = seed
+        self.max_batch_bytes = max_batch_bytes
+
+    def _batch_sizes(self) -> Iterator[int]:
+        """Découpe les n_bootstrap rééchantillonnages en lots respectant le plafond mémoire."""
+        rows_per_batch = max(1, self.max_batch_bytes // (_BYTES_PER_CELL * self.size))
+        remaining = self.n_bootstrap
+        while remaining > 0:
+            batch = min(rows_per_batch, remaining)
+            yield batch
+            remaining -= batch
+
+    def iter_indices(self) -> Iterator[np.ndarray]:
+        """Génère les matrices d'indices lot par lot, toujours identiques pour une même graine."""
+        rng = np.random.default_rng(self.seed)
+        for batch in self._batch_sizes():
+            yield rng.integers(0, self.n_rows, size=(batch, self.size))
+
+    def replicate_sums(self, columns: Dict[str, np.ndarray]) -> ReplicateSums:
+        """
+        Rassemble toutes les colonnes avec les mêmes indices.
+
+        Args:
+            columns: Colonnes du bras, toutes de longueur n_rows
+
+        Returns:
+            ReplicateSums: Sommes par rééchantillonnage pour chaque colonne
+        """
+        values = {name: np.asarray(col, dtype=np.float64) for name, col in columns.items()}
+        for name, col in values.items():
+            if len(col) != self.n_rows:
+                raise ValueError(f"La colonne {name} ne correspond pas à la taille du plan")
+
+        sums = {name: np.empty(self.n_bootstrap, dtype=np.float64) for name in values}
+        start = 0
+        for indices in self.iter_indices():
+            stop = start + len(indices)
+            for name, col in values.items():
+                sums[name][start:stop] = col[indices].sum(axis=1)
+            start = stop
+        weights = np.full(self.n_bootstrap, float(self.size))
+        return ReplicateSums(weights, sums)
+
+
+class PoissonBootstrapState:
+    """
+    État en ligne d'un bootstrap de Poisson pour un bras.
+
+    Chaque observation reçoit un poids Poisson(1) indépendant par rééchantillonnage ;
+    seules les sommes pondérées sont conservées (mémoire constante par rééchantillonnage).
+    Les observations pouvant être traitées dans n'importe quel ordre, des états
+    calculés sur des morceaux ou des workers différents se fusionnent par addition.
+    """
+
+    def __init__(
+        self,
+        columns: Iterable[str],
+        n_bootstrap: int = DEFAULT_N_BOOTSTRAP,
+        max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+        seed: Optional[int] = None
+    ):
+        self.columns = tuple(columns)
+        self.n_bootstrap = n_bootstrap
+        self.max_batch_bytes = max_batch_bytes
+        self.rng = np.random.default_rng(seed)
+        self.n_rows = 0
+        self.totals = {name: 0.0 for name in self.columns}
+        self.weights = np.zeros(n_bootstrap, dtype=np.float64)
+        self.sums = {name: np.zeros(n_bootstrap, dtype=np.float64) for name in self.columns}
+
+    def update(self, columns: Dict[str, np.ndarray]) -> 'PoissonBootstrapState':
+        """
+        Ajoute un morceau d'observations à l'état.
+
+        Args:
+            columns: Valeurs du morceau pour chaque colonne suivie
+        """
+        values = {name: np.asarray(columns[name], dtype=np.float64) for name in self.columns}
+        n = len(next(iter(values.values()))) if values else 0
+        rows_per_batch = max(1, self.max_batch_bytes // (_BYTES_PER_WEIGHT * self.n_bootstrap))
+
+        for start in range(0, n, rows_per_batch):
+            stop = min(start + rows_per_batch, n)
+            weights = self.rng.poisson(1.0, size=(self.n_bootstrap, stop - start))
+            self.weights += weights.sum(axis=1)
+            for name, col in values.items():
+                self.sums[name] += weights @ col[start:stop]
+
+        self.n_rows += n
+        for name, col in values.items():
+            self.totals[name] += float(col.sum())
+        return self
+
+    def merge(self, other: 'PoissonBootstrapState') -> 'PoissonBootstrapState':
+        """Fusionne l'état d'un autre morceau ou d'un autre worker dans celui-ci."""
+        if other.n_bootstrap != self.n_bootstrap or other.columns != self.columns:
+            raise ValueError("Impossible de fusionner des états bootstrap incompatibles")
+        self.n_rows += other.n_rows
+        self.weights += other.weights
+        for name in self.columns:
+            self.totals[name] += other.totals[name]
+            self.sums[name] += other.sums[name]
+        return self
+
+    def to_replicates(self) -> ReplicateSums:
+        """Expose l'état sous la même forme que les rééchantillonnages multinomiaux."""
+        return ReplicateSums(self.weights, self.sums)
+
+
+class BootstrapEngine:
+    """
+    Moteur de bootstrap vectorisé.
+
+    Tire tous les rééchantillonnages sous forme de matrice d'indices
+    (n_rééchantillonnages x n_observations) au lieu d'une boucle Python,
+    en découpant le travail en lots pour respecter un plafond mémoire.
+    """
+
+    def __init__(
+        self,
+        n_bootstrap: int = DEFAULT_N_BOOTSTRAP,
+        max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+        random_state: Optional[int] = None
+    ):
+        if n_bootstrap < 1:
+            raise ValueError("n_bootstrap doit être supérieur ou égal à 1")
+        self.n_bootstrap = n_bootstrap
+        self.max_batch_bytes = max_batch_bytes
+        self.rng = np.random.default_rng(random_state)
+
+    def plan(self, n_rows: int, size: Optional[int] = None) -> ResamplePlan:
+        """Crée un plan de rééchantillonnage avec une graine tirée du générateur du moteur."""
+        seed = int(self.rng.integers(0, 2**63 - 1))
+        return ResamplePlan(n_rows, self.n_bootstrap, seed, self.max_batch_bytes, size=size)
+
+    def poisson_state(self, columns: Iterable[str]) -> PoissonBootstrapState:
+        """Crée un état de bootstrap de Poisson avec une graine tirée du générateur du moteur."""
+        seed = int(self.rng.integers(0, 2**63 - 1))
+        return PoissonBootstrapState(columns, self.n_bootstrap, self.max_batch_bytes, seed=seed)
+
+    def replicates(self, values: np.ndarray, statistic: str = 'mean', size: Optional[int] = None) -> np.ndarray:
+        """
+        Calcule la statistique de chaque rééchantillonnage.
+
+        Args:
+            values: Observations à rééchantillonner
+            statistic: 'mean' ou 'sum'
+            size: Taille de chaque rééchantillon (par défaut len(values))
+
+        Returns:
+            np.ndarray: Tableau de n_bootstrap statistiques
+        """
+        if statistic not in ('mean', 'sum'):
+            raise ValueError(f"Statistique non supportée: {statistic}")
+        replicate_sums = self.plan(len(values), size=size).replicate_sums({'values': values})
+        return replicate_sums.mean('values') if statistic == 'mean' else replicate_sums.total('values')
+
+    @staticmethod
+    def relative_diff(var_stats: np.ndarray, ctrl_stats: np.ndarray) -> np.ndarray:
+        """Différence relative en pourcentage, 0 lorsque la statistique contrôle est nulle."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            diffs = (var_stats - ctrl_stats) / ctrl_stats * 100
+        return np.where(ctrl_stats != 0, diffs, 0.0)
+
+    @staticmethod
+    def percentile_interval(diffs: np.ndarray, confidence_level: float = 0.95) -> Tuple[float, float]:
+        """Intervalle par la méthode des percentiles."""
+        alpha = (1 - confidence_level) / 2 * 100
+        lower, upper = np.percentile(diffs, [alpha, 100 - alpha])
+        return float(lower), float(upper)
+
+    def interval_from_replicates(
+        self,
+        var_stats: np.ndarray,
+        ctrl_stats: np.ndarray,
+        confidence_level: float = 0.95
+    ) -> Tuple[float, float]:
+        """Intervalle de la différence relative à partir de statistiques déjà rééchantillonnées."""
+        return self.percentile_interval(self.relative_diff(var_stats, ctrl_stats), confidence_level)
+
+    @staticmethod
+    def confidence_from_replicates(var_stats: np.ndarray, ctrl_stats: np.ndarray) -> float:
+        """
+        Confiance (en %) que la variation diffère du contrôle : 1 - p-value bilatérale
+        du bootstrap, p = 2 x la part des rééchantillonnages du côté opposé à zéro.
+        """
+        diffs = np.asarray(var_stats, dtype=np.float64) - np.asarray(ctrl_stats, dtype=np.float64)
+        if len(diffs) == 0:
+            return 0.0
+        p_value = min(1.0, 2 * min(float(np.mean(diffs <= 0)), float(np.mean(diffs >= 0))))
+        return (1 - p_value) * 100
+
+    def relative_diff_interval(
+        self,
+        var_values: np.ndarray,
+        ctrl_values: np.ndarray,
+        statistic: str = 'mean',
+        var_scale: float = 1.0,
+        ctrl_scale: float = 1.0,
+        ctrl_size: Optional[int] = None,
+        confidence_level: float = 0.95
+    ) -> Tuple[float, float]:
+        """
+        Intervalle de confiance bootstrap de la différence relative (en %) variation vs contrôle.
+
+        Args:
+            var_values: Observations de la variation
+            ctrl_values: Observations du contrôle
+            statistic: 'mean' ou 'sum'
+            var_scale: Diviseur appliqué à la statistique de la variation (ex: nombre d'utilisateurs)
+            ctrl_scale: Diviseur appliqué à la statistique du contrôle
+            ctrl_size: Taille des rééchantillons du contrôle (par défaut len(ctrl_values))
+            confidence_level: Niveau de confiance de l'intervalle
+
+        Returns:
+            Tuple[float, float]: (borne inférieure, borne supérieure)
+        """
+        var_stats = self.replicates(var_values, statistic) / var_scale
+        ctrl_stats = self.replicates(ctrl_values, statistic, size=ctrl_size) / ctrl_scale
+        diffs = self.relative_diff(var_stats, ctrl_stats)
+        return self.percentile_interval(diffs, confidence_level)
@@ -0,0 +1,202 @@
+# chunked_aggregation.py
+
+import heapq
+import json
+import os
+import pickle
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional
+import logging
+from api.processors.aggregation import aggregate_items
+
+logger = logging.getLogger(__name__)
+
+AGGREGATION_MODES = ('sorted', 'hash')
+
+# Nombre de partitions du mode 'hash' : chaque partition doit tenir en mémoire
+AGGREGATION_SPILL_PARTITIONS = int(os.getenv("AGGREGATION_SPILL_PARTITIONS", 64))
+
+# Répertoire des fichiers de débordement (par défaut celui du système)
+AGGREGATION_SPILL_DIR = os.getenv("AGGREGATION_SPILL_DIR") or None
+
+# Nombre de transactions agrégées relues à la fois par partition lors de la fusion
+MERGE_BATCH_ROWS = 10_000
+
+# Nombre de lignes NDJSON écrites à la fois
+NDJSON_WRITE_ROWS = 1000
+
+KEY_COLUMN = 'transaction_id'
+
+
+class UnsortedChunksError(ValueError):
+    """Le mode 'sorted' a reçu des lignes qui ne sont pas triées par transaction_id."""
+
+
+def _keyed_rows(chunk: pd.DataFrame) -> pd.DataFrame:
+    # groupby ignore les transactions sans identifiant : elles sont écartées dès la lecture
+    return chunk[chunk[KEY_COLUMN].notna()]
+
+
+def _check_sorted(keys: np.ndarray, previous: Any) -> None:
+    if len(keys) == 0:
+        return
+    if previous is not None and keys[0] < previous:
+        raise UnsortedChunksError(f"Rows are not sorted by {KEY_COLUMN}: {keys[0]!r} after {previous!r}")
+    decreasing = np.flatnonzero(keys[1:] < keys[:-1])
+    if len(decreasing):
+        position = int(decreasing[0])
+        raise UnsortedChunksError(
+            f"Rows are not sorted by {KEY_COLUMN}: {keys[position + 1]!r} after {keys[position]!r}"
+        )
+
+
+def iter_sorted_aggregates(chunks: Iterable[pd.DataFrame]) -> Iterator[Dict[str, Any]]:
+    """
+    Agrège des morceaux triés par transaction_id, en mémoire bornée.
+
+    Les lignes de la dernière transaction de chaque morceau sont reportées
+    sur le morceau suivant : chaque transaction est agrégée en une fois, avec
+    toutes ses lignes dans leur ordre d'origine, ce qui donne exactement le
+    résultat de aggregate_items sur les données complètes.
+
+    Raises:
+        UnsortedChunksError: Clés non triées (utiliser le mode 'hash')
+    """
+    carry: Optional[pd.DataFrame] = None
+    previous = None
+    for chunk in chunks:
+        chunk = _keyed_rows(chunk)
+        if chunk.empty:
+            continue
+        keys = chunk[KEY_COLUMN].to_numpy()
+        _check_sorted(keys, previous)
+        previous = keys[-1]
+
+        pending = chunk if carry is None else pd.concat([carry, chunk], ignore_index=True)
+        # Les lignes de la dernière clé sont contiguës en fin de morceau
+        tail_start = int(np.searchsorted(pending[KEY_COLUMN].to_numpy() == previous, True))
+        carry = pending.iloc[tail_start:]
+        if tail_start:
+            yield from aggregate_items(pending.iloc[:tail_start].copy()).to_dict('records')
+
+    if carry is not None and not carry.empty:
+        yield from aggregate_items(carry.copy()).to_dict('records')
+
+
+def _partition_of(keys: pd.Series, partitions: int) -> np.ndarray:
+    values = keys.to_numpy()
+    # Une même clé lue comme entier dans un morceau et flottant dans un autre tombe dans la même partition
+    if pd.api.types.is_numeric_dtype(keys.dtype):
+        values = values.astype(np.float64)
+    else:
+        values = values.astype(object)
+    return (pd.util.hash_array(values) % np.uint64(partitions)).astype(np.int64)
+
+
+def _read_pickles(handle: BinaryIO) -> Iterator[Any]:
+    handle.seek(0)
+    while True:
+        try:
+            yield pickle.load(handle)
+        except EOFError:
+            return
+
+
+def _iter_spilled_records(handle: BinaryIO) -> Iterator[Dict[str, Any]]:
+    for batch in _read_pickles(handle):
+        yield from batch
+
+
+def iter_hash_aggregates(
+    chunks: Iterable[pd.DataFrame],
+    partitions: int = AGGREGATION_SPILL_PARTITIONS,
+    spill_dir: Optional[str] = AGGREGATION_SPILL_DIR
+) -> Iterator[Dict[str, Any]]:
+    """
+    Agrège des morceaux dans un ordre quelconque, en mémoire bornée.
+
+    1. Chaque ligne est écrite sur disque dans la partition hash(transaction_id) :
+       toutes les lignes d'une transaction se retrouvent dans la même partition,
+       dans leur ordre d'origine.
+    2. Chaque partition est agrégée en mémoire (aggregate_items), son résultat
+       trié est réécrit sur disque par lots.
+    3. Les résultats des partitions sont fusionnés par heapq.merge sur
+       transaction_id, ce qui redonne l'ordre trié du chemin en mémoire.
+
+    La mémoire utilisée est celle d'une partition (environ 1/partitions des
+    lignes) plus un lot de MERGE_BATCH_ROWS transactions par partition.
+    """
+    if partitions < 1:
+        raise ValueError(f"partitions must be >= 1: {partitions}")
+
+    with tempfile.TemporaryDirectory(prefix='aggregation-', dir=spill_dir) as directory:
+        spills: List[Optional[BinaryIO]] = [None] * partitions
+        outputs: List[BinaryIO] = []
+        try:
+            # 1. Débordement des lignes par partition
+            for chunk in chunks:
+                chunk = _keyed_rows(chunk)
+                if chunk.empty:
+                    continue
+                partition_of = _partition_of(chunk[KEY_COLUMN], partitions)
+                order = np.argsort(partition_of, kind='stable')
+                bounds = np.searchsorted(partition_of[order], np.arange(partitions + 1))
+                for partition in np.flatnonzero(np.diff(bounds)):
+                    if spills[partition] is None:
+                        spills[partition] = open(os.path.join(directory, f"rows-{partition}.pkl"), 'w+b')
+                    rows = chunk.iloc[order[bounds[partition]:bounds[partition + 1]]]
+                    pickle.dump(rows, spills[partition], protocol=pickle.HIGHEST_PROTOCOL)
+
+            # 2. Agrégation de chaque partition, résultat trié réécrit par lots
+            for partition, handle in enumerate(spills):
+                if handle is None:
+                    continue
+                rows = pd.concat(list(_read_pickles(handle)), ignore_index=True)
+                handle.close()
+                os.remove(handle.name)
+                spills[partition] = None
+
+                records = aggregate_items(rows).to_dict('records')
+                del rows
+                output = open(os.path.join(directory, f"aggregated-{partition}.pkl"), 'w+b')
+                outputs.append(output)
+                for start in range(0, len(records), MERGE_BATCH_ROWS):
+                    pickle.dump(records[start:start + MERGE_BATCH_ROWS], output, protocol=pickle.HIGHEST_PROTOCOL)
+
+            # 3. Fusion des partitions triées
+            yield from heapq.merge(
+                *(_iter_spilled_records(output) for output in outputs),
+                key=lambda record: record[KEY_COLUMN]
+            )
+        finally:
+            for handle in spills + outputs:
+                if handle is not None:
+                    handle.close()
+
+
+def _json_line(record: Dict[str, Any]) -> str:
+    # NaN n'existe pas en JSON : valeur manquante -> null
+    return json.dumps(
+        {key: None if isinstance(value, float) and np.isnan(value) else value for key, value in record.items()},
+        ensure_ascii=False,
+        default=str
+    )
+
+
+def write_ndjson(records: Iterable[Dict[str, Any]], path: str) -> int:
+    """Écrit les enregistrements en NDJSON (une transaction par ligne) et retourne leur nombre."""
+    written = 0
+    with open(path, 'w', encoding='utf-8') as out:
+        batch: List[str] = []
+        for record in records:
+            batch.append(_json_line(record))
+            if len(batch) == NDJSON_WRITE_ROWS:
+                out.write('\n'.join(batch) + '\n')
+                written += len(batch)
+                batch = []
+        if batch:
+            out.write('\n'.join(batch) + '\n')
+            written += len(batch)
+    return written
@@ -0,0 +1,134 @@
+# compact_schema.py
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterable, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Compacte les DataFrames nettoyés (sessions) et les tables virtuelles
+COMPACT_FRAMES = os.getenv("COMPACT_FRAMES", "1").lower() not in ('0', 'false', 'no')
+
+# Une colonne texte devient catégorielle si ses valeurs distinctes représentent
+# au plus cette part des lignes
+CATEGORY_MAX_RATIO = float(os.getenv("CATEGORY_MAX_RATIO", 0.5))
+
+# Identifiants à forte cardinalité : restent du texte, mais chaque valeur
+# distincte n'est plus stockée qu'une fois
+INTERNED_COLUMNS = ('transaction_id',)
+
+# Les entiers ne sont réduits en int32 que si le produit de deux valeurs tient
+# encore en int32 (pas de dépassement dans les calculs élément par élément)
+_INT32_SAFE_MAX = 46_340
+
+
+def object_bytes(values: np.ndarray) -> int:
+    """
+    Taille réelle d'une colonne d'objets : un pointeur par ligne plus chaque
+    objet distinct compté une fois (memory_usage(deep=True) compte un objet
+    partagé autant de fois qu'il est référencé).
+    """
+    ids = np.fromiter(map(id, values), dtype=np.int64, count=len(values))
+    _, first = np.unique(ids, return_index=True)
+    return int(values.nbytes + sum(map(sys.getsizeof, values[first])))
+
+
+def column_bytes(series: pd.Series) -> int:
+    """Taille mémoire d'une colonne (chaînes et modalités comprises, objets partagés comptés une fois)."""
+    if series.dtype == object:
+        return object_bytes(series.to_numpy())
+    return int(series.memory_usage(index=False, deep=True))
+
+
+def _intern(series: pd.Series) -> pd.Series:
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    lookup = np.empty(len(uniques) + 1, dtype=object)
+    lookup[:-1] = uniques
+    lookup[-1] = np.nan
+    return pd.Series(lookup[codes], index=series.index, name=series.name)
+
+
+def _compact_column(series: pd.Series, category_max_ratio: float) -> pd.Series:
+    dtype = series.dtype
+    if dtype == object:
+        if series.name in INTERNED_COLUMNS:
+            return _intern(series)
+        # Seul le texte devient catégoriel : des nombres stockés en objets doivent rester convertibles
+        if pd.api.types.infer_dtype(series, skipna=True) not in ('string', 'empty'):
+            return series
+        n_unique = series.nunique(dropna=False)
+        if len(series) and n_unique <= category_max_ratio * len(series):
+            try:
+                return series.astype('category')
+            except TypeError:
+                # Valeurs non ordonnables (types mélangés) : la colonne reste en texte
+                return series
+        return series
+    if pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype) and dtype.itemsize > 4:
+        if len(series) == 0 or int(np.abs(series.to_numpy()).max()) <= _INT32_SAFE_MAX:
+            return series.astype(np.int32)
+    # Les flottants restent en float64 : en float32, les montants perdent leurs centimes
+    return series
+
+
+def compact_frame(df: pd.DataFrame, category_max_ratio: float = CATEGORY_MAX_RATIO) -> pd.DataFrame:
+    """
+    Représentation compacte d'un DataFrame, aux valeurs identiques :
+
+    - texte à faible cardinalité (variation, device_category, item_*) -> category
+    - transaction_id -> texte dédoublonné (une seule chaîne par identifiant)
+    - entiers int64 -> int32 lorsque c'est sans risque
+    - flottants inchangés
+    """
+    if df.empty:
+        return df
+    return pd.DataFrame(
+        {name: _compact_column(df[name], category_max_ratio) for name in df.columns},
+        index=df.index,
+        copy=False
+    )
+
+
+def compact_frame_with_report(df: pd.DataFrame, category_max_ratio: float = CATEGORY_MAX_RATIO) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    compact_frame et rapport mémoire par colonne (types et octets avant / après).
+
+    Returns:
+        Tuple[pd.DataFrame, Dict[str, Any]]: (DataFrame compacté, rapport mémoire)
+    """
+    compacted = compact_frame(df, category_max_ratio)
+    columns = {
+        str(name): {
+            'dtype_before': str(df[name].dtype),
+            'dtype_after': str(compacted[name].dtype),
+            'bytes_before': column_bytes(df[name]),
+            'bytes_after': column_bytes(compacted[name])
+        }
+        for name in df.columns
+    }
+    return compacted, memory_report(columns)
+
+
+def memory_report(columns: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    bytes_before = sum(column['bytes_before'] for column in columns.values())
+    bytes_after = sum(column['bytes_after'] for column in columns.values())
+    return {
+        'bytes_before': bytes_before,
+        'bytes_after': bytes_after,
+        'ratio': round(bytes_after / bytes_before, 4) if bytes_before else None,
+        'columns': columns
+    }
+
+
+def frames_memory(frames: Iterable[Tuple[str, pd.DataFrame]]) -> Dict[str, Any]:
+    """Rapport mémoire (octets par colonne, types actuels) de DataFrames déjà en place."""
+    result = {}
+    for name, df in frames:
+        if df is None:
+            continue
+        columns = {str(column): {'dtype': str(df[column].dtype), 'bytes': column_bytes(df[column])} for column in df.columns}
+        result[name] = {'rows': len(df), 'bytes': sum(column['bytes'] for column in columns.values()), 'columns': columns}
+    return result
@@ -0,0 +1,256 @@
+# currency.py
+
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+import logging
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Devises dont les exports utilisent habituellement la virgule comme séparateur décimal
+COMMA_DECIMAL_CURRENCIES = {
+    'EUR', 'BRL', 'ARS', 'CLP', 'COP', 'DKK', 'NOK', 'SEK', 'ISK', 'PLN', 'CZK',
+    'HUF', 'RON', 'BGN', 'HRK', 'RSD', 'TRY', 'RUB', 'UAH', 'IDR', 'VND'
+}
+
+# Nombre de cellules converties par bloc (borne la taille de la matrice de caractères)
+PARSE_CHUNK_ROWS = 100_000
+
+# Au-delà de 18 chiffres, la mantisse ne tient plus dans un int64
+_MAX_DIGITS = 18
+
+_DOT, _COMMA, _MINUS, _OPEN_PAREN = ord('.'), ord(','), ord('-'), ord('(')
+_ZERO = ord('0')
+
+# Classes de caractères
+_OTHER, _DIGIT, _DOT_CHAR, _COMMA_CHAR, _BLANK, _MARK, _SIGN, _CLOSE, _AFFIX, _EXPONENT = range(10)
+
+
+def _character_classes() -> np.ndarray:
+    """Classe de chaque caractère du plan multilingue de base (les autres sont _OTHER)."""
+    classes = np.full(0x10000, _OTHER, dtype=np.int8)
+    # Lettres (codes ISO, 'kr', 'zł') et symboles monétaires admis autour du nombre
+    for code in range(0x10000):
+        if unicodedata.category(chr(code)) in ('Lu', 'Ll', 'Lt', 'Lo', 'Sc'):
+            classes[code] = _AFFIX
+    classes[_ZERO:_ZERO + 10] = _DIGIT
+    classes[_DOT] = _DOT_CHAR
+    classes[_COMMA] = _COMMA_CHAR
+    classes[[0, ord(' '), ord('\t'), ord('\n'), ord('\r'), 0xA0, 0x202F]] = _BLANK
+    # Séparateurs de milliers sans ambiguïté (apostrophe suisse)
+    classes[[ord("'"), 0x2019]] = _MARK
+    classes[[_MINUS, ord('+'), _OPEN_PAREN]] = _SIGN
+    classes[ord(')')] = _CLOSE
+    classes[[ord('e'), ord('E')]] = _EXPONENT
+    return classes
+
+
+_CLASSES = _character_classes()
+
+# Phases de lecture d'une cellule
+_PREFIX, _NUMBER, _SUFFIX = 0, 1, 2
+# Nature du dernier séparateur lu
+_NO_SEP, _DOT_SEP, _COMMA_SEP, _GROUP_SEP = 0, 1, 2, 3
+
+
+def _parse_text_block(text: np.ndarray, comma_decimal: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Convertit un bloc de chaînes en float en parcourant leur matrice de caractères.
+
+    Chaque colonne de caractères est traitée pour toutes les cellules à la fois :
+    la mantisse entière est accumulée chiffre par chiffre et la position des
+    séparateurs est mémorisée en nombre de chiffres déjà lus.
+
+    Une cellule est lue en trois phases : préfixe (devise, blancs, un signe
+    '-', '+' ou '('), nombre (chiffres et séparateurs), suffixe (devise,
+    blancs, ')'). Elle est invalide si un autre caractère apparaît, si des
+    chiffres suivent le suffixe ('3 items @ 4.00'), si deux séparateurs se
+    suivent ou terminent le nombre ('12.5.'), si le séparateur décimal est
+    répété ou n'est pas le dernier ('1.23,4.5'), si un groupe de milliers
+    ne compte pas 3 chiffres ('1,2,3') ou si le signe est répété ('--5').
+
+    Args:
+        text: Chaînes brutes
+        comma_decimal: True si une virgule seule est décimale par défaut
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (valeurs float avec NaN pour les
+        cellules invalides ; masque des cellules vides ; masque des cellules en
+        notation scientifique, à confirmer par pandas)
+    """
+    chars = np.asarray(text, dtype=str)
+    n = len(chars)
+    width = chars.dtype.itemsize // 4
+    codes = chars.view(np.uint32).reshape(n, width) if width else np.zeros((n, 0), dtype=np.uint32)
+
+    mantissa = np.zeros(n, dtype=np.int64)
+    n_digits = np.zeros(n, dtype=np.int64)
+    n_visible = np.zeros(n, dtype=np.int64)
+    n_dots = np.zeros(n, dtype=np.int64)
+    n_commas = np.zeros(n, dtype=np.int64)
+    n_separators = np.zeros(n, dtype=np.int64)
+    digits_at_dot = np.zeros(n, dtype=np.int64)
+    digits_at_comma = np.zeros(n, dtype=np.int64)
+    # Chiffres du groupe en cours et du premier groupe (avant le premier séparateur)
+    group_digits = np.zeros(n, dtype=np.int64)
+    first_group = np.zeros(n, dtype=np.int64)
+    last_separator = np.full(n, _NO_SEP, dtype=np.int8)
+    after_separator = np.zeros(n, dtype=bool)
+    pending_blank = np.zeros(n, dtype=bool)
+    phase = np.full(n, _PREFIX, dtype=np.int8)
+    n_signs = np.zeros(n, dtype=np.int64)
+    negative = np.zeros(n, dtype=bool)
+    open_paren = np.zeros(n, dtype=bool)
+    close_paren = np.zeros(n, dtype=bool)
+    exponent = np.zeros(n, dtype=bool)
+    malformed = np.zeros(n, dtype=bool)
+
+    def separator(mask: np.ndarray, kind: int) -> None:
+        nonlocal malformed, first_group, group_digits, last_separator, after_separator
+        # Deux séparateurs consécutifs ; groupe intermédiaire différent de 3 chiffres
+        malformed |= mask & (after_separator | ((n_separators > 0) & (group_digits != 3)))
+        first_group = np.where(mask & (n_separators == 0), group_digits, first_group)
+        n_separators[mask] += 1
+        last_separator = np.where(mask, kind, last_separator)
+        group_digits = np.where(mask, 0, group_digits)
+        after_separator = after_separator | mask
+
+    beyond_bmp = bool(codes.size) and bool((codes > 0xFFFF).any())
+    for column in codes.T:
+        kind = _CLASSES[np.minimum(column, 0xFFFF)]
+        if beyond_bmp:
+            kind = np.where(column > 0xFFFF, _OTHER, kind)
+        is_digit = kind == _DIGIT
+        is_dot = kind == _DOT_CHAR
+        is_comma = kind == _COMMA_CHAR
+        is_blank = kind == _BLANK
+        is_mark = kind == _MARK
+        is_sign = kind == _SIGN
+        is_close = kind == _CLOSE
+        is_exponent = kind == _EXPONENT
+        # 'e' / 'E' restent des lettres hors du nombre ('EUR')
+        is_affix = (kind == _AFFIX) | is_exponent
+        n_visible += ~is_blank
+
+        in_prefix = phase == _PREFIX
+        in_number = phase == _NUMBER
+        in_suffix = phase == _SUFFIX
+
+        # Préfixe : devise, blancs et un seul signe ; un séparateur y ouvre le nombre ('.50')
+        malformed |= in_prefix & ~(is_digit | is_dot | is_comma | is_blank | is_affix | is_sign)
+        n_signs += in_prefix & is_sign
+        negative |= in_prefix & ((column == _MINUS) | (column == _OPEN_PAREN))
+        open_paren |= in_prefix & (column == _OPEN_PAREN)
+
+        # Nombre : un blanc suivi d'un chiffre est un séparateur de milliers ('1 234,56')
+        exponent |= in_number & is_exponent & ~after_separator & ~pending_blank
+        separator(in_number & is_digit & pending_blank, _GROUP_SEP)
+        malformed |= in_number & (is_dot | is_comma) & pending_blank
+        separator((in_prefix | in_number) & is_dot, _DOT_SEP)
+        separator((in_prefix | in_number) & is_comma, _COMMA_SEP)
+        separator(in_number & is_mark, _GROUP_SEP)
+        ends_number = in_number & ~(is_digit | is_dot | is_comma | is_mark)
+        malformed |= ends_number & (after_separator | ~(is_blank | is_affix | is_close))
+        pending_blank = np.where(in_number & is_blank, True, np.where(in_number, False, pending_blank))
+
+        # Suffixe : devise, blancs et ')' uniquement
+        malformed |= in_suffix & ~(is_blank | is_affix | is_close)
+        malformed |= (in_number | in_suffix) & is_close & close_paren
+        close_paren |= (in_number | in_suffix) & is_close
+
+        mantissa = np.where(is_digit, mantissa * 10 + (column.astype(np.int64) - _ZERO), mantissa)
+        n_digits += is_digit
+        group_digits += is_digit
+        after_separator &= ~is_digit
+        n_dots += (in_prefix | in_number) & is_dot
+        n_commas += (in_prefix | in_number) & is_comma
+        digits_at_dot = np.where((in_prefix | in_number) & is_dot, n_digits, digits_at_dot)
+        digits_at_comma = np.where((in_prefix | in_number) & is_comma, n_digits, digits_at_comma)
+
+        phase = np.where(in_prefix & (is_digit | is_dot | is_comma), _NUMBER, phase)
+        phase = np.where(ends_number & ~is_blank, _SUFFIX, phase).astype(np.int8)
+
+    # Nombre terminé par un séparateur, signe répété, parenthèses non appariées
+    malformed |= after_separator | (n_signs > 1) | (open_paren != close_paren)
+
+    # Choix du séparateur décimal cellule par cellule : au plus un, et en dernier
+    after_dot = n_digits - digits_at_dot
+    after_comma = n_digits - digits_at_comma
+    has_dot, has_comma = n_dots > 0, n_commas > 0
+    leading = (first_group == 0) & (n_separators > 0)
+    comma_is_decimal = (
+        (has_dot & has_comma & (last_separator == _COMMA_SEP))
+        | (~has_dot & (n_commas == 1) & (comma_decimal | (after_comma != 3) | leading))
+    )
+    dot_is_decimal = (
+        (has_dot & has_comma & (last_separator == _DOT_SEP))
+        | (~has_comma & (n_dots == 1) & (~(comma_decimal & (after_dot == 3)) | leading))
+    )
+    has_decimal = comma_is_decimal | dot_is_decimal
+    malformed |= comma_is_decimal & ((n_commas > 1) | (last_separator != _COMMA_SEP))
+    malformed |= dot_is_decimal & ((n_dots > 1) | (last_separator != _DOT_SEP))
+    malformed |= has_dot & has_comma & ~has_decimal
+
+    # Milliers : premier groupe de 1 à 3 chiffres, dernier groupe de 3 sans partie décimale
+    thousands = n_separators - has_decimal
+    malformed |= (thousands > 0) & ((first_group < 1) | (first_group > 3))
+    malformed |= (thousands > 0) & ~has_decimal & (group_digits != 3)
+    fraction_digits = np.where(comma_is_decimal, after_comma, np.where(dot_is_decimal, after_dot, 0))
+
+    # La division d'une mantisse exacte par 10**k est correctement arrondie, comme float('m.k')
+    values = mantissa / (10.0 ** fraction_digits)
+    values = np.where(negative, -values, values)
+    valid = (n_digits > 0) & (n_digits <= _MAX_DIGITS) & ~malformed & ~exponent
+    return np.where(valid, values, np.nan), n_visible == 0, exponent & (n_digits > 0)
+
+
+def parse_revenue_series(series: pd.Series, currency: Optional[str] = None) -> Tuple[pd.Series, pd.Series]:
+    """
+    Convertit une colonne de revenus en float, de manière vectorisée.
+
+    Gère les symboles monétaires, les séparateurs de milliers, la virgule
+    décimale et les montants négatifs ('-12' ou '(12)') ; les cellules mal
+    formées ('3 items @ 4.00', '1,2,3', '--5') sont invalides. Lorsqu'un seul
+    séparateur est présent, la devise tranche l'ambiguïté : pour une devise
+    à virgule décimale, '1,234' vaut 1.234 et '1.234' vaut 1234.
+
+    Args:
+        series: Colonne brute (nombres et/ou chaînes)
+        currency: Code de la devise de la requête
+
+    Returns:
+        Tuple[pd.Series, pd.Series]: (valeurs float, NaN pour les cellules vides
+        ou invalides ; masque des cellules invalides)
+    """
+    comma_decimal = (currency or '').upper() in COMMA_DECIMAL_CURRENCIES
+
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.astype(np.float64)
+        return values, pd.Series(False, index=series.index)
+
+    raw = series.to_numpy(dtype=object)
+    is_text = np.fromiter((type(cell) is str for cell in raw), dtype=bool, count=len(raw))
+    missing = series.isna().to_numpy()
+    parsed = np.full(len(raw), np.nan)
+
+    # Cellules déjà numériques : conversion directe, sans passer par le texte
+    numeric_rows = np.flatnonzero(~is_text & ~missing)
+    if len(numeric_rows):
+        parsed[numeric_rows] = pd.to_numeric(pd.Series(raw[numeric_rows]), errors='coerce').to_numpy(dtype=np.float64)
+
+    text_rows = np.flatnonzero(is_text)
+    for start in range(0, len(text_rows), PARSE_CHUNK_ROWS):
+        rows = text_rows[start:start + PARSE_CHUNK_ROWS]
+        values, blank, exponent = _parse_text_block(raw[rows], comma_decimal)
+        parsed[rows] = values
+        missing[rows[blank]] = True
+        if exponent.any():
+            # Notation scientifique ('1e3') : le parseur de pandas fait foi (NaN s'il échoue)
+            scientific = rows[exponent]
+            parsed[scientific] = pd.to_numeric(pd.Series(raw[scientific]).str.strip(), errors='coerce').to_numpy(dtype=np.float64)
+
+    parsed[missing] = np.nan
+    values = pd.Series(parsed, index=series.index)
+    invalid = pd.Series(np.isnan(parsed) & ~missing, index=series.index)
+    return values, invalid
@@ -2,20 +2,53 @@
 
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List, Union, Tuple, Optional
+from typing import Dict, Any, List, Union, Tuple, Optional, Iterable, Iterator
 import logging
 import re
 from decimal import Decimal
 import scipy.stats as stats
+from api.processors.bootstrap import BootstrapEngine, ReplicateSums, PoissonBootstrapState
+from api.processors.segment_index import SegmentIndex, FILTER_COLUMNS
+from api.processors.segment_cube import build_segment_cube
+from api.processors.currency import parse_revenue_series
+from api.processors.file_loader import read_frame, iter_frame_chunks, UPLOAD_CHUNK_ROWS
+from api.processors.aggregation import group_codes, concat_unique_labels, aggregate_items
+from api.processors.chunked_aggregation import iter_sorted_aggregates, iter_hash_aggregates, write_ndjson, AGGREGATION_MODES, KEY_COLUMN
+from api.processors.analysis_context import AnalysisContext, detect_control
+from api.processors.rate_tests import RateTestEngine
+from api.processors.arm_comparison import compare_arms, CORRECTIONS
+from api.processors.rank_engine import RankEngine, ArmPair, MannWhitneyResult, mann_whitney, mann_whitney_samples
+from api.processors.moments import RunningMoments
+from api.processors.incremental import IncrementalTest, ArmState, RUN_COLUMNS
+from api.processors.shard_summary import ShardSummary, SKETCH_RELATIVE_ACCURACY
+from api.processors.stage_timing import stage, timed_stage
+from api.processors.compact_schema import compact_frame, compact_frame_with_report, COMPACT_FRAMES
+from api.processors.revenue_buckets import explicit_edges, auto_edges, bucket_counts, bucket_labels, wilson_interval, DEFAULT_BINS
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Modes de bootstrap disponibles : rééchantillonnage multinomial classique
+# ou poids de Poisson accumulés par morceaux de la table virtuelle en mémoire
+# (les exports plus grands que la mémoire passent par calculate_streaming_revenue_file)
+BOOTSTRAP_MODES = ('multinomial', 'poisson')
+
+# Nombre de lignes de la table virtuelle traitées par morceau en mode flux
+STREAM_CHUNK_ROWS = 100_000
+
+# Sections calculables par run_pipeline
+PIPELINE_SECTIONS = ('overview', 'revenue', 'aggregation', 'segments')
+
 class DataProcessor:
-    def __init__(self):
+    def __init__(self, bootstrap: Optional[BootstrapEngine] = None, rate_tests: Optional[RateTestEngine] = None):
         self.overall_data = None
         self.transaction_data = None
+        self.bootstrap = bootstrap or BootstrapEngine()
+        # Tests de taux : Fisher exact pour les petits effectifs, chi-deux au-delà
+        self.rate_tests = rate_tests or RateTestEngine()
+        # Cellules de revenus invalides rencontrées lors du nettoyage, par colonne
+        self.revenue_parse_report: Dict[str, Dict[str, Any]] = {}
         
     def clean_revenue(self, value: str) -> float:
         """Nettoie et convertit les valeurs de revenus en float."""
@@ -32,16 +65,19 @@ class DataProcessor:
         except ValueError:
             return 0.0
 
-    def clean_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+    def clean_dataframe(self, df: pd.DataFrame, currency: Optional[str] = None) -> pd.DataFrame:
         """Nettoie et prépare le dataframe."""
         try:
             # Copie pour éviter de modifier l'original
             df = df.copy()
             
-            # Convertit les colonnes de revenus si elles existent
+            # Convertit les colonnes de revenus si elles existent (parsing vectorisé par colonne)
             revenue_columns = [col for col in df.columns if 'revenue' in str(col).lower()]
             for col in revenue_columns:
-                df[col] = df[col].apply(self.clean_revenue)
+                values, invalid = parse_revenue_series(df[col], currency)
+                if invalid.any():
+                    self._record_invalid_revenue(str(col), df[col], invalid)
+                df[col] = values.fillna(0.0)
                 
             # Remplace les valeurs nulles par des valeurs appropriées selon le type
             for column in df.columns:
@@ -55,49 +91,118 @@ class DataProcessor:
             logger.error(f"Erreur lors du nettoyage du DataFrame: {str(e)}")
             raise
 
-    def process_data(self, overall_data: List[Dict[str, Any]], transaction_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _record_invalid_revenue(self, column: str, raw: pd.Series, invalid: pd.Series) -> None:
+        """Conserve le nombre et un échantillon des cellules de revenus non interprétables."""
+        report = self.revenue_parse_report.setdefault(column, {'invalid_count': 0, 'sample': []})
+        report['invalid_count'] += int(invalid.sum())
+        samples = raw[invalid].head(5)
+        report['sample'].extend({'row': int(i), 'value': str(v)} for i, v in samples.items())
+        logger.warning(f"{int(invalid.sum())} invalid revenue cells in column '{column}' (set to 0.0)")
+
+    def process_data(
+        self,
+        overall_data: List[Dict[str, Any]],
+        transaction_data: List[Dict[str, Any]],
+        include_raw_data: bool = True,
+        currency: Optional[str] = None
+    ) -> Dict[str, Any]:
         """Traite les données des deux fichiers."""
+        response, _, _ = self.process_data_with_frames(overall_data, transaction_data, include_raw_data, currency)
+        return response
+
+    def process_data_with_frames(
+        self,
+        overall_data: Union[List[Dict[str, Any]], pd.DataFrame],
+        transaction_data: Union[List[Dict[str, Any]], pd.DataFrame],
+        include_raw_data: bool = True,
+        currency: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], pd.DataFrame, pd.DataFrame]:
+        """Traite les données (lignes JSON ou DataFrames) et retourne aussi les DataFrames nettoyés (pour les sessions)."""
         try:
             # Vérification des données
-            if not overall_data:
+            if self._is_missing(overall_data):
                 raise ValueError("Les données overall_data sont vides")
             
             # Conversion en DataFrames
-            overall_df = pd.DataFrame(overall_data)
-            transaction_df = pd.DataFrame(transaction_data if transaction_data else [])
+            with stage('dataframe'):
+                overall_df = pd.DataFrame(overall_data)
+                transaction_df = pd.DataFrame(transaction_data if not self._is_missing(transaction_data) else [])
             
             logger.info("Colonnes overall: %s", overall_df.columns.tolist())
             logger.info("Types de données overall: %s", overall_df.dtypes.to_dict())
             
             # Nettoyage des données
-            overall_df = self.clean_dataframe(overall_df)
+            self.revenue_parse_report = {}
+            overall_df = self.clean_dataframe(overall_df, currency)
             if not transaction_df.empty:
-                transaction_df = self.clean_dataframe(transaction_df)
+                transaction_df = self.clean_dataframe(transaction_df, currency)
+
+            # Représentation compacte (catégories, entiers réduits, identifiants dédoublonnés)
+            memory = {}
+            if COMPACT_FRAMES:
+                overall_df, memory['overall'] = compact_frame_with_report(overall_df)
+                if not transaction_df.empty:
+                    transaction_df, memory['transaction'] = compact_frame_with_report(transaction_df)
             
             # Stockage des données traitées
             self.overall_data = overall_df
             self.transaction_data = transaction_df
             
             # Préparation de la réponse
-            response = {
-                'raw_data': {
+            response = {}
+            if include_raw_data:
+                response['raw_data'] = {
                     'overall': overall_df.to_dict('records'),
                     'transaction': transaction_df.to_dict('records') if not transaction_df.empty else []
-                },
-                'summary': {
-                    'overall_rows': len(overall_df),
-                    'transaction_rows': len(transaction_df),
-                    'columns_overall': list(overall_df.columns),
-                    'columns_transaction': list(transaction_df.columns) if not transaction_df.empty else []
                 }
+            response['summary'] = {
+                'overall_rows': len(overall_df),
+                'transaction_rows': len(transaction_df),
+                'columns_overall': list(overall_df.columns),
+                'columns_transaction': list(transaction_df.columns) if not transaction_df.empty else []
             }
+            if self.revenue_parse_report:
+                response['summary']['invalid_revenue_cells'] = self.revenue_parse_report
+            if memory:
+                response['summary']['memory'] = memory
             
-            return response
+            return response, overall_df, transaction_df
             
         except Exception as e:
             logger.error(f"Erreur lors du traitement des données: {str(e)}")
             raise
 
+    def process_files_with_frames(
+        self,
+        overall_path: str,
+        transaction_path: Optional[str] = None,
+        include_raw_data: bool = False,
+        currency: Optional[str] = None,
+        overall_filename: Optional[str] = None,
+        transaction_filename: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], pd.DataFrame, pd.DataFrame]:
+        """
+        Traite des exports CSV/Parquet lus directement en DataFrames.
+
+        Args:
+            overall_path: Fichier des données globales
+            transaction_path: Fichier des transactions (optionnel)
+            include_raw_data: Renvoyer les données nettoyées dans la réponse
+            currency: Code de la devise
+            overall_filename: Nom d'origine du fichier global (détection du format)
+            transaction_filename: Nom d'origine du fichier de transactions
+
+        Returns:
+            Tuple[Dict[str, Any], pd.DataFrame, pd.DataFrame]: Réponse, données globales et transactions nettoyées
+        """
+        overall_df = read_frame(overall_path, overall_filename)
+        transaction_df = read_frame(transaction_path, transaction_filename) if transaction_path else pd.DataFrame()
+        response, overall_df, transaction_df = self.process_data_with_frames(
+            overall_df, transaction_df, include_raw_data, currency
+        )
+        response['summary']['source'] = 'upload'
+        return response, overall_df, transaction_df
+
     def aggregate_transactions(self, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         try:
             # Conversion en DataFrame
@@ -106,51 +211,8 @@ class DataProcessor:
                 logger.warning("Aucune donnée à agréger")
                 return []
 
-            # Convertir les colonnes numériques en type numérique
-            df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce')
-            df['revenue'] = pd.to_numeric(df['revenue'], errors='coerce')
-
-            # Créer une colonne pour le nombre de produits uniques
-            df['unique_products'] = 1
-
-            # Définir les colonnes à garder la première valeur
-            first_value_columns = ['variation', 'device_category']
-            
-            # Définir les colonnes à concaténer (uniquement celles qui existent)
-            available_concat_columns = []
-            optional_columns = ['item_category2', 'item_name', 'item_bundle', 'item_name_simple']
-            for col in optional_columns:
-                if col in df.columns:
-                    available_concat_columns.append(col)
-
-            # Créer le dictionnaire d'agrégation avec les colonnes disponibles
-            agg_dict = {
-                'revenue': 'sum',
-                'quantity': 'sum',
-                'unique_products': 'count'  # Compte le nombre de produits uniques
-            }
-
-            # Ajouter les colonnes de première valeur si elles existent
-            for col in first_value_columns:
-                if col in df.columns:
-                    agg_dict[col] = 'first'
-
-            # Ajouter les colonnes à concaténer si elles existent
-            for col in available_concat_columns:
-                agg_dict[col] = lambda x: self._limit_concatenated_items(x)
-
-            # Grouper par transaction_id
-            grouped = df.groupby('transaction_id').agg(agg_dict).reset_index()
+            grouped = aggregate_items(df)
 
-            # Ajouter une colonne pour afficher le nombre total de produits
-            grouped['products_summary'] = grouped.apply(
-                lambda row: f"{int(row['unique_products'])} produit{'s' if row['unique_products'] > 1 else ''} ({int(row['quantity'])} unité{'s' if row['quantity'] > 1 else ''})", 
-                axis=1
-            )
-
-            # Arrondir les valeurs numériques
-            grouped['revenue'] = grouped['revenue'].round(2)
-            
             # Nettoyer le résultat final
             result = grouped.to_dict('records')
             
@@ -163,31 +225,151 @@ class DataProcessor:
             logger.error(f"Erreur lors de l'agrégation des transactions: {str(e)}", exc_info=True)
             raise
 
-    def _limit_concatenated_items(self, items, max_items: int = 3) -> str:
+    def aggregate_transactions_chunked(self, chunks: Iterable[pd.DataFrame], mode: str = 'hash') -> Iterator[Dict[str, Any]]:
         """
-        Limite le nombre d'éléments concaténés et ajoute un compteur si nécessaire.
-        
+        Variante de aggregate_transactions en mémoire bornée, morceau par morceau.
+
         Args:
-            items: Série de valeurs à concaténer
-            max_items: Nombre maximum d'éléments à afficher
-            
+            chunks: Morceaux de lignes produit (ex: iter_frame_chunks)
+            mode: 'sorted' (morceaux triés par transaction_id, report de la
+                dernière transaction) ou 'hash' (ordre quelconque, partitions sur disque)
+
+        Returns:
+            Iterator[Dict[str, Any]]: Les enregistrements de aggregate_transactions, dans le même ordre
+        """
+        if mode not in AGGREGATION_MODES:
+            raise ValueError(f"Unknown aggregation mode: {mode}")
+        if mode == 'sorted':
+            return iter_sorted_aggregates(chunks)
+        return iter_hash_aggregates(chunks)
+
+    def aggregate_transactions_file(
+        self,
+        path: str,
+        filename: Optional[str],
+        output_path: str,
+        mode: str = 'hash',
+        chunk_rows: int = UPLOAD_CHUNK_ROWS
+    ) -> Dict[str, Any]:
+        """
+        Agrège un export produit (CSV, CSV.gz, Parquet ou Arrow) plus grand que la
+        mémoire et écrit les transactions en NDJSON dans output_path.
+
         Returns:
-            str: Chaîne concaténée avec compteur si nécessaire
+            Dict[str, Any]: mode, input_records et output_records
         """
+        counts = {'input_records': 0}
         try:
-            # Filtrer les valeurs non nulles et uniques
-            unique_items = sorted(set(str(i) for i in items if pd.notna(i) and str(i).strip()))
-            
-            # Si le nombre d'éléments est inférieur ou égal à max_items, retourner tous les éléments
-            if len(unique_items) <= max_items:
-                return ' | '.join(unique_items)
-            
-            # Sinon, retourner les premiers éléments avec un compteur
-            return f"{' | '.join(unique_items[:max_items])} (+{len(unique_items) - max_items} autres)"
-            
-        except Exception as e:
-            logger.error(f"Erreur lors de la limitation des éléments concaténés: {str(e)}")
-            return ""
+            records = self.aggregate_transactions_chunked(self._export_chunks(path, filename, chunk_rows, counts), mode)
+            output_records = write_ndjson(records, output_path)
+        except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as e:
+            raise ValueError(f"Fichier {filename or path} illisible: {str(e)}")
+
+        input_records = counts['input_records']
+        logger.info(f"Agrégation par morceaux ({mode}): {input_records} lignes, {output_records} transactions")
+        return {'mode': mode, 'input_records': input_records, 'output_records': output_records}
+
+    def _export_chunks(
+        self,
+        path: str,
+        filename: Optional[str],
+        chunk_rows: int,
+        counts: Dict[str, int],
+        currency: Optional[str] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Morceaux d'un export produit ; compte les lignes lues dans counts['input_records']
+        et, si currency est fourni, convertit la colonne revenue (cellules invalides : 0).
+        """
+        for chunk in iter_frame_chunks(path, filename, chunk_rows):
+            if KEY_COLUMN not in chunk.columns:
+                raise ValueError(f"Colonne {KEY_COLUMN} manquante")
+            counts['input_records'] += len(chunk)
+            if currency is not None and 'revenue' in chunk.columns:
+                values, invalid = parse_revenue_series(chunk['revenue'], currency)
+                if invalid.any():
+                    self._record_invalid_revenue('revenue', chunk['revenue'], invalid)
+                chunk = chunk.assign(revenue=values.fillna(0.0))
+            yield chunk
+
+    def calculate_streaming_revenue_file(
+        self,
+        overall_path: str,
+        transaction_path: str,
+        overall_filename: Optional[str] = None,
+        transaction_filename: Optional[str] = None,
+        currency: Optional[str] = None,
+        mode: str = 'hash',
+        chunk_rows: int = UPLOAD_CHUNK_ROWS
+    ) -> Dict[str, Any]:
+        """
+        AOV, ARPU et revenu total avec intervalles et confiance pour un export
+        produit plus grand que la mémoire : les lignes sont agrégées par
+        transaction morceau par morceau (voir aggregate_transactions_chunked),
+        puis un bootstrap de Poisson est accumulé en flux sur les transactions.
+
+        Args:
+            overall_path: Export global (utilisateurs par variation), lu en entier
+            transaction_path: Export des lignes produit, lu par morceaux
+            overall_filename: Nom d'origine de l'export global (détection du format)
+            transaction_filename: Nom d'origine de l'export produit
+            currency: Code de la devise (conversion des revenus)
+            mode: Mode d'agrégation, 'sorted' ou 'hash'
+            chunk_rows: Nombre de lignes lues par morceau
+
+        Returns:
+            Dict[str, Any]: success, control, mode, input_records, transactions et
+                data (métriques par variation)
+
+        Raises:
+            ValueError: Fichier illisible, colonnes manquantes ou contrôle sans transactions
+        """
+        overall_df = read_frame(overall_path, overall_filename)
+        missing = {'variation', 'users'} - set(overall_df.columns)
+        if missing:
+            raise ValueError(f"Colonnes manquantes dans les données overall: {sorted(missing)}")
+        overall_df = overall_df.assign(variation=overall_df['variation'].astype(str))
+        first_rows = overall_df.drop_duplicates('variation')
+        users_by_variation = dict(zip(first_rows['variation'], pd.to_numeric(first_rows['users'], errors='coerce').fillna(0).astype(float)))
+        if not overall_df['variation'].str.contains('control', case=False).any():
+            raise ValueError("No control variation found in overall data")
+        control_variation = detect_control(overall_df)
+
+        counts = {'input_records': 0}
+        try:
+            chunks = self._export_chunks(transaction_path, transaction_filename, chunk_rows, counts, currency)
+            records = self.aggregate_transactions_chunked(chunks, mode)
+            states = self.stream_bootstrap_states(self._record_batches(records))
+        except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as e:
+            raise ValueError(f"Fichier {transaction_filename or transaction_path} illisible: {str(e)}")
+
+        if control_variation not in states:
+            raise ValueError(f"Control variation {control_variation} has no transactions")
+
+        transactions = sum(state.n_rows for state in states.values())
+        logger.info(f"Intervalles en flux ({mode}): {counts['input_records']} lignes, {transactions} transactions")
+        return {
+            'success': True,
+            'control': control_variation,
+            'mode': mode,
+            'input_records': counts['input_records'],
+            'transactions': transactions,
+            'data': self._convert_numpy_types(
+                self.calculate_streaming_intervals(states, users_by_variation, control_variation)
+            )
+        }
+
+    @staticmethod
+    def _record_batches(records: Iterable[Dict[str, Any]], batch_rows: int = STREAM_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """Regroupe des transactions agrégées (dicts) en DataFrames de batch_rows lignes."""
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_rows:
+                yield pd.DataFrame(batch, columns=['variation', 'revenue', 'quantity'])
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=['variation', 'revenue', 'quantity'])
 
     def calculate_uplift_and_confidence(
         self, 
@@ -218,11 +400,7 @@ class DataProcessor:
         # Calcul du niveau de confiance
         if metric_type == 'revenue':
             # Test de Mann-Whitney U pour les revenus
-            _, p_value = stats.mannwhitneyu(
-                variation_data, 
-                control_data, 
-                alternative='two-sided'
-            )
+            _, p_value = mann_whitney(variation_data, control_data)
         else:
             # Test t pour les métriques normales
             _, p_value = stats.ttest_ind(
@@ -235,94 +413,192 @@ class DataProcessor:
         
         return round(uplift, 2), round(confidence, 2)
 
+    @staticmethod
+    def _is_missing(value: Any) -> bool:
+        """Vrai si des données (liste d'enregistrements ou DataFrame) sont absentes ou vides."""
+        if value is None:
+            return True
+        if isinstance(value, pd.DataFrame):
+            return value.empty
+        return not value
+
     def _validate_input_data(self, data: Dict[str, Any]) -> None:
         """Valide la structure des données d'entrée"""
         if not data.get('raw_data'):
             raise ValueError("Missing raw_data in input")
-        if not data['raw_data'].get('transaction'):
+        if self._is_missing(data['raw_data'].get('transaction')):
             raise ValueError("Missing transaction data")
-        if not data['raw_data'].get('overall'):
+        if self._is_missing(data['raw_data'].get('overall')):
             raise ValueError("Missing overall data")
 
-    def calculate_overview_metrics(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        try:
-            self._validate_input_data(data)
-            
-            # Créer la table virtuelle
-            virtual_table = self.create_analysis_table(data)
-            overall_df = pd.DataFrame(data['raw_data']['overall'])
+    def build_segment_index(self, transaction_df: pd.DataFrame) -> SegmentIndex:
+        """Construit l'index des segments filtrables d'un jeu de transactions."""
+        return SegmentIndex(transaction_df)
 
-            # Identifier le contrôle
-            control_variation = str(overall_df[overall_df['variation'].str.contains('control', case=False)]['variation'].iloc[0])
+    def apply_filters(
+        self,
+        transaction_data: Union[pd.DataFrame, List[Dict[str, Any]]],
+        filters: Optional[Dict[str, List[str]]],
+        segment_index: Optional[SegmentIndex] = None
+    ) -> pd.DataFrame:
+        """
+        Filtre les lignes de transaction (niveau article) par device_category / item_category2.
 
-            metrics_by_variation = {}
-            for variation in overall_df['variation'].unique():
-                # Filtrer les données pour cette variation
-                var_data = virtual_table[virtual_table['variation'] == variation]
-                ctrl_data = virtual_table[virtual_table['variation'] == control_variation]
-                
-                # Données overall pour cette variation
-                var_overall = overall_df[overall_df['variation'] == variation].iloc[0]
-                ctrl_overall = overall_df[overall_df['variation'] == control_variation].iloc[0]
-
-                # Calculer les métriques
-                metrics = {
-                    'users': {
-                        'value': float(var_overall['users']),
-                        'control_value': float(ctrl_overall['users']),
-                        'uplift': ((float(var_overall['users']) - float(ctrl_overall['users'])) / float(ctrl_overall['users'])) * 100
-                    },
-                    'add_to_cart_rate': {
-                        'value': (float(var_overall['user_add_to_carts']) / float(var_overall['users'])) * 100,
-                        'control_value': (float(ctrl_overall['user_add_to_carts']) / float(ctrl_overall['users'])) * 100,
-                        'uplift': (((float(var_overall['user_add_to_carts']) / float(var_overall['users'])) - 
-                                  (float(ctrl_overall['user_add_to_carts']) / float(ctrl_overall['users']))) / 
-                                 (float(ctrl_overall['user_add_to_carts']) / float(ctrl_overall['users']))) * 100,
-                        'confidence': self._calculate_add_to_cart_confidence(
-                            float(var_overall['user_add_to_carts']), 
-                            float(var_overall['users']),
-                            float(ctrl_overall['user_add_to_carts']), 
-                            float(ctrl_overall['users'])
-                        ),
-                        'confidence_interval': self._calculate_add_to_cart_confidence_interval(
-                            float(var_overall['user_add_to_carts']), 
-                            float(var_overall['users']),
-                            float(ctrl_overall['user_add_to_carts']), 
-                            float(ctrl_overall['users'])
-                        ),
-                        'details': {
-                            'variation': {
-                                'count': int(float(var_overall['user_add_to_carts'])),
-                                'total': int(float(var_overall['users'])),
-                                'rate': (float(var_overall['user_add_to_carts']) / float(var_overall['users'])) * 100,
-                                'unit': 'percentage'
-                            },
-                            'control': {
-                                'count': int(float(ctrl_overall['user_add_to_carts'])),
-                                'total': int(float(ctrl_overall['users'])), 
-                                'rate': (float(ctrl_overall['user_add_to_carts']) / float(ctrl_overall['users'])) * 100,
-                                'unit': 'percentage'
-                            }
-                        }
-                    },
-                    'transaction_rate': self._calculate_transaction_rate(var_data, ctrl_data, var_overall, ctrl_overall),
-                    'total_revenue': self._calculate_total_revenue(var_data, ctrl_data)
-                }
+        Mêmes règles que le filtre du client : devices exacts (OU), catégories
+        recherchées sans casse dans les catégories 'A|B' de chaque ligne, toutes
+        requises (ET) ; voir SegmentIndex. Les données overall (utilisateurs)
+        ne sont pas filtrées.
 
-                metrics = self._convert_numpy_types(metrics)
-                metrics_by_variation[str(variation)] = metrics
+        Args:
+            transaction_data: Lignes de transaction
+            filters: Valeurs acceptées par colonne
+            segment_index: Index déjà construit pour ces lignes (sinon construit à la volée)
 
-            return {
+        Returns:
+            pd.DataFrame: Lignes correspondant aux filtres
+        """
+        transaction_df = pd.DataFrame(transaction_data)
+        active_filters = {
+            column: [str(value) for value in (filters or {}).get(column) or []]
+            for column in FILTER_COLUMNS
+        }
+        if not any(active_filters.values()):
+            return transaction_df
+
+        if segment_index is None or segment_index.n_rows != len(transaction_df):
+            segment_index = self.build_segment_index(transaction_df)
+        mask = segment_index.mask(active_filters)
+        filtered = transaction_df[mask] if mask is not None else transaction_df
+        logger.info(f"Filters {active_filters} kept {len(filtered)}/{len(transaction_df)} transaction rows")
+        return filtered
+
+    def _filtered_input(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Applique les filtres de la requête aux transactions avant les calculs."""
+        filters = data.get('filters')
+        if not filters:
+            return data
+        transaction = self.apply_filters(
+            data['raw_data']['transaction'],
+            filters,
+            data.get('segment_index')
+        )
+        if transaction.empty:
+            raise ValueError("No transactions found with the selected filters")
+        return {**data, 'raw_data': {**data['raw_data'], 'transaction': transaction}}
+
+    def calculate_overview_metrics(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            context = self.build_analysis_context(data)
+
+            return self._with_virtual_table({
                 'success': True,
-                'data': metrics_by_variation,
-                'control': control_variation,
-                'virtual_table': virtual_table.to_dict('records')
-            }
+                'data': self._overview_metrics(context),
+                'control': context.control_variation
+            }, context.virtual_table, data)
 
         except Exception as e:
             logger.error(f"Error calculating overview metrics: {str(e)}")
             return {'success': False, 'error': str(e)}
 
+    def _overview_metrics(self, context: AnalysisContext) -> Dict[str, Dict[str, Any]]:
+        """Métriques de la vue d'ensemble de chaque variation, à partir du contexte partagé."""
+        ctrl_data = context.control_transactions
+        ctrl_overall = context.control_overall
+
+        # Bras triés une seule fois pour tous les tests de rangs (contrôle compris)
+        rank_engine = RankEngine()
+
+        metrics_by_variation = {}
+        for variation in context.variations:
+            var_data = context.transactions(variation)
+            var_overall = context.overall(variation)
+            ranks = rank_engine.pair(var_data, ctrl_data, variation, context.control_variation)
+
+            # Calculer les métriques
+            metrics = {
+                'users': {
+                    'value': float(var_overall['users']),
+                    'control_value': float(ctrl_overall['users']),
+                    'uplift': ((float(var_overall['users']) - float(ctrl_overall['users'])) / float(ctrl_overall['users'])) * 100
+                },
+                'add_to_cart_rate': {
+                    'value': (float(var_overall['user_add_to_carts']) / float(var_overall['users'])) * 100,
+                    'control_value': (float(ctrl_overall['user_add_to_carts']) / float(ctrl_overall['users'])) * 100,
+                    'uplift': (((float(var_overall['user_add_to_carts']) / float(var_overall['users'])) - 
+                              (float(ctrl_overall['user_add_to_carts']) / float(ctrl_overall['users']))) / 
+                             (float(ctrl_overall['user_add_to_carts']) / float(ctrl_overall['users']))) * 100,
+                    'confidence': self._calculate_add_to_cart_confidence(
+                        float(var_overall['user_add_to_carts']), 
+                        float(var_overall['users']),
+                        float(ctrl_overall['user_add_to_carts']), 
+                        float(ctrl_overall['users'])
+                    ),
+                    'confidence_interval': self._calculate_add_to_cart_confidence_interval(
+                        float(var_overall['user_add_to_carts']), 
+                        float(var_overall['users']),
+                        float(ctrl_overall['user_add_to_carts']), 
+                        float(ctrl_overall['users'])
+                    ),
+                    'test_method': self._rate_test_method(
+                        float(var_overall['user_add_to_carts']),
+                        float(var_overall['users']),
+                        float(ctrl_overall['user_add_to_carts']),
+                        float(ctrl_overall['users'])
+                    ),
+                    'details': {
+                        'variation': {
+                            'count': int(float(var_overall['user_add_to_carts'])),
+                            'total': int(float(var_overall['users'])),
+                            'rate': (float(var_overall['user_add_to_carts']) / float(var_overall['users'])) * 100,
+                            'unit': 'percentage'
+                        },
+                        'control': {
+                            'count': int(float(ctrl_overall['user_add_to_carts'])),
+                            'total': int(float(ctrl_overall['users'])), 
+                            'rate': (float(ctrl_overall['user_add_to_carts']) / float(ctrl_overall['users'])) * 100,
+                            'unit': 'percentage'
+                        }
+                    }
+                },
+                'transaction_rate': self._calculate_transaction_rate(var_data, ctrl_data, var_overall, ctrl_overall),
+                'total_revenue': self._calculate_total_revenue(var_data, ctrl_data, ranks)
+            }
+
+            metrics = self._convert_numpy_types(metrics)
+            metrics_by_variation[str(variation)] = metrics
+
+        return metrics_by_variation
+
+    @staticmethod
+    def _with_virtual_table(result: Dict[str, Any], virtual_table: pd.DataFrame, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Ajoute la table virtuelle au résultat uniquement si le client la demande
+        (data['include_virtual_table']) ; sinon elle est servie par pages via la session.
+
+        Elle est renvoyée en lignes JSON, ou telle quelle (DataFrame) si
+        data['virtual_table_format'] vaut 'frame' (transport Arrow).
+        """
+        if data.get('virtual_table_format') == 'frame':
+            result['virtual_table'] = virtual_table
+        elif data.get('include_virtual_table'):
+            result['virtual_table'] = virtual_table.to_dict('records')
+        return result
+
+    def build_analysis_context(self, data: Dict[str, Any]) -> AnalysisContext:
+        """Valide et filtre les données, construit la table virtuelle et la partitionne par variation."""
+        self._validate_input_data(data)
+        data = self._filtered_input(data)
+        virtual_table = self.create_analysis_table(data)
+        with stage('dataframe'):
+            overall_df = pd.DataFrame(data['raw_data']['overall'])
+            transaction_df = pd.DataFrame(data['raw_data']['transaction'])
+        return AnalysisContext(virtual_table, overall_df, transaction_df)
+
+    def build_virtual_table(self, data: Dict[str, Any]) -> pd.DataFrame:
+        """Table virtuelle (une ligne par transaction) des données filtrées, triée par transaction_id."""
+        self._validate_input_data(data)
+        return self.create_analysis_table(self._filtered_input(data))
+
     def calculate_confidence(self, control_data: np.array, variation_data: np.array, metric_type: str = 'normal') -> float:
         """
         Calcule le niveau de confiance statistique.
@@ -341,11 +617,7 @@ class DataProcessor:
             
             if metric_type == 'revenue':
                 # Test de Mann-Whitney U pour les revenus
-                _, p_value = stats.mannwhitneyu(
-                    variation_data,
-                    control_data,
-                    alternative='two-sided'
-                )
+                _, p_value = mann_whitney(variation_data, control_data)
             else:
                 # Test t pour les métriques normales
                 _, p_value = stats.ttest_ind(
@@ -363,52 +635,759 @@ class DataProcessor:
 
     def calculate_revenue_metrics(self, data: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            self._validate_input_data(data)
-            
-            # Créer la table virtuelle
-            virtual_table = self.create_analysis_table(data)
-            overall_df = pd.DataFrame(data['raw_data']['overall'])
+            bootstrap_mode = data.get('bootstrap_mode', 'multinomial')
+            if bootstrap_mode not in BOOTSTRAP_MODES:
+                raise ValueError(f"Unknown bootstrap_mode: {bootstrap_mode}")
 
-            # Identifier le contrôle
-            control_variation = str(overall_df[overall_df['variation'].str.contains('control', case=False)]['variation'].iloc[0])
+            context = self.build_analysis_context(data)
 
-            metrics_by_variation = {}
-            for variation in overall_df['variation'].unique():
-                var_data = virtual_table[virtual_table['variation'] == variation]
-                ctrl_data = virtual_table[virtual_table['variation'] == control_variation]
-                
-                var_overall = overall_df[overall_df['variation'] == variation].iloc[0]
-                ctrl_overall = overall_df[overall_df['variation'] == control_variation].iloc[0]
-
-                metrics = {
-                    'users': {
-                        'value': float(var_overall['users']),
-                        'control_value': float(ctrl_overall['users'])
-                        # Pas d'uplift ni de confidence pour users
+            return self._with_virtual_table({
+                'success': True,
+                'data': self._revenue_metrics(context, bootstrap_mode),
+                'control': context.control_variation
+            }, context.virtual_table, data)
+
+        except Exception as e:
+            logger.error(f"Error calculating revenue metrics: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def _revenue_metrics(self, context: AnalysisContext, bootstrap_mode: str = 'multinomial') -> Dict[str, Dict[str, Any]]:
+        """Métriques de revenu de chaque variation, à partir du contexte partagé."""
+        control_variation = context.control_variation
+        ctrl_data = context.control_transactions
+        ctrl_overall = context.control_overall
+
+        # Un plan de rééchantillonnage par bras, partagé par toutes les métriques
+        # (le contrôle n'est rééchantillonné qu'une seule fois)
+        replicates_by_variation = {}
+        if bootstrap_mode == 'poisson':
+            states = self.stream_bootstrap_states(self._iter_chunks(context.virtual_table))
+            replicates_by_variation = {name: state.to_replicates() for name, state in states.items()}
+
+        # Bras triés une seule fois : AOV, revenu total et ARPU partagent le même test sur les revenus
+        rank_engine = RankEngine()
+
+        metrics_by_variation = {}
+        for variation in context.variations:
+            var_data = context.transactions(variation)
+            var_overall = context.overall(variation)
+
+            replicates = self._shared_replicates(
+                replicates_by_variation, variation, var_data, control_variation, ctrl_data
+            )
+            ranks = rank_engine.pair(var_data, ctrl_data, variation, control_variation)
+
+            metrics = {
+                'users': {
+                    'value': float(var_overall['users']),
+                    'control_value': float(ctrl_overall['users'])
+                    # Pas d'uplift ni de confidence pour users
+                },
+                'transaction_rate': self._calculate_transaction_rate(var_data, ctrl_data, var_overall, ctrl_overall),
+                'aov': self._calculate_aov(var_data, ctrl_data, replicates, ranks),
+                'avg_products': self._calculate_avg_products(var_data, ctrl_data, replicates, ranks),
+                'total_revenue': self._calculate_total_revenue(var_data, ctrl_data, ranks),
+                'arpu': self._calculate_arpu(var_data, ctrl_data, var_overall, ctrl_overall, replicates, ranks)
+            }
+
+            metrics = self._convert_numpy_types(metrics)
+            metrics_by_variation[str(variation)] = metrics
+
+        return metrics_by_variation
+
+    def compare_variations(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Compare toutes les variations au contrôle en un appel (Welch, Mann-Whitney U,
+        Fisher), avec des confiances ajustées pour les comparaisons multiples.
+
+        Args:
+            data: raw_data (ou données de session), filters et correction
+                parmi CORRECTIONS ('holm' par défaut)
+
+        Returns:
+            Dict[str, Any]: success, control, correction et data (métrique -> variation -> résultat)
+        """
+        try:
+            correction = data.get('correction') or 'holm'
+            if correction not in CORRECTIONS:
+                raise ValueError(f"Unknown correction: {correction}")
+
+            context = self.build_analysis_context(data)
+
+            return {
+                'success': True,
+                'control': context.control_variation,
+                'correction': correction,
+                'data': self._convert_numpy_types(compare_arms(context, correction, self.rate_tests))
+            }
+
+        except Exception as e:
+            logger.error(f"Error comparing variations: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def calculate_segment_cube(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Calcule les métriques de chaque segment device_category x item_category2 en une passe."""
+        try:
+            context = self.build_analysis_context(data)
+
+            return {
+                'success': True,
+                'control': context.control_variation,
+                **self._segment_cube(context)
+            }
+
+        except Exception as e:
+            logger.error(f"Error calculating segment cube: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def _segment_cube(self, context: AnalysisContext) -> Dict[str, Any]:
+        """Cube des segments à partir du contexte partagé."""
+        transaction_df = context.transaction_df
+        # Colonnes absentes : même valeur par défaut que create_analysis_table
+        missing = {col: 'N/A' for col in ('device_category', 'item_category2') if col not in transaction_df.columns}
+        if missing:
+            transaction_df = transaction_df.assign(**missing)
+        cube = build_segment_cube(
+            transaction_df, context.users_by_variation(), context.control_variation, self.rate_tests
+        )
+        return self._convert_numpy_types(cube)
+
+    def calculate_revenue_distribution(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Répartition des transactions par tranche de revenu, pour toutes les
+        tranches et toutes les variations en un appel.
+
+        Args:
+            data: raw_data (ou données de session), filters et soit edges (bornes
+                croissantes, None en dernière position pour +inf), soit binning
+                parmi BIN_MODES avec bins tranches (DEFAULT_BINS par défaut)
+
+        Returns:
+            Dict[str, Any]: success, control, binning, edges, buckets (min, max,
+                label) et data (variation -> tranches et confiance de la distribution).
+                Tranches semi-ouvertes [min, max[ (la dernière inclut max), confiance
+                par tranche issue d'un test de taux (voir l'endpoint /revenue-distribution)
+        """
+        try:
+            context = self.build_analysis_context(data)
+            revenue = context.virtual_table['revenue'].to_numpy(dtype=np.float64)
+
+            if data.get('edges') is not None:
+                binning = 'explicit'
+                edges = explicit_edges(data['edges'])
+            else:
+                binning = data.get('binning') or 'quantile'
+                edges = auto_edges(revenue, binning, int(data.get('bins') or DEFAULT_BINS))
+
+            def edge_value(edge: float) -> Optional[float]:
+                return None if np.isinf(edge) else float(edge)
+
+            return {
+                'success': True,
+                'control': context.control_variation,
+                'binning': binning,
+                'edges': [edge_value(edge) for edge in edges],
+                'buckets': [
+                    {'min': edge_value(low), 'max': edge_value(high), 'label': label}
+                    for low, high, label in zip(edges[:-1], edges[1:], bucket_labels(edges))
+                ],
+                'data': self._revenue_distribution(context, edges)
+            }
+
+        except Exception as e:
+            logger.error(f"Error calculating revenue distribution: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def _revenue_distribution(self, context: AnalysisContext, edges: np.ndarray) -> Dict[str, Dict[str, Any]]:
+        """
+        Tranches de chaque variation contre le contrôle.
+
+        Chaque bras est trié une fois (le même tri sert au test de Mann-Whitney U
+        sur toute la distribution) ; les effectifs de toutes les tranches sont
+        obtenus par une recherche dichotomique des bornes, et les tests de taux
+        sont vectorisés sur les tranches.
+        """
+        ranks = RankEngine()
+        control = context.control_variation
+        ctrl_revenue = context.control_transactions['revenue'].to_numpy(dtype=np.float64)
+        ctrl_sample = ranks.sample(ctrl_revenue, ('revenue', control))
+        ctrl_counts, ctrl_below, ctrl_above = bucket_counts(ctrl_sample.values, edges)
+        ctrl_total = ctrl_sample.n
+        ctrl_lower, ctrl_upper = wilson_interval(ctrl_counts, ctrl_total)
+
+        results = {}
+        for variation in context.variations:
+            if variation == control:
+                continue
+            revenue = context.transactions(variation)['revenue'].to_numpy(dtype=np.float64)
+            sample = ranks.sample(revenue, ('revenue', variation))
+            counts, below, above = bucket_counts(sample.values, edges)
+            total = sample.n
+            lower, upper = wilson_interval(counts, total)
+
+            p_values, methods = self.rate_tests.test(counts, total, ctrl_counts, ctrl_total)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                var_p = counts / total if total > 0 else np.zeros(len(counts))
+                ctrl_p = ctrl_counts / ctrl_total if ctrl_total > 0 else np.zeros(len(counts))
+                uplift = np.where(ctrl_p > 0, (var_p - ctrl_p) / ctrl_p * 100, 0.0)
+                # Même marge que calculate_revenue_distribution_stats (écart de proportions, en points)
+                margin = 1.96 * np.sqrt(var_p * (1 - var_p) / total + ctrl_p * (1 - ctrl_p) / ctrl_total) * 100
+
+            distribution_p = (
+                mann_whitney_samples(sample, ctrl_sample).pvalue if total > 0 and ctrl_total > 0 else float('nan')
+            )
+
+            buckets = []
+            for i in range(len(counts)):
+                buckets.append({
+                    'value': float(var_p[i] * 100),
+                    'control_value': float(ctrl_p[i] * 100),
+                    'uplift': float(uplift[i]),
+                    'confidence': self._finite_round((1 - p_values[i]) * 100),
+                    'confidence_interval': {
+                        'lower': self._finite_round(uplift[i] - margin[i]),
+                        'upper': self._finite_round(uplift[i] + margin[i])
                     },
-                    'transaction_rate': self._calculate_transaction_rate(var_data, ctrl_data, var_overall, ctrl_overall),
-                    'aov': self._calculate_aov(var_data, ctrl_data),
-                    'avg_products': self._calculate_avg_products(var_data, ctrl_data),
-                    'total_revenue': self._calculate_total_revenue(var_data, ctrl_data),
-                    'arpu': self._calculate_arpu(var_data, ctrl_data, var_overall, ctrl_overall)
+                    'test_method': methods[i],
+                    'details': {
+                        'variation': {
+                            'count': int(counts[i]),
+                            'total': total,
+                            'rate': round(float(var_p[i] * 100), 2),
+                            'unit': 'percentage',
+                            'wilson_interval': {
+                                'lower': self._finite_round(lower[i] * 100),
+                                'upper': self._finite_round(upper[i] * 100)
+                            }
+                        },
+                        'control': {
+                            'count': int(ctrl_counts[i]),
+                            'total': ctrl_total,
+                            'rate': round(float(ctrl_p[i] * 100), 2),
+                            'unit': 'percentage',
+                            'wilson_interval': {
+                                'lower': self._finite_round(ctrl_lower[i] * 100),
+                                'upper': self._finite_round(ctrl_upper[i] * 100)
+                            }
+                        }
+                    }
+                })
+
+            results[str(variation)] = {
+                'distribution_confidence': self._finite_round((1 - distribution_p) * 100),
+                'out_of_range': {
+                    'variation': {'below': below, 'above': above},
+                    'control': {'below': ctrl_below, 'above': ctrl_above}
+                },
+                'buckets': buckets
+            }
+        return results
+
+    @staticmethod
+    def _finite_round(value: float, digits: int = 2) -> Optional[float]:
+        """Valeur arrondie pour le JSON, None si elle n'a pas pu être calculée."""
+        value = float(value)
+        return round(value, digits) if np.isfinite(value) else None
+
+    def run_pipeline(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Calcule plusieurs sections d'analyse à partir d'un seul jeu de données nettoyé.
+
+        Les données sont filtrées, agrégées par transaction et partitionnées par
+        variation une seule fois, puis chaque section demandée réutilise ce contexte.
+
+        Args:
+            data: raw_data (ou données de session), filters, bootstrap_mode et
+                sections parmi PIPELINE_SECTIONS (toutes par défaut)
+
+        Returns:
+            Dict[str, Any]: success, control, sections et un résultat par section demandée
+        """
+        try:
+            sections = list(data.get('sections') or PIPELINE_SECTIONS)
+            unknown = [section for section in sections if section not in PIPELINE_SECTIONS]
+            if unknown:
+                raise ValueError(f"Unknown sections: {unknown}")
+            bootstrap_mode = data.get('bootstrap_mode', 'multinomial')
+            if bootstrap_mode not in BOOTSTRAP_MODES:
+                raise ValueError(f"Unknown bootstrap_mode: {bootstrap_mode}")
+
+            context = self.build_analysis_context(data)
+            result = {
+                'success': True,
+                'control': context.control_variation,
+                'sections': sections
+            }
+            if 'overview' in sections:
+                result['overview'] = self._overview_metrics(context)
+            if 'revenue' in sections:
+                result['revenue'] = self._revenue_metrics(context, bootstrap_mode)
+            if 'aggregation' in sections:
+                result['aggregation'] = self.aggregate_transactions(context.transaction_df)
+            if 'segments' in sections:
+                result['segments'] = self._segment_cube(context)
+
+            return self._with_virtual_table(result, context.virtual_table, data)
+
+        except Exception as e:
+            logger.error(f"Error running analysis pipeline: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def append_test_batch(self, state: Optional[IncrementalTest], test_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Ajoute un lot (ex: l'export GA d'un jour) à l'état cumulé d'un test en cours
+        puis recalcule ses métriques à partir des statistiques suffisantes.
+
+        Args:
+            state: État du test (None pour le premier lot)
+            test_id: Identifiant du test
+            data: raw_data du lot (overall et transaction) et batch_id optionnel
+
+        Returns:
+            Dict[str, Any]: success, state (nouvel état à enregistrer), test, control et data
+        """
+        try:
+            self._validate_input_data(data)
+            state = state or IncrementalTest(test_id)
+            state.append(
+                pd.DataFrame(data['raw_data']['overall']),
+                self.create_analysis_table(data),
+                data.get('batch_id')
+            )
+            return {'success': True, 'state': state, **self._incremental_result(state)}
+
+        except Exception as e:
+            logger.error(f"Error appending batch to test {test_id}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def calculate_test_metrics(self, state: IncrementalTest) -> Dict[str, Any]:
+        """Métriques d'un test en cours à partir de son état cumulé."""
+        try:
+            return {'success': True, **self._incremental_result(state)}
+
+        except Exception as e:
+            logger.error(f"Error calculating metrics of test {state.test_id}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def _incremental_result(self, state: IncrementalTest) -> Dict[str, Any]:
+        if state.control_variation not in state.arms:
+            raise ValueError(f"Control variation {state.control_variation} has no data")
+        ctrl = state.arms[state.control_variation]
+        # Le contrôle est reconstitué une seule fois à partir de ses runs
+        ctrl_samples = {column: ctrl.sample(column) for column in RUN_COLUMNS}
+
+        metrics_by_variation = {}
+        for variation, arm in state.arms.items():
+            revenue_p = self._state_rank_p_value(arm, ctrl_samples, 'revenue')
+            quantity_p = self._state_rank_p_value(arm, ctrl_samples, 'quantity')
+            metrics = {
+                'users': {
+                    'value': arm.users,
+                    'control_value': ctrl.users
+                },
+                'add_to_cart_rate': self._state_rate_metric(
+                    arm.add_to_carts, arm.users, ctrl.add_to_carts, ctrl.users,
+                    self._calculate_add_to_cart_confidence_interval
+                ),
+                'transaction_rate': self._state_rate_metric(
+                    arm.transactions, arm.users, ctrl.transactions, ctrl.users,
+                    self._calculate_transaction_rate_confidence_interval
+                ),
+                'aov': self._state_mean_metric(
+                    arm.moments['revenue'], ctrl.moments['revenue'], revenue_p, 'currency', 'mann_whitney'
+                ),
+                'avg_products': self._state_mean_metric(
+                    arm.moments['quantity'], ctrl.moments['quantity'], quantity_p, 'quantity', 'mann_whitney'
+                ),
+                'total_revenue': self._state_total_revenue(arm.moments['revenue'], ctrl.moments['revenue'], revenue_p),
+                'arpu': self._state_mean_metric(
+                    arm.moments['revenue'].padded(int(arm.users)),
+                    ctrl.moments['revenue'].padded(int(ctrl.users)),
+                    revenue_p,
+                    'currency',
+                    'mann_whitney'
+                )
+            }
+            metrics_by_variation[variation] = self._convert_numpy_types(metrics)
+
+        return {
+            'test': state.describe(),
+            'control': state.control_variation,
+            'data': metrics_by_variation
+        }
+
+    @staticmethod
+    def _state_rank_p_value(arm: ArmState, ctrl_samples: Dict[str, Any], column: str) -> Optional[float]:
+        """p-value du test de Mann-Whitney U calculée sur les runs triés (None si un bras est vide)."""
+        sample = arm.sample(column)
+        if sample.n == 0 or ctrl_samples[column].n == 0:
+            return None
+        return mann_whitney_samples(sample, ctrl_samples[column]).pvalue
+
+    def _state_rate_metric(self, var_count: float, var_users: float, ctrl_count: float, ctrl_users: float, interval) -> Dict:
+        """Taux (succès / utilisateurs) d'une variation contre le contrôle, à partir des effectifs cumulés."""
+        try:
+            var_rate = (var_count / var_users) * 100 if var_users > 0 else 0
+            ctrl_rate = (ctrl_count / ctrl_users) * 100 if ctrl_users > 0 else 0
+            p_value, test_method = self.rate_tests.test_one(var_count, var_users, ctrl_count, ctrl_users)
+
+            return {
+                'value': var_rate,
+                'control_value': ctrl_rate,
+                'uplift': ((var_rate - ctrl_rate) / ctrl_rate) * 100 if ctrl_rate > 0 else 0,
+                'confidence': round((1 - p_value) * 100, 2),
+                'confidence_interval': interval(var_count, var_users, ctrl_count, ctrl_users),
+                'test_method': test_method,
+                'details': {
+                    'variation': {'count': int(var_count), 'total': int(var_users), 'rate': round(var_rate, 2), 'unit': 'percentage'},
+                    'control': {'count': int(ctrl_count), 'total': int(ctrl_users), 'rate': round(ctrl_rate, 2), 'unit': 'percentage'}
                 }
+            }
+        except Exception as e:
+            logger.error(f"Error calculating incremental rate metric: {str(e)}")
+            return self._get_default_metric_result()
+
+    def _state_mean_metric(
+        self,
+        var: RunningMoments,
+        ctrl: RunningMoments,
+        p_value: Optional[float],
+        unit: str,
+        test_method: Optional[str] = None
+    ) -> Dict:
+        """
+        Moyenne d'une variation contre le contrôle à partir des moments cumulés.
 
-                metrics = self._convert_numpy_types(metrics)
-                metrics_by_variation[str(variation)] = metrics
+        Sans les observations, l'intervalle de confiance de l'uplift est
+        l'approximation normale (Welch) plutôt que le bootstrap.
+        """
+        try:
+            if p_value is None:
+                raise ValueError("Un bras n'a aucune transaction")
+            var_mean, ctrl_mean = var.mean, ctrl.mean
+            uplift = ((var_mean - ctrl_mean) / ctrl_mean) * 100 if ctrl_mean > 0 else 0
+            se = np.sqrt(var.variance / var.count + ctrl.variance / ctrl.count)
+            margin = 1.96 * se / ctrl_mean * 100 if ctrl_mean > 0 else 0
+
+            metric = {
+                'value': var_mean,
+                'control_value': ctrl_mean,
+                'uplift': uplift,
+                'confidence': round((1 - p_value) * 100, 2),
+                'confidence_interval': {'lower': round(uplift - margin, 2), 'upper': round(uplift + margin, 2)},
+                'details': {
+                    'variation': {'count': var.count, 'total': var.total, 'rate': round(var_mean, 2), 'unit': unit},
+                    'control': {'count': ctrl.count, 'total': ctrl.total, 'rate': round(ctrl_mean, 2), 'unit': unit}
+                }
+            }
+            if test_method is not None:
+                metric['test_method'] = test_method
+            return metric
+        except Exception as e:
+            logger.error(f"Error calculating incremental mean metric: {str(e)}")
+            return self._get_default_metric_result()
+
+    def _state_total_revenue(self, var: RunningMoments, ctrl: RunningMoments, p_value: Optional[float]) -> Dict:
+        """Revenu total cumulé (même intervalle que _calculate_total_revenue, qui ne dépend que des effectifs)."""
+        try:
+            if p_value is None:
+                raise ValueError("Un bras n'a aucune transaction")
+            var_revenue = var.total
+            ctrl_revenue = ctrl.total
+            n1, n2 = var.count, ctrl.count
+            margin = 1.96 * np.sqrt((n1 * n2 * (n1 + n2 + 1)) / 12)
+            diff = ((var_revenue - ctrl_revenue) / ctrl_revenue) * 100 if ctrl_revenue > 0 else 0
+            margin_pct = (margin / ctrl_revenue) * 100 if ctrl_revenue > 0 else 0
+
+            return {
+                'value': var_revenue,
+                'control_value': ctrl_revenue,
+                'uplift': diff,
+                'confidence': round((1 - p_value) * 100, 2),
+                'confidence_interval': {'lower': round(diff - margin_pct, 2), 'upper': round(diff + margin_pct, 2)},
+                'details': {
+                    'variation': {'count': n1, 'total': var_revenue, 'rate': var_revenue, 'unit': 'currency'},
+                    'control': {'count': n2, 'total': ctrl_revenue, 'rate': ctrl_revenue, 'unit': 'currency'}
+                }
+            }
+        except Exception as e:
+            logger.error(f"Error calculating incremental total revenue: {str(e)}")
+            return self._get_default_metric_result()
+
+    def summarize_shard(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Résumé fusionnable d'une tranche d'export (map) : moments, effectifs et
+        sketch de quantiles des revenus par variation.
+
+        Les tranches doivent partitionner les transactions et les lignes overall
+        (ex: une tranche par fichier d'export quotidien).
+
+        Args:
+            data: raw_data (ou données de session) de la tranche, filters et
+                relative_accuracy optionnelle du sketch
+
+        Returns:
+            Dict[str, Any]: success et summary (format ShardSummary.to_dict)
+        """
+        try:
+            self._validate_input_data(data)
+            data = self._filtered_input(data)
+            summary = ShardSummary.from_frames(
+                pd.DataFrame(data['raw_data']['overall']),
+                self.create_analysis_table(data),
+                float(data.get('relative_accuracy') or SKETCH_RELATIVE_ACCURACY)
+            )
+            return {'success': True, 'summary': summary.to_dict()}
+
+        except Exception as e:
+            logger.error(f"Error summarizing shard: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def merge_shard_summaries(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fusionne des résumés de tranches (reduce) et calcule les métriques du test :
+        tests de Welch et intervalles à partir des moments fusionnés, taux
+        par Fisher / chi-deux, quantiles de revenu à partir des sketches.
+
+        Args:
+            data: summaries (liste de ShardSummary.to_dict) et control optionnel
+
+        Returns:
+            Dict[str, Any]: success, control, summary (résumé fusionné, lui-même fusionnable) et data
+        """
+        try:
+            summaries = data.get('summaries') or []
+            if not summaries:
+                raise ValueError("Missing summaries")
+            merged = ShardSummary.merge_all(ShardSummary.from_dict(summary) for summary in summaries)
+            control_variation = data.get('control') or merged.control_variation
+            if control_variation not in merged.variations:
+                raise ValueError(f"Control variation {control_variation} not found in summaries")
 
             return {
                 'success': True,
-                'data': metrics_by_variation,
                 'control': control_variation,
-                'virtual_table': virtual_table.to_dict('records')
+                'shards': len(summaries),
+                'summary': merged.to_dict(),
+                'data': self._summary_metrics(merged, control_variation)
             }
 
         except Exception as e:
-            logger.error(f"Error calculating revenue metrics: {str(e)}")
+            logger.error(f"Error merging shard summaries: {str(e)}")
             return {'success': False, 'error': str(e)}
 
+    @staticmethod
+    def _welch_p_value(var: RunningMoments, ctrl: RunningMoments) -> Optional[float]:
+        """p-value du test de Welch à partir des moments (None si un bras a moins de deux observations)."""
+        if var.count < 2 or ctrl.count < 2:
+            return None
+        _, p_value = stats.ttest_ind_from_stats(
+            var.mean, np.sqrt(var.variance), var.count,
+            ctrl.mean, np.sqrt(ctrl.variance), ctrl.count,
+            equal_var=False
+        )
+        return float(p_value) if np.isfinite(p_value) else None
+
+    def _summary_metrics(self, summary: ShardSummary, control_variation: str) -> Dict[str, Dict[str, Any]]:
+        """Métriques de chaque variation contre le contrôle à partir d'un résumé fusionné."""
+        ctrl = summary.variations[control_variation]
+        ctrl_arpu = ctrl.revenue.padded(int(ctrl.users))
+
+        metrics_by_variation = {}
+        for variation, arm in summary.variations.items():
+            arpu = arm.revenue.padded(int(arm.users))
+            revenue_p = self._welch_p_value(arm.revenue, ctrl.revenue)
+            metrics = {
+                'users': {
+                    'value': arm.users,
+                    'control_value': ctrl.users
+                },
+                'add_to_cart_rate': self._state_rate_metric(
+                    arm.add_to_carts, arm.users, ctrl.add_to_carts, ctrl.users,
+                    self._calculate_add_to_cart_confidence_interval
+                ),
+                'transaction_rate': self._state_rate_metric(
+                    arm.transactions, arm.users, ctrl.transactions, ctrl.users,
+                    self._calculate_transaction_rate_confidence_interval
+                ),
+                'aov': self._state_mean_metric(arm.revenue, ctrl.revenue, revenue_p, 'currency', 'welch'),
+                'avg_products': self._state_mean_metric(
+                    arm.quantity, ctrl.quantity, self._welch_p_value(arm.quantity, ctrl.quantity), 'quantity', 'welch'
+                ),
+                'total_revenue': self._state_total_revenue(arm.revenue, ctrl.revenue, revenue_p),
+                'arpu': self._state_mean_metric(
+                    arpu, ctrl_arpu, self._welch_p_value(arpu, ctrl_arpu), 'currency', 'welch'
+                ),
+                'revenue_quantiles': {
+                    'value': arm.revenue_quantiles(),
+                    'control_value': ctrl.revenue_quantiles(),
+                    'relative_accuracy': arm.revenue_sketch.relative_accuracy
+                }
+            }
+            metrics_by_variation[variation] = self._convert_numpy_types(metrics)
+
+        return metrics_by_variation
+
+    def _arm_replicates(self, data: pd.DataFrame) -> Optional[ReplicateSums]:
+        """Rééchantillonne les revenus et quantités d'un bras en une seule passe (mêmes indices)."""
+        if data.empty:
+            return None
+        plan = self.bootstrap.plan(len(data))
+        return plan.replicate_sums({
+            'revenue': data['revenue'].values,
+            'quantity': data['quantity'].values
+        })
+
+    def _shared_replicates(
+        self,
+        cache: Dict[str, Optional[ReplicateSums]],
+        variation: str,
+        var_data: pd.DataFrame,
+        control_variation: str,
+        ctrl_data: pd.DataFrame
+    ) -> Tuple[Optional[ReplicateSums], Optional[ReplicateSums]]:
+        """Retourne les rééchantillonnages (variation, contrôle) en les calculant une seule fois par bras."""
+        for name, arm_data in ((variation, var_data), (control_variation, ctrl_data)):
+            if name not in cache:
+                cache[name] = self._arm_replicates(arm_data)
+        return cache[variation], cache[control_variation]
+
+    def _resolve_replicates(
+        self,
+        var_data: pd.DataFrame,
+        ctrl_data: pd.DataFrame,
+        replicates: Optional[Tuple[Optional[ReplicateSums], Optional[ReplicateSums]]]
+    ) -> Tuple[ReplicateSums, ReplicateSums]:
+        """Utilise les rééchantillonnages partagés s'ils sont fournis, sinon les calcule."""
+        var_reps, ctrl_reps = replicates if replicates is not None else (
+            self._arm_replicates(var_data), self._arm_replicates(ctrl_data)
+        )
+        if var_reps is None or ctrl_reps is None:
+            raise ValueError("Impossible de rééchantillonner un bras sans transaction")
+        return var_reps, ctrl_reps
+
+    def _rank_test(
+        self,
+        var_data: pd.DataFrame,
+        ctrl_data: pd.DataFrame,
+        column: str,
+        ranks: Optional[ArmPair] = None
+    ) -> MannWhitneyResult:
+        """Test de Mann-Whitney U de column, à partir des bras triés partagés s'ils sont fournis."""
+        if ranks is None:
+            ranks = RankEngine().pair(var_data, ctrl_data)
+        return ranks.mann_whitney(column)
+
+    def _iter_chunks(self, df: pd.DataFrame, chunk_rows: int = STREAM_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """Découpe un DataFrame en morceaux de chunk_rows lignes."""
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+    def stream_bootstrap_states(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        states: Optional[Dict[str, PoissonBootstrapState]] = None
+    ) -> Dict[str, PoissonBootstrapState]:
+        """
+        Accumule un bootstrap de Poisson par variation sur des morceaux de la table virtuelle.
+
+        Args:
+            chunks: Morceaux de la table virtuelle (colonnes variation, revenue, quantity)
+            states: États existants à compléter (ex: reprise ou fusion entre workers)
+
+        Returns:
+            Dict[str, PoissonBootstrapState]: État par variation
+        """
+        states = states if states is not None else {}
+        for chunk in chunks:
+            for variation, arm_chunk in chunk.groupby('variation', sort=False, observed=True):
+                name = str(variation)
+                if name not in states:
+                    states[name] = self.bootstrap.poisson_state(('revenue', 'quantity'))
+                states[name].update({
+                    'revenue': arm_chunk['revenue'].values,
+                    'quantity': arm_chunk['quantity'].values
+                })
+        return states
+
+    def calculate_streaming_intervals(
+        self,
+        states: Dict[str, PoissonBootstrapState],
+        users_by_variation: Dict[str, float],
+        control_variation: str
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Calcule AOV, ARPU et revenu total avec leurs intervalles à partir des états en flux.
+
+        Args:
+            states: États de bootstrap de Poisson par variation (éventuellement fusionnés)
+            users_by_variation: Nombre d'utilisateurs par variation
+            control_variation: Nom de la variation contrôle
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Métriques par variation (value, control_value,
+                uplift, confidence, confidence_interval) ; les variations absentes
+                des données overall sont ignorées
+
+        Raises:
+            ValueError: Contrôle sans transactions
+        """
+        if control_variation not in states:
+            raise ValueError(f"Control variation {control_variation} has no transactions")
+        ctrl_state = states[control_variation]
+        ctrl_users = float(users_by_variation.get(control_variation, 0))
+        ctrl_reps = ctrl_state.to_replicates()
+        ctrl_revenue = ctrl_state.totals['revenue']
+
+        def per_user(totals: np.ndarray, users: float) -> np.ndarray:
+            return totals / users if users > 0 else np.zeros_like(totals)
+
+        results = {}
+        for variation, state in states.items():
+            if variation not in users_by_variation:
+                logger.warning(f"Variation {variation} is missing from overall data, skipped")
+                continue
+            var_users = float(users_by_variation[variation])
+            var_reps = state.to_replicates()
+
+            var_revenue = state.totals['revenue']
+            var_aov = var_revenue / state.n_rows if state.n_rows > 0 else 0
+            ctrl_aov = ctrl_revenue / ctrl_state.n_rows if ctrl_state.n_rows > 0 else 0
+            var_arpu = var_revenue / var_users if var_users > 0 else 0
+            ctrl_arpu = ctrl_revenue / ctrl_users if ctrl_users > 0 else 0
+
+            replicates = {
+                'aov': (var_reps.mean('revenue'), ctrl_reps.mean('revenue')),
+                'arpu': (per_user(var_reps.total('revenue'), var_users), per_user(ctrl_reps.total('revenue'), ctrl_users)),
+                'total_revenue': (var_reps.total('revenue'), ctrl_reps.total('revenue'))
+            }
+            values = {
+                'aov': (var_aov, ctrl_aov),
+                'arpu': (var_arpu, ctrl_arpu),
+                'total_revenue': (var_revenue, ctrl_revenue)
+            }
+
+            metrics = {}
+            for metric, (var_value, ctrl_value) in values.items():
+                var_stats, ctrl_stats = replicates[metric]
+                lower, upper = self.bootstrap.interval_from_replicates(var_stats, ctrl_stats)
+                metrics[metric] = {
+                    'value': var_value,
+                    'control_value': ctrl_value,
+                    'uplift': ((var_value - ctrl_value) / ctrl_value) * 100 if ctrl_value > 0 else 0,
+                    # Pas de test de rangs en flux : p-value bilatérale des rééchantillonnages
+                    'confidence': round(self.bootstrap.confidence_from_replicates(var_stats, ctrl_stats), 2),
+                    'confidence_interval': {
+                        'lower': round(lower, 2),
+                        'upper': round(upper, 2)
+                    }
+                }
+            results[variation] = metrics
+        return results
+
+    @timed_stage('calculate_transaction_rate')
     def _calculate_transaction_rate(self, var_data: pd.DataFrame, ctrl_data: pd.DataFrame, var_overall: pd.Series, ctrl_overall: pd.Series) -> Dict:
-        """Calcule le taux de conversion avec le test exact de Fisher"""
+        """Calcule le taux de conversion (Fisher exact pour les petits effectifs, chi-deux au-delà)"""
         try:
             # Calcul des taux de conversion
             var_trans = len(var_data)
@@ -419,12 +1398,8 @@ class DataProcessor:
             var_rate = (var_trans / var_users) * 100 if var_users > 0 else 0
             ctrl_rate = (ctrl_trans / ctrl_users) * 100 if ctrl_users > 0 else 0
 
-            # Test exact de Fisher
-            contingency_table = [
-                [var_trans, int(var_users - var_trans)],  # [succès, échecs] variation
-                [ctrl_trans, int(ctrl_users - ctrl_trans)] # [succès, échecs] contrôle
-            ]
-            _, p_value = stats.fisher_exact(contingency_table)
+            # Tableau [succès, échecs] variation / contrôle
+            p_value, test_method = self.rate_tests.test_one(var_trans, var_users, ctrl_trans, ctrl_users)
             confidence = (1 - p_value) * 100
 
             # Calculer l'intervalle de confiance
@@ -441,6 +1416,7 @@ class DataProcessor:
                 'uplift': ((var_rate - ctrl_rate) / ctrl_rate) * 100 if ctrl_rate > 0 else 0,
                 'confidence': round(confidence, 2),
                 'confidence_interval': confidence_interval,
+                'test_method': test_method,
                 'details': {
                     'variation': {
                         'count': var_trans,
@@ -460,7 +1436,14 @@ class DataProcessor:
             logger.error(f"Error calculating transaction rate: {str(e)}")
             return self._get_default_metric_result()
 
-    def _calculate_aov(self, var_data: pd.DataFrame, ctrl_data: pd.DataFrame) -> Dict:
+    @timed_stage('calculate_aov')
+    def _calculate_aov(
+        self,
+        var_data: pd.DataFrame,
+        ctrl_data: pd.DataFrame,
+        replicates: Optional[Tuple[Optional[ReplicateSums], Optional[ReplicateSums]]] = None,
+        ranks: Optional[ArmPair] = None
+    ) -> Dict:
         """Calcule l'AOV avec le test de Mann-Whitney U"""
         try:
             # Calcul des AOV par transaction
@@ -470,34 +1453,15 @@ class DataProcessor:
             var_aov = np.mean(var_aovs) if len(var_aovs) > 0 else 0
             ctrl_aov = np.mean(ctrl_aovs) if len(ctrl_aovs) > 0 else 0
 
-            # Test de Mann-Whitney U pour la confiance
-            _, p_value = stats.mannwhitneyu(
-                var_aovs,
-                ctrl_aovs,
-                alternative='two-sided'
-            )
+            # Test de Mann-Whitney U pour la confiance (bras triés une seule fois)
+            p_value = self._rank_test(var_data, ctrl_data, 'revenue', ranks).pvalue
             confidence = (1 - p_value) * 100
 
-            # Bootstrap pour l'intervalle de confiance
-            n_bootstrap = 1000
-            diffs = []
-            
-            for _ in range(n_bootstrap):
-                # Échantillonnage avec remplacement des transactions individuelles
-                var_sample = np.random.choice(var_aovs, size=len(var_aovs), replace=True)
-                ctrl_sample = np.random.choice(ctrl_aovs, size=len(var_aovs), replace=True)
-                
-                # Calculer les moyennes des échantillons
-                var_sample_mean = np.mean(var_sample)
-                ctrl_sample_mean = np.mean(ctrl_sample)
-                
-                # Calculer la différence relative en pourcentage
-                diff_pct = ((var_sample_mean - ctrl_sample_mean) / ctrl_sample_mean) * 100 if ctrl_sample_mean != 0 else 0
-                diffs.append(diff_pct)
-
-            # Calculer les percentiles pour l'intervalle de confiance
-            lower = np.percentile(diffs, 2.5)
-            upper = np.percentile(diffs, 97.5)
+            # Bootstrap pour l'intervalle de confiance (rééchantillonnages partagés entre métriques)
+            var_reps, ctrl_reps = self._resolve_replicates(var_data, ctrl_data, replicates)
+            lower, upper = self.bootstrap.interval_from_replicates(
+                var_reps.mean('revenue'), ctrl_reps.mean('revenue')
+            )
 
             return {
                 'value': var_aov,
@@ -524,7 +1488,14 @@ class DataProcessor:
             logger.error(f"Error calculating AOV: {str(e)}")
             return self._get_default_metric_result()
 
-    def _calculate_avg_products(self, var_data: pd.DataFrame, ctrl_data: pd.DataFrame) -> Dict:
+    @timed_stage('calculate_avg_products')
+    def _calculate_avg_products(
+        self,
+        var_data: pd.DataFrame,
+        ctrl_data: pd.DataFrame,
+        replicates: Optional[Tuple[Optional[ReplicateSums], Optional[ReplicateSums]]] = None,
+        ranks: Optional[ArmPair] = None
+    ) -> Dict:
         """
         Calcule la moyenne des produits avec le test de Mann-Whitney U
         """
@@ -536,24 +1507,14 @@ class DataProcessor:
             ctrl_avg = np.mean(ctrl_quantities) if len(ctrl_quantities) > 0 else 0
 
             # Test de Mann-Whitney U
-            _, p_value = stats.mannwhitneyu(
-                var_quantities,
-                ctrl_quantities,
-                alternative='two-sided'
-            )
+            p_value = self._rank_test(var_data, ctrl_data, 'quantity', ranks).pvalue
             confidence = (1 - p_value) * 100
 
-            # Bootstrap pour l'intervalle de confiance
-            n_bootstrap = 1000
-            diffs = []
-            for _ in range(n_bootstrap):
-                var_sample = np.random.choice(var_quantities, size=len(var_quantities), replace=True)
-                ctrl_sample = np.random.choice(ctrl_quantities, size=len(ctrl_quantities), replace=True)
-                diff_pct = ((np.mean(var_sample) - np.mean(ctrl_sample)) / np.mean(ctrl_sample)) * 100
-                diffs.append(diff_pct)
-            
-            lower = np.percentile(diffs, 2.5)
-            upper = np.percentile(diffs, 97.5)
+            # Bootstrap pour l'intervalle de confiance (rééchantillonnages partagés entre métriques)
+            var_reps, ctrl_reps = self._resolve_replicates(var_data, ctrl_data, replicates)
+            lower, upper = self.bootstrap.interval_from_replicates(
+                var_reps.mean('quantity'), ctrl_reps.mean('quantity')
+            )
 
             return {
                 'value': var_avg,
@@ -590,7 +1551,13 @@ class DataProcessor:
                 }
             }
 
-    def _calculate_total_revenue(self, var_data: pd.DataFrame, ctrl_data: pd.DataFrame) -> Dict:
+    @timed_stage('calculate_total_revenue')
+    def _calculate_total_revenue(
+        self,
+        var_data: pd.DataFrame,
+        ctrl_data: pd.DataFrame,
+        ranks: Optional[ArmPair] = None
+    ) -> Dict:
         """Calcule le revenu total avec Mann-Whitney U test"""
         try:
             # Calculer les revenus totaux
@@ -598,24 +1565,12 @@ class DataProcessor:
             ctrl_revenue = ctrl_data['revenue'].sum()
             
             # Test de Mann-Whitney U pour la confiance
-            _, p_value = stats.mannwhitneyu(
-                var_data['revenue'].values,
-                ctrl_data['revenue'].values,
-                alternative='two-sided'
-            )
+            p_value = self._rank_test(var_data, ctrl_data, 'revenue', ranks).pvalue
             confidence = (1 - p_value) * 100
 
             # Calculer l'intervalle de confiance avec la méthode de Mann-Whitney U
-            # Utiliser la différence relative des distributions
-            var_values = var_data['revenue'].values
-            ctrl_values = ctrl_data['revenue'].values
-            
-            # Calculer les rangs moyens
-            var_ranks = stats.rankdata(np.concatenate([var_values, ctrl_values]))[:len(var_values)]
-            ctrl_ranks = stats.rankdata(np.concatenate([var_values, ctrl_values]))[len(var_values):]
-            
             # Calculer l'erreur standard
-            n1, n2 = len(var_values), len(ctrl_values)
+            n1, n2 = len(var_data), len(ctrl_data)
             se = np.sqrt((n1 * n2 * (n1 + n2 + 1)) / 12)
             
             # Calculer l'intervalle de confiance (95%)
@@ -654,7 +1609,16 @@ class DataProcessor:
             logger.error(f"Error calculating total revenue: {str(e)}")
             return self._get_default_metric_result()
 
-    def _calculate_arpu(self, var_data: pd.DataFrame, ctrl_data: pd.DataFrame, var_overall: pd.Series, ctrl_overall: pd.Series) -> Dict:
+    @timed_stage('calculate_arpu')
+    def _calculate_arpu(
+        self,
+        var_data: pd.DataFrame,
+        ctrl_data: pd.DataFrame,
+        var_overall: pd.Series,
+        ctrl_overall: pd.Series,
+        replicates: Optional[Tuple[Optional[ReplicateSums], Optional[ReplicateSums]]] = None,
+        ranks: Optional[ArmPair] = None
+    ) -> Dict:
         """Calcule l'ARPU (Average Revenue Per User) avec Mann-Whitney U test"""
         try:
             # Calculer l'ARPU
@@ -667,33 +1631,14 @@ class DataProcessor:
             ctrl_arpu = ctrl_revenue / ctrl_users if ctrl_users > 0 else 0
 
             # Test de Mann-Whitney U pour la confiance
-            _, p_value = stats.mannwhitneyu(
-                var_data['revenue'].values,
-                ctrl_data['revenue'].values,
-                alternative='two-sided'
-            )
+            p_value = self._rank_test(var_data, ctrl_data, 'revenue', ranks).pvalue
             confidence = (1 - p_value) * 100
 
-            # Bootstrap pour l'intervalle de confiance
-            n_bootstrap = 1000
-            diffs = []
-            
-            for _ in range(n_bootstrap):
-                # Échantillonnage avec remplacement des revenus
-                var_sample = np.random.choice(var_data['revenue'].values, size=len(var_data), replace=True)
-                ctrl_sample = np.random.choice(ctrl_data['revenue'].values, size=len(ctrl_data), replace=True)
-                
-                # Calculer l'ARPU pour chaque échantillon
-                var_sample_arpu = np.sum(var_sample) / var_users
-                ctrl_sample_arpu = np.sum(ctrl_sample) / ctrl_users
-                
-                # Calculer la différence relative en pourcentage
-                diff_pct = ((var_sample_arpu - ctrl_sample_arpu) / ctrl_sample_arpu) * 100 if ctrl_sample_arpu != 0 else 0
-                diffs.append(diff_pct)
-
-            # Calculer les percentiles pour l'intervalle de confiance
-            lower = np.percentile(diffs, 2.5)
-            upper = np.percentile(diffs, 97.5)
+            # Bootstrap pour l'intervalle de confiance (somme des revenus / utilisateurs)
+            var_reps, ctrl_reps = self._resolve_replicates(var_data, ctrl_data, replicates)
+            lower, upper = self.bootstrap.interval_from_replicates(
+                var_reps.total('revenue') / var_users, ctrl_reps.total('revenue') / ctrl_users
+            )
 
             return {
                 'value': var_arpu,
@@ -739,14 +1684,14 @@ class DataProcessor:
                 'total_records': len(df),
                 'avg_items_per_transaction': len(df) / len(df['transaction_id'].unique()),
                 'revenue_range': {
-                    'min': df['revenue'].min(),
-                    'max': df['revenue'].max(),
-                    'mean': df['revenue'].mean()
+                    'min': float(df['revenue'].min()),
+                    'max': float(df['revenue'].max()),
+                    'mean': float(df['revenue'].mean())
                 },
                 'quantity_range': {
-                    'min': df['quantity'].min(),
-                    'max': df['quantity'].max(),
-                    'mean': df['quantity'].mean()
+                    'min': float(df['quantity'].min()),
+                    'max': float(df['quantity'].max()),
+                    'mean': float(df['quantity'].mean())
                 }
             }
 
@@ -787,10 +1732,12 @@ class DataProcessor:
                 'error': str(e)
             }
 
+    @timed_stage('create_analysis_table')
     def create_analysis_table(self, data: Dict[str, Any]) -> pd.DataFrame:
         try:
-            transaction_df = pd.DataFrame(data.get('raw_data', {}).get('transaction', []))
-            overall_df = pd.DataFrame(data.get('raw_data', {}).get('overall', []))
+            with stage('dataframe'):
+                transaction_df = pd.DataFrame(data.get('raw_data', {}).get('transaction', []))
+                overall_df = pd.DataFrame(data.get('raw_data', {}).get('overall', []))
             
             if transaction_df.empty or overall_df.empty:
                 raise ValueError("Missing transaction or overall data")
@@ -821,25 +1768,31 @@ class DataProcessor:
                 'revenue': 'sum',
                 'quantity': 'sum',
                 'variation': 'first',
-                'device_category': 'first',
-                **{col: lambda x: ' | '.join(sorted(set(str(i) for i in x if pd.notna(i) and str(i).strip()))) 
-                   for col in concat_columns}
+                'device_category': 'first'
             }
 
-            # Grouper par transaction_id
-            analysis_table = transaction_df.groupby('transaction_id').agg(agg_dict).reset_index()
+            # Grouper par transaction_id ; les valeurs distinctes de chaque colonne
+            # texte sont concaténées (' | ', triées) à partir des codes des groupes
+            groupby, codes, n_groups = group_codes(transaction_df, 'transaction_id')
+            analysis_table = groupby.agg(agg_dict).reset_index()
+            for col in concat_columns:
+                analysis_table[col] = concat_unique_labels(transaction_df[col], codes, n_groups)
 
             # Arrondir les valeurs numériques
             for col in numeric_columns:
                 if col in analysis_table.columns:
                     analysis_table[col] = analysis_table[col].round(2)
 
+            if COMPACT_FRAMES:
+                analysis_table = compact_frame(analysis_table)
+
             return analysis_table
 
         except Exception as e:
             logger.error(f"Error creating analysis table: {str(e)}")
             raise
 
+    @timed_stage('convert_numpy_types')
     def _convert_numpy_types(self, obj: Any) -> Any:
         """Convertit récursivement les types numpy en types Python standards."""
         if isinstance(obj, dict):
@@ -866,17 +1819,13 @@ class DataProcessor:
         """
         try:
             if metric_type == 'rate':
-                # Test exact de Fisher pour les taux de conversion
+                # Fisher exact (petits effectifs) ou chi-deux pour les taux de conversion
                 var_success = len(var_data)
                 var_total = float(var_overall['users'])
                 ctrl_success = len(ctrl_data)
                 ctrl_total = float(ctrl_overall['users'])
                 
-                contingency_table = [
-                    [var_success, var_total - var_success],
-                    [ctrl_success, ctrl_total - ctrl_success]
-                ]
-                _, p_value = stats.fisher_exact(contingency_table)
+                p_value, _ = self.rate_tests.test_one(var_success, var_total, ctrl_success, ctrl_total)
                 confidence = (1 - p_value) * 100
                 
                 # Intervalle de confiance pour la différence de proportions
@@ -891,26 +1840,11 @@ class DataProcessor:
                 
             elif metric_type == 'continuous':
                 # Test de Mann-Whitney U pour les données continues (AOV, ARPU)
-                _, p_value = stats.mannwhitneyu(
-                    var_data,
-                    ctrl_data,
-                    alternative='two-sided'
-                )
+                _, p_value = mann_whitney(var_data, ctrl_data)
                 confidence = (1 - p_value) * 100
 
-                # Bootstrap pour l'intervalle de confiance
-                n_bootstrap = 1000
-                diffs = []
-                
-                for _ in range(n_bootstrap):
-                    var_sample = np.random.choice(var_data, size=len(var_data), replace=True)
-                    ctrl_sample = np.random.choice(ctrl_data, size=len(ctrl_data), replace=True)
-                    diff_pct = ((np.mean(var_sample) - np.mean(ctrl_sample)) / 
-                               np.mean(ctrl_sample)) * 100 if np.mean(ctrl_sample) != 0 else 0
-                    diffs.append(diff_pct)
-                
-                lower = np.percentile(diffs, 2.5)
-                upper = np.percentile(diffs, 97.5)
+                # Bootstrap vectorisé pour l'intervalle de confiance
+                lower, upper = self.bootstrap.relative_diff_interval(var_data, ctrl_data, statistic='mean')
                 
             else:  # count
                 # Test t de Student pour les comptages
@@ -936,7 +1870,13 @@ class DataProcessor:
             logger.error(f"Error calculating confidence stats: {str(e)}")
             return 0.0, 0.0, 0.0
 
-    def _calculate_revenue_metrics(self, var_data: pd.DataFrame, ctrl_data: pd.DataFrame) -> Dict:
+    @timed_stage('calculate_revenue_metrics')
+    def _calculate_revenue_metrics(
+        self,
+        var_data: pd.DataFrame,
+        ctrl_data: pd.DataFrame,
+        ranks: Optional[ArmPair] = None
+    ) -> Dict:
         """Calcule les métriques de revenus à partir de la table virtuelle"""
         try:
             # Calculer les revenus totaux
@@ -952,26 +1892,15 @@ class DataProcessor:
             ctrl_avg = ctrl_revenue / ctrl_transactions if ctrl_transactions > 0 else 0
 
             # Test de Mann-Whitney U pour la confiance
-            _, p_value = stats.mannwhitneyu(
+            p_value = self._rank_test(var_data, ctrl_data, 'revenue', ranks).pvalue
+            confidence = (1 - p_value) * 100
+
+            # Bootstrap vectorisé pour l'intervalle de confiance
+            lower, upper = self.bootstrap.relative_diff_interval(
                 var_data['revenue'].values,
                 ctrl_data['revenue'].values,
-                alternative='two-sided'
+                statistic='mean'
             )
-            confidence = (1 - p_value) * 100
-
-            # Bootstrap pour l'intervalle de confiance
-            n_bootstrap = 1000
-            diffs = []
-            for _ in range(n_bootstrap):
-                var_sample = np.random.choice(var_data['revenue'].values, size=len(var_data), replace=True)
-                ctrl_sample = np.random.choice(ctrl_data['revenue'].values, size=len(ctrl_data), replace=True)
-                var_mean = np.mean(var_sample)
-                ctrl_mean = np.mean(ctrl_sample)
-                diff_pct = ((var_mean - ctrl_mean) / ctrl_mean) * 100 if ctrl_mean != 0 else 0
-                diffs.append(diff_pct)
-            
-            lower = np.percentile(diffs, 2.5)
-            upper = np.percentile(diffs, 97.5)
 
             return {
                 'value': var_avg,
@@ -1009,7 +1938,7 @@ class DataProcessor:
             }
 
     def _calculate_add_to_cart_confidence(self, var_adds: float, var_users: float, ctrl_adds: float, ctrl_users: float) -> float:
-        """Calcule la confiance statistique pour le taux d'ajout au panier avec le test exact de Fisher"""
+        """Calcule la confiance statistique pour le taux d'ajout au panier (Fisher exact ou chi-deux selon les effectifs)"""
         try:
             # Convertir les valeurs en nombres
             var_adds = float(var_adds)
@@ -1017,14 +1946,8 @@ class DataProcessor:
             ctrl_adds = float(ctrl_adds)
             ctrl_users = float(ctrl_users)
             
-            # Créer la table de contingence
-            contingency_table = [
-                [int(var_adds), int(var_users - var_adds)],   # [succès, échecs] variation
-                [int(ctrl_adds), int(ctrl_users - ctrl_adds)] # [succès, échecs] contrôle
-            ]
-            
-            # Test exact de Fisher
-            _, p_value = stats.fisher_exact(contingency_table)
+            # Table de contingence [succès, échecs] variation / contrôle
+            p_value, _ = self.rate_tests.test_one(var_adds, var_users, ctrl_adds, ctrl_users)
             confidence = (1 - p_value) * 100
             
             return round(confidence, 2)
@@ -1032,15 +1955,18 @@ class DataProcessor:
             logger.error(f"Error calculating add to cart confidence: {str(e)}")
             return 0.0
 
+    def _rate_test_method(self, var_success: float, var_total: float, ctrl_success: float, ctrl_total: float) -> Optional[str]:
+        """Test retenu pour comparer deux taux (None si le tableau est invalide)."""
+        try:
+            return str(self.rate_tests.methods(var_success, var_total, ctrl_success, ctrl_total)[0])
+        except ValueError:
+            return None
+
     def _calculate_revenue_confidence(self, var_revenue: np.array, ctrl_revenue: np.array) -> float:
         """Calcule la confiance statistique pour le revenu avec le test de Mann-Whitney U"""
         try:
             # Test de Mann-Whitney U
-            _, p_value = stats.mannwhitneyu(
-                var_revenue,
-                ctrl_revenue,
-                alternative='two-sided'
-            )
+            _, p_value = mann_whitney(var_revenue, ctrl_revenue)
             confidence = (1 - p_value) * 100
             
             return round(confidence, 2)
@@ -1051,33 +1977,8 @@ class DataProcessor:
     def _calculate_revenue_confidence_interval(self, var_revenue: np.array, ctrl_revenue: np.array) -> Dict[str, float]:
         """Calcule l'intervalle de confiance pour le revenu total avec bootstrap"""
         try:
-            # Bootstrap pour l'intervalle de confiance
-            n_bootstrap = 1000
-            diffs = []
-            
-            # Calculer les sommes totales initiales
-            var_total = np.sum(var_revenue)
-            ctrl_total = np.sum(ctrl_revenue)
-            
-            # Calculer la différence relative observée
-            observed_diff = ((var_total - ctrl_total) / ctrl_total) * 100 if ctrl_total != 0 else 0
-            
-            for _ in range(n_bootstrap):
-                # Échantillonnage avec remplacement
-                var_sample = np.random.choice(var_revenue, size=len(var_revenue), replace=True)
-                ctrl_sample = np.random.choice(ctrl_revenue, size=len(ctrl_revenue), replace=True)
-                
-                # Calculer les sommes totales pour chaque échantillon
-                var_sum = np.sum(var_sample)
-                ctrl_sum = np.sum(ctrl_sample)
-                
-                # Calculer la différence relative pour cet échantillon
-                diff_pct = ((var_sum - ctrl_sum) / ctrl_sum) * 100 if ctrl_sum != 0 else 0
-                diffs.append(diff_pct)
-            
-            # Calculer les percentiles pour l'intervalle de confiance
-            lower = np.percentile(diffs, 2.5)  # 2.5ème percentile pour 95% IC
-            upper = np.percentile(diffs, 97.5) # 97.5ème percentile pour 95% IC
+            # Bootstrap vectorisé sur les sommes totales (percentiles 2.5 / 97.5 pour 95% IC)
+            lower, upper = self.bootstrap.relative_diff_interval(var_revenue, ctrl_revenue, statistic='sum')
             
             return {
                 'lower': round(lower, 2),
@@ -1153,11 +2054,7 @@ class DataProcessor:
         """Calcule la confiance statistique pour le nombre moyen de produits avec Mann-Whitney U"""
         try:
             # Test de Mann-Whitney U
-            _, p_value = stats.mannwhitneyu(
-                var_data,
-                ctrl_data,
-                alternative='two-sided'
-            )
+            _, p_value = mann_whitney(var_data, ctrl_data)
             confidence = (1 - p_value) * 100
             
             return round(confidence, 2)
@@ -1168,28 +2065,8 @@ class DataProcessor:
     def _calculate_avg_products_confidence_interval(self, var_data: np.array, ctrl_data: np.array) -> Dict[str, float]:
         """Calcule l'intervalle de confiance pour le nombre moyen de produits avec bootstrap"""
         try:
-            n_bootstrap = 1000
-            diffs = []
-            
-            # Moyennes initiales
-            var_mean = np.mean(var_data)
-            ctrl_mean = np.mean(ctrl_data)
-            
-            # Différence relative observée
-            observed_diff = ((var_mean - ctrl_mean) / ctrl_mean) * 100 if ctrl_mean != 0 else 0
-            
-            for _ in range(n_bootstrap):
-                var_sample = np.random.choice(var_data, size=len(var_data), replace=True)
-                ctrl_sample = np.random.choice(ctrl_data, size=len(ctrl_data), replace=True)
-                
-                var_sample_mean = np.mean(var_sample)
-                ctrl_sample_mean = np.mean(ctrl_sample)
-                
-                diff_pct = ((var_sample_mean - ctrl_sample_mean) / ctrl_sample_mean) * 100 if ctrl_sample_mean != 0 else 0
-                diffs.append(diff_pct)
-            
-            lower = np.percentile(diffs, 2.5)
-            upper = np.percentile(diffs, 97.5)
+            # Bootstrap vectorisé sur les moyennes
+            lower, upper = self.bootstrap.relative_diff_interval(var_data, ctrl_data, statistic='mean')
             
             return {
                 'lower': round(lower, 2),
@@ -1199,8 +2076,19 @@ class DataProcessor:
             logger.error(f"Error calculating avg products confidence interval: {str(e)}")
             return {'lower': 0, 'upper': 0}
 
-    def calculate_revenue_distribution_stats(self, var_data: pd.DataFrame, ctrl_data: pd.DataFrame, range_info: Dict) -> Dict:
-        """Calcule les statistiques pour la distribution des revenus"""
+    def calculate_revenue_distribution_stats(
+        self,
+        var_data: pd.DataFrame,
+        ctrl_data: pd.DataFrame,
+        range_info: Dict,
+        ranks: Optional[ArmPair] = None
+    ) -> Dict:
+        """
+        Calcule les statistiques pour la distribution des revenus.
+
+        Le test de Mann-Whitney U porte sur l'ensemble des revenus des deux bras :
+        passer le même ranks pour toutes les tranches évite de le recalculer.
+        """
         try:
             # Filtrer les données pour ce range
             var_in_range = var_data[(var_data['revenue'] >= range_info['min']) & (var_data['revenue'] <= range_info['max'])]
@@ -1211,11 +2099,7 @@ class DataProcessor:
             ctrl_rate = (len(ctrl_in_range) / len(ctrl_data)) * 100 if len(ctrl_data) > 0 else 0
 
             # Test de Mann-Whitney U pour la confiance
-            _, p_value = stats.mannwhitneyu(
-                var_data['revenue'].values,
-                ctrl_data['revenue'].values,
-                alternative='two-sided'
-            )
+            p_value = self._rank_test(var_data, ctrl_data, 'revenue', ranks).pvalue
             confidence = (1 - p_value) * 100
 
             # Calculer l'intervalle de confiance avec la méthode de Wilson
@@ -0,0 +1,156 @@
+# file_loader.py
+
+import os
+import gzip
+import numpy as np
+import pandas as pd
+from typing import Optional, Iterator, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Nombre de lignes lues par morceau (CSV) ou par lot (Parquet)
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", 100_000))
+
+# Colonnes d'identifiants et de segments : toujours lues comme texte
+# (un identifiant '0012' ne doit pas devenir l'entier 12)
+TEXT_COLUMNS = {
+    'transaction_id': str,
+    'variation': str,
+    'device_category': str,
+    'item_category2': str,
+    'item_name': str,
+    'item_bundle': str,
+    'item_name_simple': str
+}
+
+SUPPORTED_FORMATS = ('csv', 'csv.gz', 'parquet', 'arrow')
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_PARQUET_MAGIC = b'PAR1'
+# Fichier Arrow IPC ('ARROW1') ou flux IPC (marqueur de continuation 0xFFFFFFFF)
+_ARROW_FILE_MAGIC = b'ARROW1'
+_ARROW_STREAM_MAGIC = b'\xff\xff\xff\xff'
+_ARROW_EXTENSIONS = ('.arrow', '.arrows', '.feather', '.ipc')
+
+
+class UnsupportedFormatError(ValueError):
+    """Levée lorsque le format du fichier n'est pas pris en charge dans cet environnement."""
+
+
+def detect_format(path: str, filename: Optional[str] = None) -> str:
+    """
+    Détermine le format d'un fichier à partir de ses premiers octets, puis de son nom.
+
+    Returns:
+        str: 'csv', 'csv.gz', 'parquet' ou 'arrow'
+    """
+    with open(path, 'rb') as f:
+        head = f.read(6)
+    if head.startswith(_GZIP_MAGIC):
+        return 'csv.gz'
+    if head.startswith(_PARQUET_MAGIC):
+        return 'parquet'
+    if head == _ARROW_FILE_MAGIC or head.startswith(_ARROW_STREAM_MAGIC):
+        return 'arrow'
+
+    name = (filename or path).lower()
+    if name.endswith('.parquet') or name.endswith('.pq'):
+        return 'parquet'
+    if name.endswith(_ARROW_EXTENSIONS):
+        return 'arrow'
+    if name.endswith('.gz'):
+        return 'csv.gz'
+    return 'csv'
+
+
+def _iter_csv_chunks(path: str, compressed: bool, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    reader = pd.read_csv(
+        path,
+        compression='gzip' if compressed else None,
+        chunksize=chunk_rows,
+        dtype=TEXT_COLUMNS,
+        skipinitialspace=True
+    )
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+def _text_columns(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Aligne les colonnes d'identifiants d'un lot Arrow/Parquet sur la lecture CSV (texte)."""
+    for col in TEXT_COLUMNS:
+        if col in chunk.columns and chunk[col].dtype != object:
+            chunk[col] = chunk[col].astype(str).where(chunk[col].notna(), np.nan)
+    return chunk
+
+
+def _iter_parquet_chunks(path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise UnsupportedFormatError("La lecture des fichiers Parquet nécessite pyarrow")
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows):
+        yield _text_columns(batch.to_pandas())
+
+
+def _iter_arrow_chunks(path: str) -> Iterator[pd.DataFrame]:
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError:
+        raise UnsupportedFormatError("La lecture des fichiers Arrow nécessite pyarrow")
+
+    # Lecture en mémoire partagée : les lots pointent directement dans le fichier
+    with pa.memory_map(path, 'r') as source:
+        if source.read(6) == _ARROW_FILE_MAGIC:
+            source.seek(0)
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        else:
+            source.seek(0)
+            batches = pa.ipc.open_stream(source)
+        for batch in batches:
+            yield _text_columns(batch.to_pandas())
+
+
+def iter_frame_chunks(path: str, filename: Optional[str] = None, chunk_rows: int = UPLOAD_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Lit un fichier CSV (éventuellement gzip), Parquet ou Arrow IPC morceau par morceau.
+
+    Args:
+        path: Chemin du fichier sur disque
+        filename: Nom d'origine du fichier (sert à la détection du format)
+        chunk_rows: Nombre de lignes par morceau
+
+    Returns:
+        Iterator[pd.DataFrame]: Morceaux typés, dans l'ordre du fichier
+    """
+    file_format = detect_format(path, filename)
+    logger.info(f"Lecture de {filename or path} ({file_format}) par morceaux de {chunk_rows} lignes")
+    if file_format == 'parquet':
+        return _iter_parquet_chunks(path, chunk_rows)
+    if file_format == 'arrow':
+        return _iter_arrow_chunks(path)
+    return _iter_csv_chunks(path, file_format == 'csv.gz', chunk_rows)
+
+
+def read_frame(path: str, filename: Optional[str] = None, chunk_rows: int = UPLOAD_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Lit un fichier complet en un DataFrame colonnaire, sans passer par des dictionnaires par ligne.
+
+    Raises:
+        UnsupportedFormatError: Format non lisible dans cet environnement
+        ValueError: Fichier vide ou illisible
+    """
+    try:
+        chunks: List[pd.DataFrame] = list(iter_frame_chunks(path, filename, chunk_rows))
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError, gzip.BadGzipFile) as e:
+        raise ValueError(f"Fichier {filename or path} illisible: {str(e)}")
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,154 @@
+# incremental.py
+
+import time
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+from api.processors.moments import RunningMoments, value_runs, merge_runs
+from api.processors.analysis_context import detect_control
+from api.processors.rank_engine import SortedSample
+
+logger = logging.getLogger(__name__)
+
+# Colonnes de la table virtuelle dont les runs triés sont conservés (tests de rangs)
+RUN_COLUMNS = ('revenue', 'quantity')
+
+
+class DuplicateBatchError(ValueError):
+    """Le lot (ex: l'export d'un jour) a déjà été ajouté à ce test."""
+
+
+class ArmState:
+    """Statistiques suffisantes fusionnables d'une variation."""
+
+    def __init__(
+        self,
+        users: float = 0.0,
+        add_to_carts: float = 0.0,
+        moments: Optional[Dict[str, RunningMoments]] = None,
+        runs: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None
+    ):
+        self.users = float(users)
+        self.add_to_carts = float(add_to_carts)
+        self.moments = moments or {column: RunningMoments() for column in RUN_COLUMNS}
+        empty = (np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.int64))
+        self.runs = runs or {column: empty for column in RUN_COLUMNS}
+
+    @property
+    def transactions(self) -> int:
+        return self.moments['revenue'].count
+
+    def add(self, users: float, add_to_carts: float, transactions: pd.DataFrame) -> None:
+        """Ajoute les utilisateurs et les transactions (table virtuelle) d'un nouveau lot."""
+        self.users += float(users)
+        self.add_to_carts += float(add_to_carts)
+        for column in RUN_COLUMNS:
+            values = transactions[column].to_numpy(dtype=np.float64)
+            self.moments[column] = self.moments[column].merge(RunningMoments.from_values(values))
+            self.runs[column] = merge_runs(*self.runs[column], *value_runs(values))
+
+    def sample(self, column: str) -> SortedSample:
+        """Échantillon trié de la colonne, reconstitué à partir des runs."""
+        return SortedSample.from_runs(*self.runs[column])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'users': self.users,
+            'add_to_carts': self.add_to_carts,
+            'moments': {column: moments.to_dict() for column, moments in self.moments.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], runs: Dict[str, Tuple[np.ndarray, np.ndarray]]) -> 'ArmState':
+        return cls(
+            data['users'],
+            data['add_to_carts'],
+            {column: RunningMoments.from_dict(moments) for column, moments in data['moments'].items()},
+            runs
+        )
+
+
+class IncrementalTest:
+    """
+    État cumulé d'un test en cours : une ArmState par variation et la liste
+    des lots déjà ajoutés.
+
+    Chaque lot (export quotidien) ne met à jour que des statistiques
+    fusionnables ; le coût d'un ajout dépend de la taille du lot et du nombre
+    de valeurs distinctes, pas de la durée du test.
+    """
+
+    def __init__(
+        self,
+        test_id: str,
+        control_variation: Optional[str] = None,
+        arms: Optional[Dict[str, ArmState]] = None,
+        batches: Optional[List[str]] = None,
+        version: int = 0,
+        updated_at: Optional[float] = None
+    ):
+        self.test_id = test_id
+        self.control_variation = control_variation
+        self.arms: Dict[str, ArmState] = arms or {}
+        self.batches: List[str] = batches or []
+        self.version = version
+        self.updated_at = updated_at
+
+    def append(self, overall_df: pd.DataFrame, virtual_table: pd.DataFrame, batch_id: Optional[str] = None) -> None:
+        """
+        Ajoute un lot : lignes overall du lot (utilisateurs par variation) et
+        transactions agrégées (table virtuelle) du lot.
+
+        Raises:
+            DuplicateBatchError: batch_id déjà ajouté
+        """
+        if batch_id is not None and batch_id in self.batches:
+            raise DuplicateBatchError(f"Batch {batch_id} already appended to test {self.test_id}")
+        if self.control_variation is None:
+            self.control_variation = detect_control(overall_df)
+
+        overall = overall_df.assign(variation=overall_df['variation'].astype(str))
+        overall_totals = overall.groupby('variation', sort=False)[['users', 'user_add_to_carts']].sum()
+        partitions = {
+            str(variation): rows for variation, rows in virtual_table.groupby('variation', sort=False, observed=True)
+        }
+        for variation in dict.fromkeys(list(overall_totals.index) + list(partitions)):
+            arm = self.arms.setdefault(variation, ArmState())
+            users, add_to_carts = overall_totals.loc[variation] if variation in overall_totals.index else (0.0, 0.0)
+            arm.add(users, add_to_carts, partitions.get(variation, virtual_table.iloc[0:0]))
+
+        self.batches.append(batch_id if batch_id is not None else f"batch-{len(self.batches) + 1}")
+        self.updated_at = time.time()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'test_id': self.test_id,
+            'control': self.control_variation,
+            'variations': list(self.arms),
+            'batches': list(self.batches),
+            'transactions': sum(arm.transactions for arm in self.arms.values()),
+            'updated_at': self.updated_at
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """État sérialisable en JSON (sans les runs, stockés à part)."""
+        return {
+            'test_id': self.test_id,
+            'control_variation': self.control_variation,
+            'arms': {variation: arm.to_dict() for variation, arm in self.arms.items()},
+            'batches': self.batches,
+            'version': self.version,
+            'updated_at': self.updated_at
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], runs: Dict[str, Dict[str, Tuple[np.ndarray, np.ndarray]]]) -> 'IncrementalTest':
+        return cls(
+            data['test_id'],
+            data['control_variation'],
+            {variation: ArmState.from_dict(arm, runs[variation]) for variation, arm in data['arms'].items()},
+            data['batches'],
+            data['version'],
+            data['updated_at']
+        )
@@ -0,0 +1,85 @@
+# moments.py
+
+import numpy as np
+from typing import Any, Dict, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RunningMoments:
+    """
+    Statistiques suffisantes fusionnables d'une colonne : effectif, somme,
+    moyenne et somme des carrés des écarts (M2).
+
+    Deux jeux de moments se fusionnent sans revenir aux observations
+    (formule de Chan et al.), ce qui permet de mettre à jour un test au fil
+    des exports quotidiens.
+    """
+
+    def __init__(self, count: int = 0, total: float = 0.0, mean: float = 0.0, m2: float = 0.0):
+        self.count = int(count)
+        self.total = float(total)
+        self.mean = float(mean)
+        self.m2 = float(m2)
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> 'RunningMoments':
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return cls()
+        mean = float(values.mean())
+        return cls(len(values), float(values.sum()), mean, float(((values - mean) ** 2).sum()))
+
+    def merge(self, other: 'RunningMoments') -> 'RunningMoments':
+        """Moments de l'union des deux échantillons."""
+        if other.count == 0:
+            return RunningMoments(self.count, self.total, self.mean, self.m2)
+        if self.count == 0:
+            return RunningMoments(other.count, other.total, other.mean, other.m2)
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        mean = self.mean + delta * other.count / count
+        m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / count
+        return RunningMoments(count, self.total + other.total, mean, m2)
+
+    @property
+    def variance(self) -> float:
+        """Variance d'échantillon (ddof=1), NaN pour moins de deux observations."""
+        return self.m2 / (self.count - 1) if self.count > 1 else float('nan')
+
+    def padded(self, count: int) -> 'RunningMoments':
+        """Moments du même échantillon complété par des zéros jusqu'à count observations (ex: ARPU)."""
+        return self.merge(RunningMoments(count=count - self.count)) if count > self.count else self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'count': self.count, 'total': self.total, 'mean': self.mean, 'm2': self.m2}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RunningMoments':
+        return cls(data['count'], data['total'], data['mean'], data['m2'])
+
+
+def value_runs(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Valeurs distinctes triées d'un échantillon et leur nombre d'occurrences."""
+    unique, counts = np.unique(np.asarray(values, dtype=np.float64), return_counts=True)
+    return unique, counts.astype(np.int64)
+
+
+def merge_runs(
+    values: np.ndarray,
+    counts: np.ndarray,
+    new_values: np.ndarray,
+    new_counts: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fusionne deux listes de runs triées.
+
+    Le coût dépend du nombre de valeurs distinctes (montants, quantités), pas
+    du nombre d'observations accumulées depuis le début du test.
+    """
+    if len(values) == 0:
+        return np.asarray(new_values, dtype=np.float64), np.asarray(new_counts, dtype=np.int64)
+    merged, inverse = np.unique(np.concatenate((values, new_values)), return_inverse=True)
+    merged_counts = np.bincount(inverse, weights=np.concatenate((counts, new_counts)), minlength=len(merged))
+    return merged, merged_counts.astype(np.int64)
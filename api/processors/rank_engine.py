@@ -0,0 +1,221 @@
+# rank_engine.py
+
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+from typing import Dict, Hashable, NamedTuple, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# En dessous de cette taille (pour l'un des échantillons), scipy peut choisir la méthode exacte
+EXACT_MAX_SIZE = 8
+
+
+class MannWhitneyResult(NamedTuple):
+    """Résultat du test de Mann-Whitney U (U de x, p-value bilatérale)."""
+    statistic: float
+    pvalue: float
+
+
+def _run_lengths(sorted_values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Valeurs distinctes et nombre d'occurrences d'un tableau déjà trié."""
+    if len(sorted_values) == 0:
+        return sorted_values, np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], sorted_values[1:] != sorted_values[:-1])))
+    counts = np.diff(np.append(starts, len(sorted_values)))
+    return sorted_values[starts], counts
+
+
+class SortedSample:
+    """
+    Échantillon trié une seule fois.
+
+    Il peut être construit à partir des observations, ou directement à partir
+    de ses runs (valeurs distinctes triées et nombre d'occurrences) : les tests
+    ne travaillent que sur les runs, les observations ne sont reconstituées que
+    pour les petits échantillons délégués à scipy.
+    """
+
+    def __init__(self, values: np.ndarray, presorted: bool = False):
+        values = np.asarray(values, dtype=np.float64)
+        self._values: Optional[np.ndarray] = values if presorted else np.sort(values)
+        self.n = len(self._values)
+        self.has_nan = bool(self.n and np.isnan(self._values[-1]))
+        self._runs: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @classmethod
+    def from_runs(cls, values: np.ndarray, counts: np.ndarray) -> 'SortedSample':
+        """Échantillon décrit par ses valeurs distinctes triées et leurs effectifs."""
+        sample = cls.__new__(cls)
+        sample._runs = (np.asarray(values, dtype=np.float64), np.asarray(counts, dtype=np.int64))
+        sample._values = None
+        sample.n = int(sample._runs[1].sum())
+        sample.has_nan = bool(len(sample._runs[0]) and np.isnan(sample._runs[0][-1]))
+        return sample
+
+    @property
+    def values(self) -> np.ndarray:
+        if self._values is None:
+            self._values = np.repeat(*self._runs)
+        return self._values
+
+    @property
+    def runs(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._runs is None:
+            self._runs = _run_lengths(self._values)
+        return self._runs
+
+
+def _tie_term(x: SortedSample, y: SortedSample) -> float:
+    """Somme de t^3 - t sur les groupes d'ex-aequo de l'échantillon combiné."""
+    x_values, x_counts = x.runs
+    y_values, y_counts = y.runs
+    idx = np.searchsorted(y_values, x_values)
+    matched = idx < len(y_values)
+    matched[matched] = y_values[idx[matched]] == x_values[matched]
+    ties = x_counts.astype(np.float64)
+    ties[matched] += y_counts[idx[matched]]
+    y_unmatched = np.ones(len(y_values), dtype=bool)
+    y_unmatched[idx[matched]] = False
+    all_ties = np.concatenate((ties, y_counts[y_unmatched].astype(np.float64)))
+    return float((all_ties ** 3 - all_ties).sum())
+
+
+def mann_whitney_samples(x: SortedSample, y: SortedSample) -> MannWhitneyResult:
+    """
+    Test de Mann-Whitney U bilatéral à partir de deux échantillons triés.
+
+    Reproduit scipy.stats.mannwhitneyu(x, y, alternative='two-sided') : méthode
+    asymptotique avec corrections de continuité et des ex-aequo ; les petits
+    échantillons sont délégués à scipy (qui peut alors choisir la méthode exacte).
+
+    Raises:
+        ValueError: Échantillon vide (comme scipy)
+    """
+    n1, n2 = x.n, y.n
+    if n1 == 0 or n2 == 0:
+        raise ValueError("`x` and `y` must be of nonzero size.")
+    if x.has_nan or y.has_nan:
+        return MannWhitneyResult(np.nan, np.nan)
+    if min(n1, n2) <= EXACT_MAX_SIZE:
+        result = stats.mannwhitneyu(x.values, y.values, alternative='two-sided')
+        return MannWhitneyResult(float(result.statistic), float(result.pvalue))
+
+    # U1 = nombre de paires (x, y) avec x > y, les égalités comptant pour 1/2,
+    # calculé sur les valeurs distinctes pondérées par leurs effectifs
+    x_values, x_counts = x.runs
+    y_values, y_counts = y.runs
+    y_cumulative = np.concatenate(([0], np.cumsum(y_counts)))
+    less = y_cumulative[np.searchsorted(y_values, x_values, side='left')]
+    less_equal = y_cumulative[np.searchsorted(y_values, x_values, side='right')]
+    u1 = float((x_counts * (less + 0.5 * (less_equal - less))).sum())
+    u = max(u1, n1 * n2 - u1)
+
+    n = n1 + n2
+    sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - _tie_term(x, y) / (n * (n - 1))))
+    if sigma == 0:
+        return MannWhitneyResult(u1, 1.0)
+    z = (u - n1 * n2 / 2 - 0.5) / sigma
+    return MannWhitneyResult(u1, float(np.clip(2 * stats.norm.sf(z), 0, 1)))
+
+
+def mann_whitney_sorted(x_sorted: np.ndarray, y_sorted: np.ndarray) -> float:
+    """
+    p-value bilatérale du test de Mann-Whitney U pour deux tableaux déjà triés.
+
+    Un échantillon vide donne une p-value de 1 (aucune différence mesurable).
+    """
+    if len(x_sorted) == 0 or len(y_sorted) == 0:
+        return 1.0
+    return mann_whitney_samples(SortedSample(x_sorted, presorted=True), SortedSample(y_sorted, presorted=True)).pvalue
+
+
+def mann_whitney(x: np.ndarray, y: np.ndarray) -> MannWhitneyResult:
+    """Test de Mann-Whitney U bilatéral de x contre y (sans cache, ValueError si un échantillon est vide)."""
+    return mann_whitney_samples(SortedSample(x), SortedSample(y))
+
+
+class RankEngine:
+    """
+    Tests de rangs à partir d'échantillons triés une seule fois.
+
+    Chaque bras est trié à sa première utilisation puis conservé sous sa clé
+    (ex: ('revenue', 'Control')) : le contrôle n'est trié qu'une fois pour
+    toutes les variations, et les métriques qui testent les mêmes colonnes
+    (AOV, revenu total, ARPU) réutilisent le même résultat. Un moteur ne doit
+    servir que pour un seul jeu de données.
+    """
+
+    def __init__(self):
+        self._samples: Dict[Hashable, SortedSample] = {}
+        self._results: Dict[Tuple[Hashable, Hashable], MannWhitneyResult] = {}
+
+    def sample(self, values: np.ndarray, key: Optional[Hashable] = None) -> SortedSample:
+        """Échantillon trié, mis en cache sous key si elle est fournie."""
+        if key is None:
+            return SortedSample(values)
+        sample = self._samples.get(key)
+        if sample is None:
+            sample = self._samples[key] = SortedSample(values)
+        return sample
+
+    def mann_whitney(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        x_key: Optional[Hashable] = None,
+        y_key: Optional[Hashable] = None
+    ) -> MannWhitneyResult:
+        """
+        Test de Mann-Whitney U bilatéral de x contre y.
+
+        Args:
+            x: Observations de la variation
+            y: Observations du contrôle
+            x_key: Clé de cache de x (None : pas de cache)
+            y_key: Clé de cache de y (None : pas de cache)
+
+        Returns:
+            MannWhitneyResult: (U de x, p-value)
+        """
+        pair = (x_key, y_key)
+        cacheable = x_key is not None and y_key is not None
+        if cacheable and pair in self._results:
+            return self._results[pair]
+        result = mann_whitney_samples(self.sample(x, x_key), self.sample(y, y_key))
+        if cacheable:
+            self._results[pair] = result
+        return result
+
+    def pair(self, var_data: pd.DataFrame, ctrl_data: pd.DataFrame, variation: Hashable = None, control: Hashable = None) -> 'ArmPair':
+        """Comparaisons d'une variation contre le contrôle, colonne par colonne, adossées à ce moteur."""
+        return ArmPair(self, var_data, ctrl_data, variation, control)
+
+
+class ArmPair:
+    """
+    Tests de rangs (variation contre contrôle) d'un couple de bras.
+
+    Les bras nommés sont mis en cache dans le moteur sous (colonne, bras) ;
+    sans nom, chaque colonne est triée à la demande sans cache partagé.
+    """
+
+    def __init__(self, engine: RankEngine, var_data: pd.DataFrame, ctrl_data: pd.DataFrame, variation: Hashable = None, control: Hashable = None):
+        self.engine = engine
+        self.var_data = var_data
+        self.ctrl_data = ctrl_data
+        self.variation = variation
+        self.control = control
+
+    def _key(self, column: str, arm: Hashable) -> Optional[Tuple[str, Hashable]]:
+        return None if arm is None else (column, arm)
+
+    def mann_whitney(self, column: str) -> MannWhitneyResult:
+        """Test de Mann-Whitney U bilatéral de la colonne column (ValueError si un bras est vide)."""
+        return self.engine.mann_whitney(
+            self.var_data[column].values,
+            self.ctrl_data[column].values,
+            self._key(column, self.variation),
+            self._key(column, self.control)
+        )
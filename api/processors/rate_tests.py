@@ -0,0 +1,108 @@
+# rate_tests.py
+
+import os
+import numpy as np
+import scipy.stats as stats
+from typing import Tuple, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Au-delà de cet effectif total (tableau 2x2), le test exact de Fisher est
+# remplacé par le chi-deux ; voir api/benchmarks/bench_rate_tests.py
+RATE_TEST_EXACT_MAX_TOTAL = int(os.getenv("RATE_TEST_EXACT_MAX_TOTAL", 10_000))
+
+# Effectif attendu minimal d'une cellule pour que l'approximation du chi-deux soit valable
+MIN_EXPECTED_COUNT = 5.0
+
+FISHER_EXACT = 'fisher_exact'
+CHI_SQUARE = 'chi2_yates'
+
+ArrayLike = Union[float, np.ndarray]
+
+
+class RateTestEngine:
+    """
+    Comparaison de taux (succès / total) d'une variation contre le contrôle.
+
+    Le test exact de Fisher est utilisé pour les petits effectifs (effectif
+    total <= exact_max_total ou une cellule attendue < MIN_EXPECTED_COUNT) ;
+    au-delà, le chi-deux avec correction de Yates (équivalent au test z de deux
+    proportions avec correction de continuité) est calculé de façon vectorisée
+    sur tous les tableaux à la fois.
+    """
+
+    def __init__(self, exact_max_total: int = RATE_TEST_EXACT_MAX_TOTAL, min_expected: float = MIN_EXPECTED_COUNT):
+        self.exact_max_total = exact_max_total
+        self.min_expected = min_expected
+
+    @staticmethod
+    def _tables(successes: ArrayLike, totals: ArrayLike, ctrl_successes: ArrayLike, ctrl_totals: ArrayLike) -> Tuple[np.ndarray, ...]:
+        a, n1, c, n2 = np.broadcast_arrays(*(
+            np.atleast_1d(np.asarray(x, dtype=np.float64)) for x in (successes, totals, ctrl_successes, ctrl_totals)
+        ))
+        # Les effectifs sont entiers, comme dans le tableau transmis à fisher_exact
+        a, n1, c, n2 = (np.trunc(x) for x in (a, n1, c, n2))
+        b, d = n1 - a, n2 - c
+        if np.any(np.stack((a, b, c, d)) < 0) or not np.all(np.isfinite(np.stack((a, b, c, d)))):
+            raise ValueError("All values in `table` must be nonnegative.")
+        return a, b, c, d
+
+    def _use_exact(self, a: np.ndarray, b: np.ndarray, c: np.ndarray, d: np.ndarray) -> np.ndarray:
+        total = a + b + c + d
+        with np.errstate(divide='ignore', invalid='ignore'):
+            min_expected = np.minimum(a + b, c + d) * np.minimum(a + c, b + d) / total
+        return (total <= self.exact_max_total) | ~(min_expected >= self.min_expected)
+
+    def methods(self, successes: ArrayLike, totals: ArrayLike, ctrl_successes: ArrayLike, ctrl_totals: ArrayLike) -> np.ndarray:
+        """Méthode retenue pour chaque tableau, sans calculer le test."""
+        use_exact = self._use_exact(*self._tables(successes, totals, ctrl_successes, ctrl_totals))
+        return np.where(use_exact, FISHER_EXACT, CHI_SQUARE).astype(object)
+
+    def test(
+        self,
+        successes: ArrayLike,
+        totals: ArrayLike,
+        ctrl_successes: ArrayLike,
+        ctrl_totals: ArrayLike
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        p-values bilatérales de plusieurs tableaux 2x2 [[succès, échecs] variation, [succès, échecs] contrôle].
+
+        Les arguments sont diffusés (broadcast) les uns sur les autres.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (p-values, méthode utilisée pour chaque tableau)
+
+        Raises:
+            ValueError: Tableau avec une cellule négative (comme fisher_exact)
+        """
+        a, b, c, d = self._tables(successes, totals, ctrl_successes, ctrl_totals)
+        use_exact = self._use_exact(a, b, c, d)
+        p_values = np.empty(len(a))
+
+        asymptotic = np.flatnonzero(~use_exact)
+        if len(asymptotic):
+            p_values[asymptotic] = chi_square_yates(a[asymptotic], b[asymptotic], c[asymptotic], d[asymptotic])
+        for i in np.flatnonzero(use_exact):
+            _, p_values[i] = stats.fisher_exact([[int(a[i]), int(b[i])], [int(c[i]), int(d[i])]])
+
+        return p_values, np.where(use_exact, FISHER_EXACT, CHI_SQUARE).astype(object)
+
+    def test_one(self, successes: float, totals: float, ctrl_successes: float, ctrl_totals: float) -> Tuple[float, str]:
+        """p-value et méthode d'un seul tableau 2x2."""
+        p_values, methods = self.test(successes, totals, ctrl_successes, ctrl_totals)
+        return float(p_values[0]), str(methods[0])
+
+
+def chi_square_yates(a: np.ndarray, b: np.ndarray, c: np.ndarray, d: np.ndarray) -> np.ndarray:
+    """
+    p-values du chi-deux avec correction de Yates pour des tableaux 2x2 [[a, b], [c, d]].
+
+    Équivaut à stats.chi2_contingency(table, correction=True) tableau par tableau.
+    """
+    total = a + b + c + d
+    with np.errstate(divide='ignore', invalid='ignore'):
+        deviation = np.maximum(np.abs(a * d - b * c) - total / 2, 0)
+        statistic = total * deviation ** 2 / ((a + b) * (c + d) * (a + c) * (b + d))
+    return np.where(np.isfinite(statistic), stats.chi2.sf(statistic, 1), 1.0)
@@ -0,0 +1,120 @@
+# revenue_buckets.py
+
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Modes de découpage automatique : quantiles des revenus (effectifs
+# équilibrés) ou bornes log-espacées (montants sur plusieurs ordres de grandeur)
+BIN_MODES = ('quantile', 'log')
+DEFAULT_BINS = 10
+MAX_BINS = 200
+
+
+def explicit_edges(edges: Sequence[Optional[float]]) -> np.ndarray:
+    """
+    Bornes fournies par le client, strictement croissantes.
+
+    Une borne None (JSON ne connaît pas Infinity) vaut +inf en dernière
+    position et -inf en première.
+
+    Raises:
+        ValueError: Moins de deux bornes, bornes non croissantes ou NaN
+    """
+    if len(edges) < 2:
+        raise ValueError("At least two bucket edges are required")
+    values = np.array([np.nan if edge is None else edge for edge in edges], dtype=np.float64)
+    if np.isnan(values[0]) and edges[0] is None:
+        values[0] = -np.inf
+    if np.isnan(values[-1]) and edges[-1] is None:
+        values[-1] = np.inf
+    if np.isnan(values).any():
+        raise ValueError("Bucket edges must be numbers (None only as first or last edge)")
+    if not np.all(np.diff(values) > 0):
+        raise ValueError("Bucket edges must be strictly increasing")
+    return values
+
+
+def auto_edges(values: np.ndarray, mode: str = 'quantile', bins: int = DEFAULT_BINS) -> np.ndarray:
+    """
+    Bornes calculées sur les revenus de tous les bras réunis, pour que chaque
+    variation soit découpée de la même façon.
+
+    Les bornes intérieures sont arrondies au centime ; la première et la
+    dernière encadrent toutes les valeurs. Des quantiles confondus (ex: un
+    montant très fréquent) ne donnent qu'une seule borne, d'où parfois moins
+    de bins tranches.
+
+    Raises:
+        ValueError: Mode inconnu ou nombre de tranches hors de [1, MAX_BINS]
+    """
+    if mode not in BIN_MODES:
+        raise ValueError(f"Unknown binning mode: {mode}")
+    if not 1 <= bins <= MAX_BINS:
+        raise ValueError(f"bins must be between 1 and {MAX_BINS}: {bins}")
+
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return np.array([0.0, 0.0])
+    low, high = float(values.min()), float(values.max())
+
+    if mode == 'quantile':
+        inner = np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])
+    else:
+        positive = values[values > 0]
+        if len(positive) == 0 or positive.min() == high:
+            inner = np.zeros(0)
+        else:
+            # Les montants nuls ou négatifs restent dans la première tranche
+            first = float(positive.min())
+            inner = np.geomspace(first, high, bins + 1)[1:-1] if low == first \
+                else np.concatenate(([first], np.geomspace(first, high, bins)[1:-1]))
+
+    first_edge = np.floor(low * 100) / 100
+    last_edge = np.ceil(high * 100) / 100
+    inner = np.round(inner, 2)
+    inner = inner[(inner > first_edge) & (inner < last_edge)]
+    if last_edge == first_edge:
+        return np.array([first_edge, last_edge])
+    return np.unique(np.concatenate(([first_edge], inner, [last_edge])))
+
+
+def bucket_counts(sorted_values: np.ndarray, edges: np.ndarray) -> Tuple[np.ndarray, int, int]:
+    """
+    Effectif de chaque tranche [edges[i], edges[i + 1][ (la dernière inclut
+    sa borne haute) pour un échantillon déjà trié : une seule recherche
+    dichotomique des bornes dans les valeurs, quel que soit le nombre de tranches.
+
+    Returns:
+        Tuple[np.ndarray, int, int]: (effectifs par tranche, valeurs sous la
+            première borne, valeurs au-dessus de la dernière)
+    """
+    positions = np.searchsorted(sorted_values, edges, side='left')
+    positions[-1] = np.searchsorted(sorted_values, edges[-1], side='right')
+    # Les NaN sont triés en fin d'échantillon : ils ne tombent dans aucune tranche
+    finite = len(sorted_values) - int(np.isnan(sorted_values).sum())
+    return np.diff(positions), int(positions[0]), int(finite - positions[-1])
+
+
+def wilson_interval(successes: np.ndarray, totals: np.ndarray, z: float = 1.96) -> Tuple[np.ndarray, np.ndarray]:
+    """Intervalle de score de Wilson de proportions (NaN pour un total nul)."""
+    successes = np.asarray(successes, dtype=np.float64)
+    totals = np.asarray(totals, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = successes / totals
+        denominator = 1 + z ** 2 / totals
+        center = (p + z ** 2 / (2 * totals)) / denominator
+        margin = z * np.sqrt(p * (1 - p) / totals + z ** 2 / (4 * totals ** 2)) / denominator
+    return center - margin, center + margin
+
+
+def bucket_labels(edges: np.ndarray) -> List[str]:
+    """Libellés des tranches au format du tableau des revenus ([0€ - 50€], [200€ - ∞€])."""
+    def fmt(edge: float) -> str:
+        if np.isinf(edge):
+            return '∞' if edge > 0 else '-∞'
+        return f"{edge:.2f}".rstrip('0').rstrip('.')
+    return [f"[{fmt(low)}€ - {fmt(high)}€]" for low, high in zip(edges[:-1], edges[1:])]
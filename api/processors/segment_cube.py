@@ -0,0 +1,264 @@
+# segment_cube.py
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+from api.processors.rank_engine import mann_whitney_sorted
+from api.processors.rate_tests import RateTestEngine
+from api.processors.segment_index import TOKENIZED_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Valeur de marge : toutes les valeurs de la dimension
+ALL_SEGMENTS = '*'
+
+CUBE_METRICS = ['transaction_rate', 'aov', 'avg_products', 'total_revenue', 'arpu']
+
+
+class _ArmSegments:
+    """Statistiques d'un bras pour tous les segments, triées une seule fois."""
+
+    def __init__(self, segments: np.ndarray, revenue: np.ndarray, quantity: np.ndarray, n_segments: int):
+        self.counts = np.bincount(segments, minlength=n_segments)
+        self.revenue_sum = np.bincount(segments, weights=revenue, minlength=n_segments)
+        self.quantity_sum = np.bincount(segments, weights=quantity, minlength=n_segments)
+        # Un seul tri par colonne : chaque segment devient une tranche contiguë déjà triée
+        self.revenue_sorted, self.revenue_bounds = self._sort_by_segment(segments, revenue, n_segments)
+        self.quantity_sorted, self.quantity_bounds = self._sort_by_segment(segments, quantity, n_segments)
+
+    @staticmethod
+    def _sort_by_segment(segments: np.ndarray, values: np.ndarray, n_segments: int) -> Tuple[np.ndarray, np.ndarray]:
+        order = np.lexsort((values, segments))
+        bounds = np.searchsorted(segments[order], np.arange(n_segments + 1))
+        return values[order], bounds
+
+    def revenue(self, segment: int) -> np.ndarray:
+        return self.revenue_sorted[self.revenue_bounds[segment]:self.revenue_bounds[segment + 1]]
+
+    def quantity(self, segment: int) -> np.ndarray:
+        return self.quantity_sorted[self.quantity_bounds[segment]:self.quantity_bounds[segment + 1]]
+
+
+def _metric(value: float, control_value: float, confidence: float) -> Dict[str, float]:
+    return {
+        'value': value,
+        'control_value': control_value,
+        'uplift': ((value - control_value) / control_value) * 100 if control_value > 0 else 0,
+        'confidence': round(confidence, 2)
+    }
+
+
+def _category_members(categories_col: pd.Series, n_rows: int) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Paires (ligne, catégorie) : la ligne est retenue par le filtre item_category2=[catégorie].
+
+    Les catégories sont les valeurs normalisées de SegmentIndex ; une ligne
+    'Sofa Beds|Lighting' appartient aussi à 'beds' (recherche par sous-chaîne),
+    comme dans apply_filters. Le libellé affiché est la première orthographe
+    d'origine (ordre alphabétique) de chaque catégorie.
+
+    Returns:
+        Tuple: (lignes, codes de catégorie, libellés des catégories)
+    """
+    separator = TOKENIZED_COLUMNS['item_category2']
+    value_codes, values = pd.factorize(categories_col.astype(str).where(categories_col.notna()), sort=True)
+
+    spellings: Dict[str, str] = {}
+    value_tokens = []
+    for value in values:
+        originals = [token.strip() for token in value.split(separator) if token.strip()]
+        for original in originals:
+            spellings.setdefault(original.lower(), original)
+        value_tokens.append([original.lower() for original in originals])
+    categories = sorted(spellings)
+
+    # Catégories retenues par valeur distincte (au format CSR), puis expansion par ligne
+    matched = [
+        [code for code, category in enumerate(categories) if any(category in token for token in tokens)]
+        for tokens in value_tokens
+    ]
+    per_value = np.array([len(codes) for codes in matched] + [0], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(per_value[:-1])))
+    flat = np.array([code for codes in matched for code in codes], dtype=np.int64)
+
+    counts = per_value[value_codes]  # code -1 (valeur manquante) : 0 catégorie
+    rows = np.repeat(np.arange(n_rows), counts)
+    within = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    member_cats = flat[offsets[value_codes[rows]] + within] if len(rows) else np.zeros(0, dtype=np.int64)
+    return rows, member_cats, [spellings[category] for category in categories]
+
+
+def _rate_p_values(
+    rate_tests: RateTestEngine,
+    counts: np.ndarray,
+    users: float,
+    ctrl_counts: np.ndarray,
+    ctrl_users: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tests de taux de tous les segments d'un bras ; un segment dont le tableau
+    est invalide (plus de transactions que d'utilisateurs) reçoit p = 1 et
+    aucune méthode, sans invalider les autres.
+    """
+    try:
+        return rate_tests.test(counts, users, ctrl_counts, ctrl_users)
+    except ValueError:
+        p_values = np.ones(len(counts))
+        methods = np.full(len(counts), None, dtype=object)
+        for segment in range(len(counts)):
+            try:
+                p_values[segment], methods[segment] = rate_tests.test_one(
+                    counts[segment], users, ctrl_counts[segment], ctrl_users
+                )
+            except ValueError as e:
+                logger.warning(f"Rate test skipped for segment {segment}: {str(e)}")
+        return p_values, methods
+
+
+def build_segment_cube(
+    transaction_df: pd.DataFrame,
+    users_by_variation: Dict[str, float],
+    control_variation: str,
+    rate_tests: Optional[RateTestEngine] = None
+) -> Dict[str, Any]:
+    """
+    Calcule les métriques de tous les segments device_category x item_category2 en une passe.
+
+    Chaque cellule vaut ce que renvoient les endpoints de métriques avec le
+    filtre correspondant : les lignes article retenues par apply_filters sont
+    agrégées par transaction (revenus et quantités des seuls articles du
+    segment, comme create_analysis_table). Les marges ('*') regroupent toutes
+    les valeurs d'une dimension ; les taux de transaction et l'ARPU sont
+    rapportés au nombre total d'utilisateurs du bras. Les variations absentes
+    des données overall sont ignorées.
+
+    Args:
+        transaction_df: Lignes de transaction au niveau article
+        users_by_variation: Nombre d'utilisateurs par variation
+        control_variation: Nom de la variation contrôle
+        rate_tests: Moteur des tests de taux (configuration par défaut si None)
+
+    Returns:
+        Dict[str, Any]: Dimensions, variations et cube[device][catégorie][variation]
+    """
+    items = transaction_df[transaction_df['transaction_id'].notna()]
+    n_rows = len(items)
+    tx_codes, transaction_ids = pd.factorize(items['transaction_id'])
+    n_tx = max(len(transaction_ids), 1)
+    dev_codes, devices = pd.factorize(items['device_category'].astype(str), sort=True)
+    var_codes, variations = pd.factorize(items['variation'].astype(str).where(items['variation'].notna()), sort=True)
+    revenue = pd.to_numeric(items['revenue'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    quantity = pd.to_numeric(items['quantity'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+    cat_rows, cat_codes, categories = _category_members(items['item_category2'], n_rows)
+    n_dev, n_cat = len(devices), len(categories)
+
+    # Identifiant de segment : device (ou marge n_dev) x catégorie (ou marge n_cat)
+    stride = n_cat + 1
+    n_segments = (n_dev + 1) * stride
+    all_rows = np.arange(n_rows)
+    member_row = np.concatenate((cat_rows, cat_rows, all_rows, all_rows))
+    member_segment = np.concatenate((
+        dev_codes[cat_rows] * stride + cat_codes,
+        n_dev * stride + cat_codes,
+        dev_codes * stride + n_cat,
+        np.full(n_rows, n_dev * stride + n_cat)
+    )).astype(np.int64)
+
+    # Une transaction par (segment, transaction_id) : sommes des articles du segment,
+    # variation de la première ligne qui en porte une (comme groupby(...).agg('first'))
+    keys = member_segment * n_tx + tx_codes[member_row]
+    order = np.lexsort((member_row, var_codes[member_row] < 0, keys))
+    group_keys, first, inverse = np.unique(keys[order], return_index=True, return_inverse=True)
+    group_revenue = np.round(np.bincount(inverse, weights=revenue[member_row[order]]), 2)
+    group_quantity = np.round(np.bincount(inverse, weights=quantity[member_row[order]]), 2)
+    group_segment = group_keys // n_tx
+    group_arm = var_codes[member_row[order][first]]
+
+    if control_variation not in users_by_variation:
+        raise ValueError(f"Control variation {control_variation} is missing from overall data")
+
+    arms = {}
+    for code, variation in enumerate(variations):
+        if variation not in users_by_variation:
+            logger.warning(f"Variation {variation} is missing from overall data, skipped in the segment cube")
+            continue
+        groups = group_arm == code
+        arms[variation] = _ArmSegments(group_segment[groups], group_revenue[groups], group_quantity[groups], n_segments)
+
+    if control_variation not in arms:
+        raise ValueError(f"Control variation {control_variation} has no transactions")
+    ctrl = arms[control_variation]
+    ctrl_users = float(users_by_variation[control_variation])
+
+    # Taux de transaction : un test vectorisé par bras sur tous les segments
+    rate_tests = rate_tests or RateTestEngine()
+    rate_results = {
+        variation: _rate_p_values(rate_tests, arm.counts, float(users_by_variation[variation]), ctrl.counts, ctrl_users)
+        for variation, arm in arms.items()
+    }
+
+    device_labels = list(devices) + [ALL_SEGMENTS]
+    category_labels = categories + [ALL_SEGMENTS]
+    cube: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    for segment in range(n_segments):
+        if not any(arm.counts[segment] for arm in arms.values()):
+            continue
+        device = device_labels[segment // stride]
+        category = category_labels[segment % stride]
+        cells = cube.setdefault(device, {}).setdefault(category, {})
+
+        ctrl_n = int(ctrl.counts[segment])
+        ctrl_rev = float(ctrl.revenue_sum[segment])
+        ctrl_qty = float(ctrl.quantity_sum[segment])
+
+        for variation, arm in arms.items():
+            var_users = float(users_by_variation[variation])
+            var_n = int(arm.counts[segment])
+            var_rev = float(arm.revenue_sum[segment])
+            var_qty = float(arm.quantity_sum[segment])
+
+            rate_p_values, rate_methods = rate_results[variation]
+            rate_p = rate_p_values[segment]
+            revenue_p = mann_whitney_sorted(arm.revenue(segment), ctrl.revenue(segment))
+            quantity_p = mann_whitney_sorted(arm.quantity(segment), ctrl.quantity(segment))
+
+            cells[variation] = {
+                'transactions': var_n,
+                'transaction_rate': {
+                    **_metric(
+                        (var_n / var_users) * 100 if var_users > 0 else 0,
+                        (ctrl_n / ctrl_users) * 100 if ctrl_users > 0 else 0,
+                        (1 - rate_p) * 100
+                    ),
+                    'test_method': rate_methods[segment]
+                },
+                'aov': _metric(
+                    var_rev / var_n if var_n > 0 else 0,
+                    ctrl_rev / ctrl_n if ctrl_n > 0 else 0,
+                    (1 - revenue_p) * 100
+                ),
+                'avg_products': _metric(
+                    var_qty / var_n if var_n > 0 else 0,
+                    ctrl_qty / ctrl_n if ctrl_n > 0 else 0,
+                    (1 - quantity_p) * 100
+                ),
+                'total_revenue': _metric(var_rev, ctrl_rev, (1 - revenue_p) * 100),
+                'arpu': _metric(
+                    var_rev / var_users if var_users > 0 else 0,
+                    ctrl_rev / ctrl_users if ctrl_users > 0 else 0,
+                    (1 - revenue_p) * 100
+                )
+            }
+
+    return {
+        'dimensions': {
+            'device_category': device_labels,
+            'item_category2': category_labels
+        },
+        'variations': list(arms),
+        'metrics': CUBE_METRICS,
+        'cube': cube
+    }
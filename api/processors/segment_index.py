@@ -0,0 +1,113 @@
+# segment_index.py
+
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Colonnes de la table de transactions sur lesquelles les filtres s'appliquent
+FILTER_COLUMNS = ('device_category', 'item_category2')
+
+# Colonnes multi-valeurs ('Beds|Sofas') : séparateur des catégories d'une ligne
+TOKENIZED_COLUMNS = {'item_category2': '|'}
+
+
+def split_tokens(value: Any, separator: str) -> List[str]:
+    """Catégories normalisées d'une cellule (découpées, sans blancs, en minuscules)."""
+    if not isinstance(value, str):
+        return []
+    return [token.strip().lower() for token in value.split(separator) if token.strip()]
+
+
+class SegmentIndex:
+    """
+    Index de segments d'un jeu de transactions.
+
+    Pour chaque valeur des colonnes filtrables, conserve un bitmap compacté
+    (np.packbits) des lignes qui la portent. Un filtre se résout alors par
+    des opérations sur les bitmaps, sans reparcourir les chaînes de caractères.
+
+    Les sémantiques reprennent le filtre du client (revenue-analysis.tsx) :
+    device_category est comparée à l'identique (OU entre valeurs) ;
+    item_category2 est indexée par catégorie ('Beds|Sofas' -> 'beds', 'sofas')
+    et chaque catégorie demandée doit être contenue, sans tenir compte de la
+    casse, dans au moins une catégorie de la ligne (ET entre valeurs).
+    Les colonnes se combinent par ET.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Iterable[str] = FILTER_COLUMNS):
+        self.n_rows = len(df)
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+
+        for column in columns:
+            if column not in df.columns:
+                continue
+            raw = df[column].astype(str)
+            if column in TOKENIZED_COLUMNS:
+                raw = raw.where(df[column].notna())
+            codes, uniques = pd.factorize(raw, sort=True)
+            # Tri stable des lignes par code : chaque valeur correspond à une tranche contiguë
+            # (les valeurs manquantes, code -1, sont en tête et ne portent aucune catégorie)
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            column_rows: Dict[str, np.ndarray] = {}
+            for code, value in enumerate(uniques):
+                rows = order[bounds[code]:bounds[code + 1]]
+                keys = split_tokens(value, TOKENIZED_COLUMNS[column]) if column in TOKENIZED_COLUMNS else [value]
+                for key in keys:
+                    if key not in column_rows:
+                        column_rows[key] = np.zeros(self.n_rows, dtype=bool)
+                    column_rows[key][rows] = True
+            self.bitmaps[column] = {key: np.packbits(rows) for key, rows in sorted(column_rows.items())}
+
+    def values(self, column: str) -> List[str]:
+        """Valeurs distinctes indexées pour une colonne (catégories normalisées si multi-valeurs)."""
+        return list(self.bitmaps.get(column, {}).keys())
+
+    def _empty_bitmap(self) -> np.ndarray:
+        return np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+
+    def _union(self, column: str, keys: Iterable[str]) -> np.ndarray:
+        bitmap = self._empty_bitmap()
+        for key in keys:
+            indexed = self.bitmaps[column].get(key)
+            if indexed is not None:
+                bitmap |= indexed
+        return bitmap
+
+    def _column_bitmap(self, column: str, values: List[str]) -> np.ndarray:
+        if column not in TOKENIZED_COLUMNS:
+            return self._union(column, (str(value) for value in values))
+
+        # Chaque catégorie demandée : OU des catégories indexées qui la contiennent ; puis ET
+        combined = None
+        for value in values:
+            needle = str(value).strip().lower()
+            bitmap = self._union(column, (token for token in self.bitmaps[column] if needle in token))
+            combined = bitmap if combined is None else combined & bitmap
+        return combined
+
+    def mask(self, filters: Dict[str, List[str]]) -> Optional[np.ndarray]:
+        """
+        Calcule le masque des lignes correspondant aux filtres.
+
+        Args:
+            filters: Valeurs demandées par colonne (liste vide = pas de filtre)
+
+        Returns:
+            Optional[np.ndarray]: Masque booléen, ou None si aucun filtre n'est actif
+        """
+        combined = None
+        for column, values in filters.items():
+            if not values:
+                continue
+            if column not in self.bitmaps:
+                raise ValueError(f"Filtre sur une colonne non indexée: {column}")
+            column_bitmap = self._column_bitmap(column, list(values))
+            combined = column_bitmap if combined is None else combined & column_bitmap
+
+        if combined is None:
+            return None
+        return np.unpackbits(combined, count=self.n_rows).astype(bool)
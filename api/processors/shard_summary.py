@@ -0,0 +1,280 @@
+# shard_summary.py
+
+import os
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterable, Optional
+import logging
+from api.processors.moments import RunningMoments
+from api.processors.analysis_context import detect_control
+
+logger = logging.getLogger(__name__)
+
+# Précision relative du sketch de quantiles (0.01 : quantile estimé à ±1 % près)
+SKETCH_RELATIVE_ACCURACY = float(os.getenv("SKETCH_RELATIVE_ACCURACY", 0.01))
+
+# Quantiles de revenu rapportés à partir des sketches fusionnés
+REVENUE_QUANTILES = (0.25, 0.5, 0.75, 0.9, 0.99)
+
+SUMMARY_FORMAT_VERSION = 1
+
+# Valeurs considérées comme nulles par le sketch (pas de logarithme)
+_MIN_INDEXABLE = 1e-9
+
+
+class _Buckets:
+    """Compteurs denses de buckets logarithmiques consécutifs (indice de départ + effectifs)."""
+
+    def __init__(self, offset: int = 0, counts: Optional[np.ndarray] = None):
+        self.offset = int(offset)
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+
+    def _add_counts(self, offset: int, counts: np.ndarray) -> None:
+        if len(counts) == 0:
+            return
+        if len(self.counts) == 0:
+            self.offset, self.counts = offset, counts.copy()
+            return
+        start = min(self.offset, offset)
+        end = max(self.offset + len(self.counts), offset + len(counts))
+        merged = np.zeros(end - start, dtype=np.int64)
+        merged[self.offset - start:self.offset - start + len(self.counts)] += self.counts
+        merged[offset - start:offset - start + len(counts)] += counts
+        self.offset, self.counts = start, merged
+
+    def add(self, indexes: np.ndarray) -> None:
+        if len(indexes):
+            low = int(indexes.min())
+            self._add_counts(low, np.bincount(indexes - low).astype(np.int64))
+
+    def merge(self, other: '_Buckets') -> None:
+        self._add_counts(other.offset, other.counts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'offset': self.offset, 'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> '_Buckets':
+        return cls(data['offset'], np.asarray(data['counts'], dtype=np.int64))
+
+
+class QuantileSketch:
+    """
+    Sketch de quantiles fusionnable à précision relative garantie.
+
+    Chaque valeur x > 0 tombe dans le bucket ceil(log_gamma(x)), avec
+    gamma = (1 + a) / (1 - a) : tout quantile est estimé à une erreur relative
+    a près, quel que soit le nombre d'observations. Deux sketches de même
+    précision se fusionnent en additionnant leurs compteurs ; la taille ne
+    dépend que de l'étendue des valeurs (quelques centaines de buckets pour
+    des montants de 0,01 à 10^6).
+    """
+
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy must be in ]0, 1[: {relative_accuracy}")
+        self.relative_accuracy = float(relative_accuracy)
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.zero_count = 0
+        self.positive = _Buckets()
+        self.negative = _Buckets()
+
+    @property
+    def count(self) -> int:
+        return int(self.zero_count + self.positive.counts.sum() + self.negative.counts.sum())
+
+    def _indexes(self, magnitudes: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+
+    def add(self, values: np.ndarray) -> 'QuantileSketch':
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        positive = values > _MIN_INDEXABLE
+        negative = values < -_MIN_INDEXABLE
+        self.zero_count += int(len(values) - positive.sum() - negative.sum())
+        self.positive.add(self._indexes(values[positive]))
+        self.negative.add(self._indexes(-values[negative]))
+        return self
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        # Un sketch vide n'impose pas sa précision
+        accuracy = other.relative_accuracy if self.count == 0 else self.relative_accuracy
+        if other.count and not np.isclose(accuracy, other.relative_accuracy):
+            raise ValueError("Cannot merge sketches with different relative accuracies")
+        merged = QuantileSketch(accuracy)
+        merged.zero_count = self.zero_count + other.zero_count
+        for name in ('positive', 'negative'):
+            buckets = getattr(merged, name)
+            buckets.merge(getattr(self, name))
+            buckets.merge(getattr(other, name))
+        return merged
+
+    def _value(self, index: int) -> float:
+        # Milieu (au sens de l'erreur relative) du bucket ]gamma^(i-1), gamma^i]
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Quantile q (0 <= q <= 1), None si le sketch est vide."""
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+
+        # Ordre croissant : négatifs (magnitudes décroissantes), zéros, positifs
+        negative_cumulative = np.cumsum(self.negative.counts[::-1])
+        if len(negative_cumulative) and rank < negative_cumulative[-1]:
+            position = int(np.searchsorted(negative_cumulative, rank, side='right'))
+            return -self._value(self.negative.offset + len(self.negative.counts) - 1 - position)
+        rank -= negative_cumulative[-1] if len(negative_cumulative) else 0
+        if rank < self.zero_count:
+            return 0.0
+        rank -= self.zero_count
+        positive_cumulative = np.cumsum(self.positive.counts)
+        position = min(int(np.searchsorted(positive_cumulative, rank, side='right')), len(positive_cumulative) - 1)
+        return self._value(self.positive.offset + position)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'zero_count': self.zero_count,
+            'positive': self.positive.to_dict(),
+            'negative': self.negative.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'QuantileSketch':
+        sketch = cls(data['relative_accuracy'])
+        sketch.zero_count = int(data['zero_count'])
+        sketch.positive = _Buckets.from_dict(data['positive'])
+        sketch.negative = _Buckets.from_dict(data['negative'])
+        return sketch
+
+
+class VariationSummary:
+    """Résumé fusionnable d'une variation sur une tranche des données."""
+
+    def __init__(
+        self,
+        users: float = 0.0,
+        add_to_carts: float = 0.0,
+        revenue: Optional[RunningMoments] = None,
+        quantity: Optional[RunningMoments] = None,
+        revenue_sketch: Optional[QuantileSketch] = None
+    ):
+        self.users = float(users)
+        self.add_to_carts = float(add_to_carts)
+        self.revenue = revenue or RunningMoments()
+        self.quantity = quantity or RunningMoments()
+        self.revenue_sketch = revenue_sketch or QuantileSketch()
+
+    @property
+    def transactions(self) -> int:
+        return self.revenue.count
+
+    def merge(self, other: 'VariationSummary') -> 'VariationSummary':
+        return VariationSummary(
+            self.users + other.users,
+            self.add_to_carts + other.add_to_carts,
+            self.revenue.merge(other.revenue),
+            self.quantity.merge(other.quantity),
+            self.revenue_sketch.merge(other.revenue_sketch)
+        )
+
+    def revenue_quantiles(self) -> Dict[str, Optional[float]]:
+        return {f"p{round(q * 100):02d}": self.revenue_sketch.quantile(q) for q in REVENUE_QUANTILES}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'users': self.users,
+            'add_to_carts': self.add_to_carts,
+            'revenue': self.revenue.to_dict(),
+            'quantity': self.quantity.to_dict(),
+            'revenue_sketch': self.revenue_sketch.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'VariationSummary':
+        return cls(
+            data['users'],
+            data['add_to_carts'],
+            RunningMoments.from_dict(data['revenue']),
+            RunningMoments.from_dict(data['quantity']),
+            QuantileSketch.from_dict(data['revenue_sketch'])
+        )
+
+
+class ShardSummary:
+    """
+    Résumé d'une tranche (shard) d'un export : un VariationSummary par variation.
+
+    Les tranches doivent partitionner les transactions (toutes les lignes
+    d'une même transaction dans la même tranche) et les lignes overall
+    (chaque utilisateur compté dans une seule tranche). Les résumés se
+    fusionnent dans n'importe quel ordre ; le format JSON (to_dict) permet
+    de les calculer dans des processus ou sur des machines différents.
+    """
+
+    def __init__(self, variations: Optional[Dict[str, VariationSummary]] = None, control_variation: Optional[str] = None):
+        self.variations: Dict[str, VariationSummary] = variations or {}
+        self.control_variation = control_variation
+
+    @classmethod
+    def from_frames(
+        cls,
+        overall_df: pd.DataFrame,
+        virtual_table: pd.DataFrame,
+        relative_accuracy: float = SKETCH_RELATIVE_ACCURACY
+    ) -> 'ShardSummary':
+        """Résume les lignes overall et la table virtuelle (une ligne par transaction) d'une tranche."""
+        control_variation = None
+        if not overall_df.empty and overall_df['variation'].astype(str).str.contains('control', case=False).any():
+            control_variation = detect_control(overall_df.assign(variation=overall_df['variation'].astype(str)))
+
+        variations: Dict[str, VariationSummary] = {}
+        if not overall_df.empty:
+            totals = overall_df.assign(variation=overall_df['variation'].astype(str)) \
+                .groupby('variation', sort=False)[['users', 'user_add_to_carts']].sum()
+            for variation, row in totals.iterrows():
+                variations[variation] = VariationSummary(
+                    row['users'], row['user_add_to_carts'], revenue_sketch=QuantileSketch(relative_accuracy)
+                )
+
+        for variation, rows in virtual_table.groupby(virtual_table['variation'].astype(str), sort=False):
+            revenue = rows['revenue'].to_numpy(dtype=np.float64)
+            summary = variations.setdefault(variation, VariationSummary(revenue_sketch=QuantileSketch(relative_accuracy)))
+            summary.revenue = RunningMoments.from_values(revenue)
+            summary.quantity = RunningMoments.from_values(rows['quantity'].to_numpy(dtype=np.float64))
+            summary.revenue_sketch = QuantileSketch(relative_accuracy).add(revenue)
+        return cls(variations, control_variation)
+
+    def merge(self, other: 'ShardSummary') -> 'ShardSummary':
+        variations = dict(self.variations)
+        for variation, summary in other.variations.items():
+            variations[variation] = variations[variation].merge(summary) if variation in variations else summary
+        if self.control_variation and other.control_variation and self.control_variation != other.control_variation:
+            raise ValueError(f"Shards disagree on the control: {self.control_variation} / {other.control_variation}")
+        return ShardSummary(variations, self.control_variation or other.control_variation)
+
+    @classmethod
+    def merge_all(cls, summaries: Iterable['ShardSummary']) -> 'ShardSummary':
+        merged = cls()
+        for summary in summaries:
+            merged = merged.merge(summary)
+        return merged
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'format_version': SUMMARY_FORMAT_VERSION,
+            'control_variation': self.control_variation,
+            'variations': {variation: summary.to_dict() for variation, summary in self.variations.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ShardSummary':
+        if data.get('format_version') != SUMMARY_FORMAT_VERSION:
+            raise ValueError(f"Unsupported summary format version: {data.get('format_version')}")
+        return cls(
+            {variation: VariationSummary.from_dict(summary) for variation, summary in data['variations'].items()},
+            data.get('control_variation')
+        )
@@ -0,0 +1,76 @@
+# stage_timing.py
+
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Mesures de la requête (ou de la tâche du worker) en cours ; None : rien n'est mesuré
+_current: ContextVar[Optional['StageTimings']] = ContextVar('stage_timings', default=None)
+
+
+class StageTimings:
+    """
+    Durées cumulées (secondes) par étape d'une requête.
+
+    Une étape appelée plusieurs fois (ex: une métrique par variation) cumule
+    ses durées ; une étape déjà ouverte n'est pas remesurée (appels récursifs).
+    Les étapes peuvent s'imbriquer (dataframe dans create_analysis_table) :
+    leurs durées ne s'additionnent donc pas.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self._open = set()
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def merge(self, durations: Dict[str, float]) -> None:
+        """Ajoute les durées mesurées ailleurs (ex: dans un worker du pool)."""
+        for name, seconds in durations.items():
+            self.add(name, seconds)
+
+
+def current_stages() -> Optional[StageTimings]:
+    return _current.get()
+
+
+@contextmanager
+def collect_stages() -> Iterator[StageTimings]:
+    """Mesure les étapes exécutées dans le bloc (contexte courant uniquement)."""
+    timings = StageTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Chronomètre le bloc sous le nom d'étape name (sans effet hors d'une mesure)."""
+    timings = _current.get()
+    if timings is None or name in timings._open:
+        yield
+        return
+    timings._open.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._open.discard(name)
+        timings.add(name, time.perf_counter() - start)
+
+
+def timed_stage(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Décorateur : chaque appel de la fonction est chronométré sous l'étape name."""
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,97 @@
+# arrow_transport.py
+
+import json
+import logging
+from typing import Any, Dict, Optional
+
+import pandas as pd
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+logger = logging.getLogger(__name__)
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_MEDIA_TYPE = "application/vnd.apache.arrow.file"
+ARROW_MEDIA_TYPES = (ARROW_STREAM_MEDIA_TYPE, ARROW_FILE_MEDIA_TYPE)
+
+# Clé des métadonnées de schéma portant la partie JSON de la réponse (métriques, contrôle...)
+METADATA_KEY = b"platform.metadata"
+
+
+class ArrowUnavailableError(Exception):
+    """Levée lorsque pyarrow n'est pas installé."""
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise ArrowUnavailableError("Le transport Arrow nécessite pyarrow")
+    return pa
+
+
+def arrow_available() -> bool:
+    try:
+        _pyarrow()
+        return True
+    except ArrowUnavailableError:
+        return False
+
+
+def _media_type(header: Optional[str]) -> str:
+    return (header or '').split(';')[0].strip().lower()
+
+
+def wants_arrow(request: Request) -> bool:
+    """Le client demande-t-il une réponse Arrow (en-tête Accept) ?"""
+    accepted = [_media_type(part) for part in request.headers.get('accept', '').split(',')]
+    return any(media in ARROW_MEDIA_TYPES for media in accepted)
+
+
+def is_arrow_body(request: Request) -> bool:
+    """Le corps de la requête est-il un flux Arrow (en-tête Content-Type) ?"""
+    return _media_type(request.headers.get('content-type')) in ARROW_MEDIA_TYPES
+
+
+def frame_to_arrow(df: pd.DataFrame, metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    Encode un DataFrame en flux Arrow IPC.
+
+    Les colonnes numériques sont transmises telles quelles depuis les buffers NumPy ;
+    la partie JSON de la réponse est placée dans les métadonnées du schéma.
+    """
+    pa = _pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if metadata is not None:
+        schema_metadata = dict(table.schema.metadata or {})
+        schema_metadata[METADATA_KEY] = json.dumps(jsonable_encoder(metadata)).encode('utf-8')
+        table = table.replace_schema_metadata(schema_metadata)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def arrow_to_frame(body: bytes) -> pd.DataFrame:
+    """
+    Décode un flux (ou un fichier) Arrow IPC en DataFrame.
+
+    Raises:
+        ValueError: Corps illisible
+    """
+    pa = _pyarrow()
+    try:
+        if body[:6] == b'ARROW1':
+            table = pa.ipc.open_file(pa.py_buffer(body)).read_all()
+        else:
+            table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"Flux Arrow invalide: {str(e)}")
+    return table.to_pandas()
+
+
+def arrow_response(df: pd.DataFrame, metadata: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=frame_to_arrow(df, metadata), media_type=ARROW_STREAM_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,263 @@
+# dataset_store.py
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from api.services.incremental_store import validate_test_id
+from api.services.storage import DATA_DIR, storage_dir
+
+logger = logging.getLogger(__name__)
+
+# Répertoire des jeux de données archivés (un sous-répertoire par test)
+DATASET_DIR = os.getenv("DATASET_DIR", os.path.join(DATA_DIR, "datasets"))
+
+MANIFEST_FILE = 'manifest.json'
+DATASET_FORMAT_VERSION = 1
+
+# Tables archivées pour chaque test
+DATASET_FRAMES = ('overall', 'transaction', 'virtual_table')
+
+
+def _json_value(value: Any) -> Any:
+    """Modalité sérialisable en JSON (les types inconnus deviennent des chaînes)."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    return str(value)
+
+
+class DatasetStore:
+    """
+    Jeux de données nettoyés des tests terminés, stockés par colonne sur disque.
+
+    Chaque colonne est un fichier .npy : les colonnes numériques et les dates
+    sont écrites telles quelles, les colonnes texte sous forme de codes entiers
+    accompagnés de leurs modalités (JSON). À la lecture, les fichiers sont
+    ouverts en mémoire projetée (mmap_mode='r') : rien n'est analysé, seules
+    les pages effectivement lues sont chargées, et seules les colonnes demandées
+    sont ouvertes.
+
+    Comme IncrementalStore, une nouvelle version est entièrement écrite avant
+    que le manifeste ne soit remplacé atomiquement ; la version précédente est
+    ensuite supprimée.
+    """
+
+    def __init__(self, root: str = DATASET_DIR):
+        self.root = root
+
+    def prepare_root(self) -> None:
+        """Crée le répertoire racine et journalise son chemin (au démarrage de l'API)."""
+        self.root = storage_dir(self.root, 'Archived datasets')
+
+    def _dataset_dir(self, test_id: str) -> str:
+        return os.path.join(self.root, validate_test_id(test_id))
+
+    def _manifest(self, test_id: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self._dataset_dir(test_id), MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def exists(self, test_id: str) -> bool:
+        return os.path.exists(os.path.join(self._dataset_dir(test_id), MANIFEST_FILE))
+
+    @staticmethod
+    def _write_column(series: pd.Series, directory: str, position: int) -> Dict[str, Any]:
+        """Écrit une colonne et renvoie sa description pour le manifeste."""
+        column = {'name': series.name, 'file': f"c{position}.npy", 'dtype': str(series.dtype)}
+        path = os.path.join(directory, column['file'])
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            column['kind'] = 'categorical'
+            codes, categories = series.cat.codes.to_numpy(), series.cat.categories
+        elif pd.api.types.is_datetime64_dtype(series.dtype):
+            column['kind'] = 'datetime'
+            np.save(path, series.to_numpy().view(np.int64))
+            return column
+        elif pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+            column['kind'] = 'numeric'
+            np.save(path, series.to_numpy())
+            return column
+        else:
+            # Texte (ou types mixtes) : codes + modalités, -1 pour les valeurs manquantes
+            column['kind'] = 'text'
+            codes, categories = pd.factorize(series, use_na_sentinel=True)
+
+        column['categories_file'] = f"c{position}.categories.json"
+        np.save(path, codes.astype(np.int32 if len(categories) < 2 ** 31 else np.int64))
+        with open(os.path.join(directory, column['categories_file']), 'w', encoding='utf-8') as f:
+            json.dump([_json_value(value) for value in categories], f)
+        return column
+
+    @staticmethod
+    def _read_column(column: Dict[str, Any], directory: str) -> Any:
+        values = np.load(os.path.join(directory, column['file']), mmap_mode='r')
+        if column['kind'] == 'numeric':
+            return values
+        if column['kind'] == 'datetime':
+            return values.view(column['dtype'])
+
+        with open(os.path.join(directory, column['categories_file']), 'r', encoding='utf-8') as f:
+            categories = json.load(f)
+        if column['kind'] == 'categorical':
+            return pd.Categorical.from_codes(values, categories)
+        # Les chaînes identiques partagent le même objet Python ; -1 (manquant) -> None
+        lookup = np.empty(len(categories) + 1, dtype=object)
+        lookup[:-1] = categories
+        return lookup[values]
+
+    def save(self, test_id: str, frames: Dict[str, pd.DataFrame], metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Archive les tables d'un test (nouvelle version si le test existe déjà).
+
+        Args:
+            test_id: Identifiant du test
+            frames: Tables à archiver (nom -> DataFrame), l'index n'est pas conservé
+            metadata: Informations libres rangées dans le manifeste
+
+        Returns:
+            Dict[str, Any]: Description du jeu archivé (voir describe)
+        """
+        dataset_dir = self._dataset_dir(test_id)
+        os.makedirs(dataset_dir, exist_ok=True)
+        previous = self._manifest(test_id)
+        version = previous['version'] + 1 if previous else 1
+        version_dir = os.path.join(dataset_dir, f"v{version}")
+        if os.path.isdir(version_dir):
+            # Reste d'une écriture interrompue
+            shutil.rmtree(version_dir)
+
+        manifest = {
+            'format_version': DATASET_FORMAT_VERSION,
+            'test_id': test_id,
+            'version': version,
+            'created_at': time.time(),
+            'metadata': metadata or {},
+            'frames': {}
+        }
+        for name, df in frames.items():
+            frame_dir = os.path.join(version_dir, name)
+            os.makedirs(frame_dir)
+            manifest['frames'][name] = {
+                'rows': len(df),
+                'columns': [
+                    self._write_column(df.iloc[:, position].rename(str(df.columns[position])), frame_dir, position)
+                    for position in range(df.shape[1])
+                ]
+            }
+
+        fd, tmp_path = tempfile.mkstemp(dir=dataset_dir, suffix='.json.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(dataset_dir, MANIFEST_FILE))
+
+        for entry in os.listdir(dataset_dir):
+            if entry.startswith('v') and entry != f"v{version}":
+                shutil.rmtree(os.path.join(dataset_dir, entry), ignore_errors=True)
+        logger.info(f"Dataset {test_id} saved (version {version}, frames {list(frames)})")
+        return self._describe(manifest)
+
+    def load(
+        self,
+        test_id: str,
+        frames: Optional[Iterable[str]] = None,
+        columns: Optional[Iterable[str]] = None
+    ) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Ouvre les tables d'un test en mémoire projetée (lecture seule).
+
+        Args:
+            test_id: Identifiant du test
+            frames: Tables à ouvrir (toutes par défaut)
+            columns: Colonnes à ouvrir dans chaque table (toutes par défaut)
+
+        Returns:
+            Optional[Dict[str, pd.DataFrame]]: Tables par nom, None si le test n'est pas archivé
+        """
+        manifest = self._manifest(test_id)
+        try:
+            return self._open_frames(test_id, manifest, frames, columns)
+        except FileNotFoundError:
+            # Une sauvegarde concurrente (autre worker) a remplacé la version et
+            # supprimé ses fichiers entre la lecture du manifeste et celle des colonnes
+            latest = self._manifest(test_id)
+            if latest is not None and latest['version'] == manifest['version']:
+                raise
+            logger.info(f"Dataset {test_id} replaced while loading, retrying with the new version")
+            return self._open_frames(test_id, latest, frames, columns)
+
+    def _open_frames(
+        self,
+        test_id: str,
+        manifest: Optional[Dict[str, Any]],
+        frames: Optional[Iterable[str]],
+        columns: Optional[Iterable[str]]
+    ) -> Optional[Dict[str, pd.DataFrame]]:
+        if manifest is None:
+            return None
+        if manifest.get('format_version') != DATASET_FORMAT_VERSION:
+            raise ValueError(f"Unsupported dataset format version: {manifest.get('format_version')}")
+
+        wanted = set(columns) if columns is not None else None
+        version_dir = os.path.join(self._dataset_dir(test_id), f"v{manifest['version']}")
+        result = {}
+        for name in (frames if frames is not None else manifest['frames']):
+            if name not in manifest['frames']:
+                raise KeyError(f"Frame {name} not stored for test {test_id}")
+            frame = manifest['frames'][name]
+            frame_dir = os.path.join(version_dir, name)
+            # copy=False : les colonnes numériques restent adossées aux fichiers
+            result[name] = pd.DataFrame({
+                column['name']: self._read_column(column, frame_dir)
+                for column in frame['columns']
+                if wanted is None or column['name'] in wanted
+            }, index=pd.RangeIndex(frame['rows']), copy=False)
+        return result
+
+    @staticmethod
+    def _describe(manifest: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'test_id': manifest['test_id'],
+            'version': manifest['version'],
+            'created_at': manifest['created_at'],
+            'metadata': manifest['metadata'],
+            'frames': {
+                name: {'rows': frame['rows'], 'columns': [column['name'] for column in frame['columns']]}
+                for name, frame in manifest['frames'].items()
+            }
+        }
+
+    def describe(self, test_id: str) -> Optional[Dict[str, Any]]:
+        manifest = self._manifest(test_id)
+        return self._describe(manifest) if manifest is not None else None
+
+    def list_datasets(self) -> List[Dict[str, Any]]:
+        """Jeux archivés, du plus récent au plus ancien."""
+        if not os.path.isdir(self.root):
+            return []
+        datasets = []
+        for test_id in os.listdir(self.root):
+            try:
+                description = self.describe(test_id)
+            except ValueError:
+                continue
+            if description is not None:
+                datasets.append(description)
+        return sorted(datasets, key=lambda d: d['created_at'], reverse=True)
+
+    def delete(self, test_id: str) -> bool:
+        dataset_dir = self._dataset_dir(test_id)
+        if not os.path.isdir(dataset_dir):
+            return False
+        shutil.rmtree(dataset_dir)
+        return True
@@ -0,0 +1,213 @@
+# executor.py
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from api.processors.stage_timing import collect_stages, current_stages
+
+logger = logging.getLogger(__name__)
+
+# Configuration de la couche d'exécution (variables d'environnement)
+EXECUTOR_KIND = os.getenv("ANALYSIS_EXECUTOR", "process")  # 'process' ou 'thread'
+MAX_WORKERS = int(os.getenv("ANALYSIS_WORKERS", os.cpu_count() or 1))
+MAX_QUEUE = int(os.getenv("ANALYSIS_QUEUE_SIZE", 8))
+# Délai d'une analyse : au-delà, la requête échoue (504) mais future.cancel() n'arrête
+# pas une tâche déjà démarrée ; elle continue dans son worker et garde sa place dans
+# la file jusqu'à sa fin réelle (un thread ne peut pas être interrompu)
+REQUEST_TIMEOUT = float(os.getenv("ANALYSIS_TIMEOUT_SECONDS", 120))
+# Timeouts consécutifs après lesquels le pool de processus est recyclé (workers
+# terminés, tâches bloquées comprises) ; 0 : jamais. Sans effet en mode 'thread'
+RECYCLE_AFTER_TIMEOUTS = int(os.getenv("ANALYSIS_RECYCLE_AFTER_TIMEOUTS", 3))
+
+
+class ExecutorSaturatedError(Exception):
+    """Levée lorsque la file d'attente des analyses est pleine."""
+
+
+class AnalysisTimeoutError(Exception):
+    """Levée lorsqu'une analyse dépasse le délai imparti."""
+
+
+class ExecutorUnavailableError(Exception):
+    """Levée lorsque le pool est cassé (worker tué, ex: manque de mémoire) ; il est recréé."""
+
+
+def _run_processor_method(method_name: str, args: tuple, kwargs: Dict[str, Any]) -> Tuple[Any, Dict[str, float]]:
+    """
+    Exécute une méthode de DataProcessor dans un worker (fonction picklable).
+
+    Retourne aussi les durées des étapes mesurées dans le worker (le contexte
+    de la requête n'y est pas visible) et la durée totale de l'analyse.
+    """
+    from api.processors.data_processor import DataProcessor
+
+    with collect_stages() as timings:
+        processor = DataProcessor()
+        result = getattr(processor, method_name)(*args, **kwargs)
+    timings.add('analysis', time.perf_counter() - timings.started)
+    return result, timings.durations
+
+
+class AnalysisExecutor:
+    """
+    Exécute les analyses CPU (pandas/scipy) hors de la boucle asyncio.
+
+    Le nombre d'analyses en cours ou en attente est borné par
+    max_workers + max_queue : au-delà, les demandes sont refusées
+    immédiatement plutôt que de s'accumuler.
+
+    Un pool cassé (BrokenProcessPool) est abandonné et recréé à la demande
+    suivante ; après recycle_after_timeouts timeouts consécutifs, le pool de
+    processus est recyclé pour libérer les workers bloqués.
+    """
+
+    def __init__(
+        self,
+        kind: str = EXECUTOR_KIND,
+        max_workers: int = MAX_WORKERS,
+        max_queue: int = MAX_QUEUE,
+        timeout: float = REQUEST_TIMEOUT,
+        recycle_after_timeouts: int = RECYCLE_AFTER_TIMEOUTS
+    ):
+        if kind not in ('process', 'thread'):
+            raise ValueError(f"Type d'exécuteur inconnu: {kind}")
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.recycle_after_timeouts = max(0, recycle_after_timeouts)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._consecutive_timeouts = 0
+        self._recycled = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def _get_executor(self) -> Executor:
+        """Crée le pool à la première utilisation."""
+        with self._lock:
+            if self._executor is None:
+                if self.kind == 'process':
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='analysis')
+                logger.info(f"Analysis executor started ({self.kind}, {self.max_workers} workers, queue {self.max_queue})")
+            return self._executor
+
+    def _recycle(self, executor: Executor, reason: str) -> None:
+        """
+        Abandonne executor (s'il est encore le pool courant) ; le suivant est créé à la demande.
+
+        Les processus sont terminés : leurs tâches en cours échouent
+        (BrokenProcessPool) et libèrent leur place dans la file.
+        """
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._consecutive_timeouts = 0
+            self._recycled += 1
+        logger.warning(f"Recycling analysis executor ({self.kind}): {reason}")
+        processes = list((getattr(executor, '_processes', None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                raise ExecutorSaturatedError(
+                    f"Analysis queue is full ({self._in_flight}/{self.capacity})"
+                )
+            self._in_flight += 1
+
+    def _release(self, _future: Optional[Future] = None) -> None:
+        # La place n'est libérée qu'à la fin réelle de la tâche, même après un timeout
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+
+    async def run(self, method_name: str, *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        Exécute DataProcessor.<method_name>(*args, **kwargs) dans le pool.
+
+        Raises:
+            ExecutorSaturatedError: si la file d'attente est pleine
+            AnalysisTimeoutError: si l'analyse dépasse le délai
+            ExecutorUnavailableError: si le pool est cassé (il est recréé)
+        """
+        executor = self._get_executor()
+        self._acquire()
+        submitted = time.perf_counter()
+        try:
+            future = executor.submit(_run_processor_method, method_name, args, kwargs)
+        except BrokenExecutor as e:
+            self._release()
+            self._recycle(executor, f"broken pool ({str(e)})")
+            raise ExecutorUnavailableError(f"Analysis executor was broken and has been restarted: {str(e)}")
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            result, durations = await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self._timed_out += 1
+                self._consecutive_timeouts += 1
+                recycle = (
+                    self.kind == 'process'
+                    and self.recycle_after_timeouts > 0
+                    and self._consecutive_timeouts >= self.recycle_after_timeouts
+                )
+            if recycle:
+                self._recycle(executor, f"{self.recycle_after_timeouts} consecutive timeouts")
+            raise AnalysisTimeoutError(f"Analysis '{method_name}' exceeded {timeout}s")
+        except BrokenExecutor as e:
+            self._recycle(executor, f"broken pool ({str(e)})")
+            raise ExecutorUnavailableError(f"Analysis executor was broken and has been restarted: {str(e)}")
+
+        with self._lock:
+            self._consecutive_timeouts = 0
+        timings = current_stages()
+        if timings is not None:
+            timings.merge(durations)
+            # Attente dans la file et transfert (pickling) des arguments et du résultat
+            timings.add('executor_wait', max(0.0, time.perf_counter() - submitted - durations['analysis']))
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'kind': self.kind,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'timeout_seconds': self.timeout,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'timed_out': self._timed_out,
+                'recycled': self._recycled
+            }
+
+    def shutdown(self) -> None:
+        # Arrêt hors du verrou : les callbacks des tâches qui se terminent (_release) le prennent
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,110 @@
+# incremental_store.py
+
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from api.processors.incremental import IncrementalTest, RUN_COLUMNS
+from api.services.storage import DATA_DIR, storage_dir
+
+logger = logging.getLogger(__name__)
+
+# Répertoire des états des tests en cours (un sous-répertoire par test)
+TEST_STATE_DIR = os.getenv("TEST_STATE_DIR", os.path.join(DATA_DIR, "tests"))
+
+_TEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+STATE_FILE = 'state.json'
+
+
+class InvalidTestIdError(ValueError):
+    """Identifiant de test invalide (lettres, chiffres, '-' et '_' uniquement)."""
+
+
+def validate_test_id(test_id: str) -> str:
+    """Identifiant utilisable comme nom de répertoire, sinon InvalidTestIdError."""
+    if not _TEST_ID_PATTERN.match(test_id or ''):
+        raise InvalidTestIdError(f"Invalid test id: {test_id!r}")
+    return test_id
+
+
+class IncrementalStore:
+    """
+    États des tests en cours sur disque.
+
+    Chaque test a son répertoire : state.json (statistiques fusionnables) et un
+    fichier .npz de runs triés par variation et par version. Les runs d'une
+    nouvelle version sont écrits avant que state.json ne soit remplacé
+    atomiquement ; un ajout interrompu laisse donc l'état précédent intact.
+    """
+
+    def __init__(self, root: str = TEST_STATE_DIR):
+        self.root = root
+
+    def prepare_root(self) -> None:
+        """Crée le répertoire racine et journalise son chemin (au démarrage de l'API)."""
+        self.root = storage_dir(self.root, 'Test states')
+
+    def _test_dir(self, test_id: str) -> str:
+        return os.path.join(self.root, validate_test_id(test_id))
+
+    @staticmethod
+    def _runs_file(test_dir: str, arm_index: int, version: int) -> str:
+        return os.path.join(test_dir, f"arm{arm_index}.v{version}.npz")
+
+    def exists(self, test_id: str) -> bool:
+        return os.path.exists(os.path.join(self._test_dir(test_id), STATE_FILE))
+
+    def load(self, test_id: str) -> Optional[IncrementalTest]:
+        """État du test, ou None s'il n'a encore reçu aucun lot."""
+        test_dir = self._test_dir(test_id)
+        state_path = os.path.join(test_dir, STATE_FILE)
+        if not os.path.exists(state_path):
+            return None
+        with open(state_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        runs: Dict[str, Dict[str, Tuple[np.ndarray, np.ndarray]]] = {}
+        for arm_index, variation in enumerate(data['arms']):
+            with np.load(self._runs_file(test_dir, arm_index, data['version'])) as arrays:
+                runs[variation] = {
+                    column: (arrays[f"{column}_values"], arrays[f"{column}_counts"])
+                    for column in RUN_COLUMNS
+                }
+        return IncrementalTest.from_dict(data, runs)
+
+    def save(self, state: IncrementalTest) -> None:
+        """Écrit une nouvelle version de l'état puis supprime les runs de la précédente."""
+        test_dir = self._test_dir(state.test_id)
+        os.makedirs(test_dir, exist_ok=True)
+        previous = state.version
+        state.version = previous + 1
+
+        for arm_index, arm in enumerate(state.arms.values()):
+            arrays = {}
+            for column in RUN_COLUMNS:
+                arrays[f"{column}_values"], arrays[f"{column}_counts"] = arm.runs[column]
+            np.savez(self._runs_file(test_dir, arm_index, state.version), **arrays)
+
+        fd, tmp_path = tempfile.mkstemp(dir=test_dir, suffix='.json.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state.to_dict(), f)
+        os.replace(tmp_path, os.path.join(test_dir, STATE_FILE))
+
+        for name in os.listdir(test_dir):
+            if name.endswith(f".v{previous}.npz"):
+                os.remove(os.path.join(test_dir, name))
+        logger.info(f"Test {state.test_id} saved (version {state.version}, {len(state.batches)} batches)")
+
+    def delete(self, test_id: str) -> bool:
+        test_dir = self._test_dir(test_id)
+        if not os.path.isdir(test_dir):
+            return False
+        shutil.rmtree(test_dir)
+        return True
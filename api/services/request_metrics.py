@@ -0,0 +1,238 @@
+# request_metrics.py
+
+import bisect
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi.routing import APIRoute
+
+from api.processors.stage_timing import collect_stages, current_stages
+
+logger = logging.getLogger(__name__)
+
+# Ajoute l'en-tête Server-Timing (durées par étape, en ms) à chaque réponse
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "0").lower() in ('1', 'true', 'yes')
+
+# Bornes (secondes) des histogrammes de durée
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Classes de taille des corps de requête (label size), bornes supérieures exclues
+REQUEST_SIZE_CLASSES = (
+    (10 * 1024, '<10KB'),
+    (100 * 1024, '<100KB'),
+    (1024 * 1024, '<1MB'),
+    (10 * 1024 * 1024, '<10MB'),
+    (100 * 1024 * 1024, '<100MB')
+)
+LARGEST_SIZE_CLASS = '>=100MB'
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Route de la requête en cours et fin d'exécution du handler (début de l'encodage)
+_request: ContextVar[Optional[Dict[str, Any]]] = ContextVar('request_metrics', default=None)
+
+
+def size_class(content_length: Optional[int]) -> str:
+    """Classe de taille d'un corps de requête ('unknown' sans Content-Length)."""
+    if content_length is None:
+        return 'unknown'
+    for limit, label in REQUEST_SIZE_CLASSES:
+        if content_length < limit:
+            return label
+    return LARGEST_SIZE_CLASS
+
+
+def _content_length(headers: Sequence[Tuple[bytes, bytes]]) -> Optional[int]:
+    for name, value in headers:
+        if name == b'content-length':
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    """Histogramme Prometheus (compteurs par borne, somme, effectif) par combinaison de labels."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Sequence[str], value: float) -> None:
+        labels = tuple(labels)
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}")
+        # value <= le : première borne supérieure ou égale (dernière case : +Inf)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels in sorted(series):
+            counts, total, count = series[labels]
+            base = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                lines.append(f'{self.name}_bucket{{{base},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {repr(total)}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+class RequestMetrics:
+    """Durées des requêtes HTTP et de leurs étapes, au format d'exposition Prometheus."""
+
+    def __init__(self, buckets: Sequence[float] = DURATION_BUCKETS):
+        self.requests = Histogram(
+            'platform_api_request_duration_seconds',
+            'Total duration of HTTP requests, up to the end of the response body.',
+            ('endpoint', 'method', 'status', 'size'),
+            buckets
+        )
+        self.stages = Histogram(
+            'platform_api_stage_duration_seconds',
+            'Duration of each request stage (stages may nest, e.g. dataframe within create_analysis_table).',
+            ('endpoint', 'stage', 'size'),
+            buckets
+        )
+
+    def observe(self, endpoint: str, method: str, status: int, size: str, total: float, durations: Dict[str, float]) -> None:
+        self.requests.observe((endpoint, method, str(status), size), total)
+        for name, seconds in durations.items():
+            self.stages.observe((endpoint, name, size), seconds)
+
+    def render(self) -> str:
+        return '\n'.join(self.requests.render() + self.stages.render()) + '\n'
+
+
+def server_timing(durations: Dict[str, float], total: float) -> str:
+    """Valeur de l'en-tête Server-Timing (durées en millisecondes)."""
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in durations.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(entries)
+
+
+class StageTimingMiddleware:
+    """
+    Middleware ASGI : mesure chaque requête HTTP et ses étapes, puis les ajoute
+    aux histogrammes (label endpoint : chemin de la route, 'unmatched' sinon).
+
+    Étapes mesurées ici : parse (lecture et validation du corps jusqu'à l'appel
+    du handler, voir TimedRoute) et encode (de la fin du handler à l'envoi des
+    en-têtes) ; les autres viennent des calculs (stage / timed_stage), y compris
+    ceux des workers du pool.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics, server_timing_header: bool = SERVER_TIMING_HEADER):
+        self.app = app
+        self.metrics = metrics
+        self.server_timing_header = server_timing_header
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        size = size_class(_content_length(scope.get('headers', [])))
+        info = {'endpoint': None, 'started': time.perf_counter(), 'handler_finished': None}
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                now = time.perf_counter()
+                if info['handler_finished'] is not None:
+                    timings.add('encode', now - info['handler_finished'])
+                if self.server_timing_header:
+                    header = server_timing(timings.durations, now - info['started']).encode('latin-1')
+                    message = {**message, 'headers': list(message.get('headers', [])) + [(b'server-timing', header)]}
+            await send(message)
+
+        token = _request.set(info)
+        try:
+            with collect_stages() as timings:
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            _request.reset(token)
+            try:
+                self.metrics.observe(
+                    info['endpoint'] or 'unmatched',
+                    scope['method'],
+                    status,
+                    size,
+                    time.perf_counter() - info['started'],
+                    timings.durations
+                )
+            except Exception as e:
+                logger.error(f"Error recording request metrics: {str(e)}")
+
+
+def _timed_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    """Marque le début (fin de l'étape parse) et la fin du handler d'une route."""
+    @functools.wraps(endpoint)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        info = _request.get()
+        timings = current_stages()
+        if info is not None and timings is not None:
+            timings.add('parse', time.perf_counter() - info['started'])
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            if info is not None:
+                info['handler_finished'] = time.perf_counter()
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    Route FastAPI instrumentée : renseigne le chemin de la route (label
+    endpoint, même pour une requête invalide) et délimite le handler.
+
+    Seuls les handlers async sont délimités (ceux de l'API le sont tous).
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        path = self.path
+
+        async def route_handler(request):
+            info = _request.get()
+            if info is not None:
+                info['endpoint'] = path
+            return await handler(request)
+        return route_handler
@@ -0,0 +1,99 @@
+# result_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Budget mémoire du cache de résultats (0 pour le désactiver)
+RESULT_CACHE_MAX_BYTES = int(float(os.getenv("RESULT_CACHE_MAX_MB", 256)) * 1024 * 1024)
+
+
+def payload_key(namespace: str, payload: Any) -> str:
+    """
+    Calcule une clé de contenu stable pour une charge utile.
+
+    Le JSON canonique (clés triées, séparateurs compacts) rend la clé
+    indépendante de l'ordre des clés envoyé par le client ; le namespace
+    distingue les endpoints (et donc les jeux de métriques calculés).
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    digest = hashlib.sha256()
+    digest.update(namespace.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(canonical.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Cache LRU de réponses déjà encodées en JSON, borné en octets.
+
+    Les valeurs sont les corps de réponse sérialisés : un accès réussi
+    ne refait ni le calcul ni l'encodage.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def key(self, namespace: str, payload: Any) -> str:
+        return payload_key(namespace, payload)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: str, value: bytes) -> None:
+        size = len(value)
+        if not self.enabled or size > self.max_bytes:
+            # Une réponse plus grande que le budget ne serait jamais conservée
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = value
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,206 @@
+# session_store.py
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+from api.processors.compact_schema import column_bytes, frames_memory
+
+logger = logging.getLogger(__name__)
+
+# Durée de vie d'une session inactive et budget mémoire total des sessions
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", 3600))
+SESSION_MAX_BYTES = int(float(os.getenv("SESSION_MAX_MB", 1024)) * 1024 * 1024)
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """Taille mémoire réelle d'un DataFrame (chaînes comprises, chaînes partagées comptées une fois)."""
+    if df is None:
+        return 0
+    return int(df.index.memory_usage(deep=True)) + sum(column_bytes(df[column]) for column in df.columns)
+
+
+class AnalysisSession:
+    """Données nettoyées d'un test, conservées côté serveur entre les appels."""
+
+    def __init__(
+        self,
+        session_id: str,
+        overall_df: pd.DataFrame,
+        transaction_df: pd.DataFrame,
+        segment_index: Optional[Any] = None
+    ):
+        self.session_id = session_id
+        self.overall_df = overall_df
+        self.transaction_df = transaction_df
+        # Index des segments filtrables, construit une seule fois par jeu de données
+        self.segment_index = segment_index
+        # Dernière table virtuelle calculée (clé = filtres), réutilisée d'une page à l'autre
+        self._virtual_table: Optional[Tuple[str, pd.DataFrame]] = None
+        self.virtual_table_bytes = 0
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        self.size_bytes = frame_bytes(overall_df) + frame_bytes(transaction_df) + self._index_bytes()
+
+    def _index_bytes(self) -> int:
+        if self.segment_index is None:
+            return 0
+        return sum(
+            bitmap.nbytes
+            for column_bitmaps in self.segment_index.bitmaps.values()
+            for bitmap in column_bitmaps.values()
+        )
+
+    def raw_data(self) -> Dict[str, pd.DataFrame]:
+        """Données au format 'raw_data' attendu par DataProcessor."""
+        return {
+            'overall': self.overall_df,
+            'transaction': self.transaction_df
+        }
+
+    def cached_virtual_table(self, key: str) -> Optional[pd.DataFrame]:
+        if self._virtual_table is not None and self._virtual_table[0] == key:
+            return self._virtual_table[1]
+        return None
+
+    def set_virtual_table(self, key: str, table: pd.DataFrame, table_bytes: int) -> int:
+        """
+        Remplace la table virtuelle en cache (via SessionStore.cache_virtual_table,
+        qui tient le budget mémoire) et retourne la variation de size_bytes.
+        """
+        delta = table_bytes - self.virtual_table_bytes
+        self._virtual_table = (key, table)
+        self.virtual_table_bytes = table_bytes
+        self.size_bytes += delta
+        return delta
+
+    def memory(self) -> Dict[str, Any]:
+        """Octets par colonne des données de la session (et de la table virtuelle en cache)."""
+        frames = [('overall', self.overall_df), ('transaction', self.transaction_df)]
+        if self._virtual_table is not None:
+            frames.append(('virtual_table', self._virtual_table[1]))
+        return {'session_id': self.session_id, 'frames': frames_memory(frames)}
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'session_id': self.session_id,
+            'overall_rows': len(self.overall_df),
+            'transaction_rows': len(self.transaction_df),
+            'size_bytes': self.size_bytes,
+            'created_at': self.created_at,
+            'last_access': self.last_access
+        }
+
+
+class SessionStore:
+    """
+    Stockage en mémoire des sessions d'analyse.
+
+    Les sessions expirent après SESSION_TTL_SECONDS sans accès ; lorsque le
+    budget mémoire est dépassé, les sessions les moins récemment utilisées
+    sont évincées en premier.
+    """
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS, max_bytes: int = SESSION_MAX_BYTES):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, AnalysisSession]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._expired = 0
+        self._evicted = 0
+
+    def _remove(self, session_id: str) -> Optional[AnalysisSession]:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._size -= session.size_bytes
+        return session
+
+    def _purge_expired(self, now: float) -> None:
+        expired = [sid for sid, s in self._sessions.items() if now - s.last_access > self.ttl_seconds]
+        for session_id in expired:
+            self._remove(session_id)
+            self._expired += 1
+
+    def _evict_to_budget(self) -> None:
+        while self._size > self.max_bytes and len(self._sessions) > 1:
+            session_id = next(iter(self._sessions))
+            self._remove(session_id)
+            self._evicted += 1
+            logger.info(f"Session {session_id} evicted (memory budget)")
+
+    def create(
+        self,
+        overall_df: pd.DataFrame,
+        transaction_df: pd.DataFrame,
+        segment_index: Optional[Any] = None
+    ) -> AnalysisSession:
+        session = AnalysisSession(uuid.uuid4().hex, overall_df, transaction_df, segment_index)
+        if session.size_bytes > self.max_bytes:
+            raise MemoryError(
+                f"Session size ({session.size_bytes} bytes) exceeds the session budget ({self.max_bytes} bytes)"
+            )
+        with self._lock:
+            self._purge_expired(time.time())
+            self._sessions[session.session_id] = session
+            self._size += session.size_bytes
+            self._evict_to_budget()
+        return session
+
+    def get(self, session_id: str) -> Optional[AnalysisSession]:
+        now = time.time()
+        with self._lock:
+            self._purge_expired(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def cache_virtual_table(self, session: AnalysisSession, key: str, table: pd.DataFrame) -> bool:
+        """
+        Met en cache la table virtuelle d'une session à la place de la précédente,
+        en comptant sa taille dans le budget mémoire (les sessions les moins
+        récemment utilisées sont évincées si besoin).
+
+        Returns:
+            bool: False si la session dépasserait à elle seule le budget : la
+                table n'est alors pas conservée (l'appelant l'utilise sans cache)
+        """
+        table_bytes = frame_bytes(table)
+        with self._lock:
+            if session.size_bytes - session.virtual_table_bytes + table_bytes > self.max_bytes:
+                logger.warning(
+                    f"Virtual table of session {session.session_id} not cached: "
+                    f"{table_bytes} bytes would exceed the session budget ({self.max_bytes} bytes)"
+                )
+                return False
+            delta = session.set_virtual_table(key, table, table_bytes)
+            # Une session déjà évincée ou expirée ne compte plus dans le budget
+            if self._sessions.get(session.session_id) is session:
+                self._size += delta
+                self._evict_to_budget()
+        return True
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._remove(session_id) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._purge_expired(time.time())
+            return {
+                'sessions': len(self._sessions),
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'expired': self._expired,
+                'evicted': self._evicted
+            }
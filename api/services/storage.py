@@ -0,0 +1,31 @@
+# storage.py
+
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Racine des données persistantes (états des tests, jeux de données archivés) :
+# par défaut le répertoire data/ du projet, qui survit aux redémarrages
+DATA_DIR = os.getenv(
+    "DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+)
+
+
+def storage_dir(path: str, label: str) -> str:
+    """
+    Chemin absolu d'un répertoire de données, créé s'il n'existe pas.
+
+    Journalise le chemin retenu, avec un avertissement s'il se trouve dans le
+    répertoire temporaire du système (vidé au redémarrage de la machine).
+    """
+    path = os.path.abspath(path)
+    os.makedirs(path, exist_ok=True)
+    temp_root = os.path.abspath(tempfile.gettempdir())
+    if os.path.commonpath([path, temp_root]) == temp_root:
+        logger.warning(f"{label} stored in temporary directory {path}: data will not survive a reboot")
+    else:
+        logger.info(f"{label} stored in {path}")
+    return path
@@ -0,0 +1,88 @@
+# table_pages.py
+
+import base64
+import json
+import os
+import logging
+from typing import Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Taille de page par défaut et maximale (mode JSON paginé)
+VIRTUAL_TABLE_PAGE_ROWS = int(os.getenv("VIRTUAL_TABLE_PAGE_ROWS", 1000))
+VIRTUAL_TABLE_MAX_PAGE_ROWS = int(os.getenv("VIRTUAL_TABLE_MAX_PAGE_ROWS", 10_000))
+
+# Nombre de lignes sérialisées à la fois en mode NDJSON
+NDJSON_BATCH_ROWS = 1000
+
+CURSOR_COLUMN = 'transaction_id'
+
+
+class InvalidCursorError(ValueError):
+    """Levée lorsqu'un curseur de pagination ne peut pas être décodé."""
+
+
+def encode_cursor(last_key: Any) -> str:
+    """Curseur opaque : dernière clé (transaction_id) de la page renvoyée."""
+    payload = json.dumps({'after': last_key.item() if isinstance(last_key, np.generic) else last_key})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Any:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))['after']
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"Curseur invalide: {cursor}") from e
+
+
+def project_columns(table: pd.DataFrame, columns: Optional[List[str]]) -> List[str]:
+    """
+    Colonnes à renvoyer (toutes par défaut).
+
+    Raises:
+        ValueError: Colonne inconnue
+    """
+    if not columns:
+        return list(table.columns)
+    unknown = [col for col in columns if col not in table.columns]
+    if unknown:
+        raise ValueError(f"Colonnes inconnues: {unknown}")
+    return list(columns)
+
+
+def page_bounds(table: pd.DataFrame, cursor: Optional[str], limit: Optional[int]) -> Tuple[int, int]:
+    """
+    Bornes [début, fin) de la page suivant le curseur.
+
+    La table étant triée par transaction_id, la reprise se fait par recherche
+    dichotomique sur la dernière clé : les pages restent stables même si la
+    table est recalculée entre deux appels.
+    """
+    start = 0
+    if cursor:
+        keys = table[CURSOR_COLUMN].to_numpy()
+        start = int(np.searchsorted(keys, decode_cursor(cursor), side='right'))
+    stop = len(table) if limit is None else min(start + limit, len(table))
+    return start, stop
+
+
+def next_cursor(table: pd.DataFrame, stop: int) -> Optional[str]:
+    if stop >= len(table) or stop == 0:
+        return None
+    return encode_cursor(table[CURSOR_COLUMN].iloc[stop - 1])
+
+
+def iter_ndjson(table: pd.DataFrame, start: int, stop: int, columns: List[str], batch_rows: int = NDJSON_BATCH_ROWS) -> Iterator[bytes]:
+    """
+    Génère les lignes [start, stop) en NDJSON, lot par lot.
+
+    Chaque lot est sérialisé par l'encodeur JSON de pandas à partir des colonnes :
+    aucune liste de dictionnaires n'est construite pour la table entière.
+    """
+    projected = table[columns]
+    for batch_start in range(start, stop, batch_rows):
+        batch = projected.iloc[batch_start:min(batch_start + batch_rows, stop)]
+        yield batch.to_json(orient='records', lines=True, force_ascii=False).rstrip('\n').encode('utf-8') + b'\n'
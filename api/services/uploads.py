@@ -0,0 +1,84 @@
+# uploads.py
+
+import os
+import tempfile
+import logging
+from typing import Iterator, Optional
+
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+# Taille maximale d'un fichier téléversé
+UPLOAD_MAX_BYTES = int(float(os.getenv("UPLOAD_MAX_MB", 512)) * 1024 * 1024)
+
+# Taille des blocs copiés vers le disque
+UPLOAD_COPY_BYTES = 1024 * 1024
+
+# Répertoire des fichiers temporaires (par défaut celui du système)
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+
+
+class UploadTooLargeError(Exception):
+    """Levée lorsqu'un fichier dépasse UPLOAD_MAX_MB."""
+
+
+async def save_upload(upload: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> str:
+    """
+    Copie un fichier téléversé sur disque par blocs, sans le charger en mémoire.
+
+    Le chemin retourné peut être transmis à un worker de l'exécuteur ;
+    l'appelant le supprime avec remove_upload une fois l'analyse terminée.
+
+    Raises:
+        UploadTooLargeError: Le fichier dépasse max_bytes
+    """
+    suffix = os.path.splitext(upload.filename or '')[1]
+    fd, path = tempfile.mkstemp(prefix='upload-', suffix=suffix, dir=UPLOAD_TMP_DIR)
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                block = await upload.read(UPLOAD_COPY_BYTES)
+                if not block:
+                    break
+                written += len(block)
+                if written > max_bytes:
+                    raise UploadTooLargeError(
+                        f"Le fichier {upload.filename} dépasse la taille maximale ({max_bytes // (1024 * 1024)} Mo)"
+                    )
+                out.write(block)
+    except BaseException:
+        remove_upload(path)
+        raise
+    finally:
+        await upload.close()
+
+    logger.info(f"Fichier {upload.filename} reçu ({written} octets)")
+    return path
+
+
+def temp_output_path(suffix: str = '') -> str:
+    """Chemin d'un fichier temporaire de résultat (même répertoire que les téléversements), à supprimer avec remove_upload."""
+    fd, path = tempfile.mkstemp(prefix='result-', suffix=suffix, dir=UPLOAD_TMP_DIR)
+    os.close(fd)
+    return path
+
+
+def iter_file_blocks(path: str, block_bytes: int = UPLOAD_COPY_BYTES) -> Iterator[bytes]:
+    """Relit un fichier par blocs (réponse en flux)."""
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_bytes)
+            if not block:
+                return
+            yield block
+
+
+def remove_upload(path: Optional[str]) -> None:
+    """Supprime un fichier temporaire de téléversement s'il existe encore."""
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Impossible de supprimer {path}: {str(e)}")
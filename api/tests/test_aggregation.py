@@ -0,0 +1,120 @@
+# test_aggregation.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.benchmarks.workload import make_frames
+from api.processors.aggregation import concat_unique_labels, group_codes
+from api.processors.data_processor import DataProcessor
+
+
+# Implémentations d'origine (un callback Python par groupe), servant de référence
+
+def _labels(items) -> str:
+    return ' | '.join(sorted(set(str(i) for i in items if pd.notna(i) and str(i).strip())))
+
+
+def _limited_labels(items, max_items: int = 3) -> str:
+    unique_items = sorted(set(str(i) for i in items if pd.notna(i) and str(i).strip()))
+    if len(unique_items) <= max_items:
+        return ' | '.join(unique_items)
+    return f"{' | '.join(unique_items[:max_items])} (+{len(unique_items) - max_items} autres)"
+
+
+def reference_analysis_table(transaction: pd.DataFrame) -> pd.DataFrame:
+    df = transaction.copy()
+    for col in ('transaction_id', 'revenue', 'quantity', 'variation', 'device_category',
+                'item_category2', 'item_name', 'item_bundle', 'item_name_simple'):
+        if col not in df.columns:
+            df[col] = 'N/A'
+    for col in ('revenue', 'quantity'):
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    concat_columns = ['item_category2', 'item_name', 'item_bundle', 'item_name_simple']
+    table = df.groupby('transaction_id').agg({
+        'revenue': 'sum',
+        'quantity': 'sum',
+        'variation': 'first',
+        'device_category': 'first',
+        **{col: _labels for col in concat_columns}
+    }).reset_index()
+    for col in ('revenue', 'quantity'):
+        table[col] = table[col].round(2)
+    return table
+
+
+def reference_aggregate_transactions(records) -> pd.DataFrame:
+    df = pd.DataFrame(records)
+    df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce')
+    df['revenue'] = pd.to_numeric(df['revenue'], errors='coerce')
+    df['unique_products'] = 1
+    agg_dict = {'revenue': 'sum', 'quantity': 'sum', 'unique_products': 'count'}
+    for col in ('variation', 'device_category'):
+        if col in df.columns:
+            agg_dict[col] = 'first'
+    for col in ('item_category2', 'item_name', 'item_bundle', 'item_name_simple'):
+        if col in df.columns:
+            agg_dict[col] = _limited_labels
+    grouped = df.groupby('transaction_id').agg(agg_dict).reset_index()
+    grouped['products_summary'] = grouped.apply(
+        lambda row: f"{int(row['unique_products'])} produit{'s' if row['unique_products'] > 1 else ''} ({int(row['quantity'])} unité{'s' if row['quantity'] > 1 else ''})",
+        axis=1
+    )
+    grouped['revenue'] = grouped['revenue'].round(2)
+    return grouped
+
+
+@pytest.fixture
+def transaction():
+    """Lignes article avec clés nulles, valeurs vides, types mélangés et paniers de plus de 3 articles."""
+    overall, transaction = make_frames(transactions=300, users=2_000, items_per_order=4, seed=13)
+    rng = np.random.default_rng(13)
+    n = len(transaction)
+    transaction = transaction.astype({'item_category2': object, 'item_name': object})
+    transaction['item_name_simple'] = transaction['item_name'].str.slice(0, 9)
+    transaction['item_bundle'] = rng.choice(np.array([1, 2.5, 'Bundle', '', ' ', None, np.nan], dtype=object), n)
+    transaction.loc[rng.random(n) < 0.05, 'item_category2'] = None
+    transaction.loc[rng.random(n) < 0.05, 'item_name'] = ''
+    transaction.loc[rng.random(n) < 0.03, 'transaction_id'] = None
+    transaction.loc[rng.random(n) < 0.03, 'variation'] = None
+    return overall, transaction
+
+
+def _as_objects(df: pd.DataFrame) -> pd.DataFrame:
+    # Les tables compactes (catégorielles, int32) sont comparées valeur par valeur,
+    # valeurs manquantes ramenées à None
+    df = df.astype(object)
+    return df.where(df.notna(), None).reset_index(drop=True)
+
+
+def test_create_analysis_table_matches_baseline(transaction):
+    overall, transaction = transaction
+    data = {'raw_data': {'overall': overall.to_dict('records'), 'transaction': transaction.to_dict('records')}}
+    result = DataProcessor().create_analysis_table(data)
+    pd.testing.assert_frame_equal(_as_objects(result), _as_objects(reference_analysis_table(pd.DataFrame(data['raw_data']['transaction']))))
+
+
+def test_create_analysis_table_fills_missing_columns(transaction):
+    overall, transaction = transaction
+    transaction = transaction.drop(columns=['item_bundle', 'item_name_simple'])
+    data = {'raw_data': {'overall': overall.to_dict('records'), 'transaction': transaction.to_dict('records')}}
+    result = DataProcessor().create_analysis_table(data)
+    assert set(result['item_bundle']) == {'N/A'}
+    pd.testing.assert_frame_equal(_as_objects(result), _as_objects(reference_analysis_table(pd.DataFrame(data['raw_data']['transaction']))))
+
+
+def test_aggregate_transactions_matches_baseline(transaction):
+    _, transaction = transaction
+    records = transaction.to_dict('records')
+    result = pd.DataFrame(DataProcessor().aggregate_transactions(records))
+    pd.testing.assert_frame_equal(_as_objects(result), _as_objects(reference_aggregate_transactions(records)))
+
+
+@pytest.mark.parametrize('max_items', [None, 1, 3])
+def test_concat_unique_labels_matches_callback(transaction, max_items):
+    _, transaction = transaction
+    groupby, codes, n_groups = group_codes(transaction, 'transaction_id')
+    for col in ('item_category2', 'item_name', 'item_bundle'):
+        callback = _labels if max_items is None else (lambda x: _limited_labels(x, max_items))
+        expected = groupby[col].agg(callback).to_numpy()
+        assert list(concat_unique_labels(transaction[col], codes, n_groups, max_items=max_items)) == list(expected)
@@ -0,0 +1,106 @@
+# test_arm_comparison.py
+
+import numpy as np
+import pytest
+import scipy.stats as stats
+
+from api.benchmarks.workload import make_frames
+from api.processors.arm_comparison import adjust_p_values, compare_arms, welch_from_moments
+from api.processors.data_processor import DataProcessor
+
+ARMS = ('Control', 'B', 'C')
+
+
+@pytest.fixture(scope='module')
+def processor():
+    return DataProcessor()
+
+
+@pytest.fixture(scope='module')
+def data():
+    overall, transaction = make_frames(arms=ARMS, transactions=900, users=4_000, seed=16)
+    return {'raw_data': {'overall': overall.to_dict('records'), 'transaction': transaction.to_dict('records')}}
+
+
+@pytest.fixture(scope='module')
+def context(processor, data):
+    return processor.build_analysis_context(data)
+
+
+def test_welch_from_moments_matches_ttest_ind():
+    rng = np.random.default_rng(16)
+    ctrl = rng.lognormal(3, 1, 400)
+    arms = [rng.lognormal(3.1, 1, 350), rng.lognormal(3, 1.3, 50), rng.normal(20, 5, 1_000)]
+    result = welch_from_moments(
+        [arm.mean() for arm in arms], [arm.var(ddof=1) for arm in arms], [len(arm) for arm in arms],
+        ctrl.mean(), ctrl.var(ddof=1), len(ctrl)
+    )
+    for i, arm in enumerate(arms):
+        expected = stats.ttest_ind(arm, ctrl, equal_var=False)
+        assert result['statistic'][i] == pytest.approx(expected.statistic, rel=1e-9)
+        assert result['p_value'][i] == pytest.approx(expected.pvalue, rel=1e-9)
+
+
+def test_holm_is_monotone_and_capped():
+    p_values = np.array([0.01, 0.04, 0.03, 0.5, 0.2])
+    adjusted = adjust_p_values(p_values, 'holm')
+    order = np.argsort(p_values)
+    # Référence : p(i) * (m - i) dans l'ordre croissant, maximum cumulé, borné à 1
+    expected = np.minimum(np.maximum.accumulate(p_values[order] * np.arange(5, 0, -1)), 1.0)
+    np.testing.assert_allclose(adjusted[order], expected)
+    assert np.all(np.diff(adjusted[order]) >= 0)
+    assert np.all(adjusted >= p_values)
+    assert adjust_p_values(np.array([0.4, 0.6, 0.9]), 'holm').max() == 1.0
+
+
+def test_bonferroni_and_none():
+    p_values = np.array([0.01, 0.2, 0.6])
+    np.testing.assert_allclose(adjust_p_values(p_values, 'bonferroni'), [0.03, 0.6, 1.0])
+    np.testing.assert_array_equal(adjust_p_values(p_values, 'none'), p_values)
+    with pytest.raises(ValueError):
+        adjust_p_values(p_values, 'fdr')
+
+
+@pytest.mark.parametrize('correction', ['holm', 'bonferroni'])
+def test_nan_p_values_are_excluded_from_the_family(correction):
+    adjusted = adjust_p_values(np.array([0.01, np.nan, 0.02]), correction)
+    assert np.isnan(adjusted[1])
+    np.testing.assert_allclose(adjusted[[0, 2]], adjust_p_values(np.array([0.01, 0.02]), correction))
+
+
+def test_rate_and_rank_tests_match_revenue_metrics(processor, data, context):
+    expected = processor.calculate_revenue_metrics(data)['data']
+    results = compare_arms(context, correction='none')
+    for variation in ('B', 'C'):
+        for metric in ('transaction_rate', 'aov', 'avg_products'):
+            assert results[metric][variation]['value'] == pytest.approx(expected[variation][metric]['value'])
+            assert results[metric][variation]['confidence'] == pytest.approx(expected[variation][metric]['confidence'])
+
+
+def test_welch_results_match_ttest_ind(context):
+    results = compare_arms(context)
+    table = context.virtual_table
+    ctrl = table[table['variation'] == 'Control']
+    ctrl_users = int(context.control_overall['users'])
+    for variation in ('B', 'C'):
+        arm = table[table['variation'] == variation]
+        expected = stats.ttest_ind(arm['revenue'], ctrl['revenue'], equal_var=False)
+        assert results['aov'][variation]['welch']['p_value'] == pytest.approx(expected.pvalue, rel=1e-9)
+
+        # ARPU : utilisateurs sans transaction comptés pour 0
+        users = int(context.overall(variation)['users'])
+        arm_users = np.concatenate((arm['revenue'], np.zeros(users - len(arm))))
+        ctrl_per_user = np.concatenate((ctrl['revenue'], np.zeros(ctrl_users - len(ctrl))))
+        expected = stats.ttest_ind(arm_users, ctrl_per_user, equal_var=False)
+        assert results['arpu'][variation]['p_value'] == pytest.approx(expected.pvalue, rel=1e-6)
+
+
+def test_adjusted_confidences_follow_the_correction(context):
+    raw = compare_arms(context, correction='none')
+    holm = compare_arms(context, correction='holm')
+    for metric in ('transaction_rate', 'aov'):
+        p_values = np.array([raw[metric][v]['p_value'] for v in ('B', 'C')])
+        adjusted = adjust_p_values(p_values, 'holm')
+        for i, variation in enumerate(('B', 'C')):
+            assert holm[metric][variation]['p_value'] == pytest.approx(p_values[i])
+            assert holm[metric][variation]['adjusted_p_value'] == pytest.approx(adjusted[i])
@@ -0,0 +1,78 @@
+# test_bootstrap.py
+
+import numpy as np
+import pytest
+
+from api.processors.bootstrap import BootstrapEngine, PoissonBootstrapState, ResamplePlan
+
+
+def test_replicates_match_python_loop():
+    values = np.random.default_rng(0).lognormal(3, 1, 300)
+    plan = ResamplePlan(len(values), n_bootstrap=200, seed=7, max_batch_bytes=10_000)
+    # Boucle de référence : un rééchantillonnage à la fois, avec les mêmes indices
+    expected = [values[indices].mean() for batch in plan.iter_indices() for indices in batch]
+    assert plan.replicate_sums({'values': values}).mean('values') == pytest.approx(expected, rel=1e-12)
+
+
+def test_batching_does_not_change_replicates():
+    values = np.random.default_rng(1).normal(50, 10, 500)
+    small = BootstrapEngine(n_bootstrap=300, max_batch_bytes=16 * 500 * 7, random_state=3).replicates(values)
+    large = BootstrapEngine(n_bootstrap=300, random_state=3).replicates(values)
+    np.testing.assert_allclose(small, large, rtol=1e-12)
+
+
+@pytest.mark.parametrize('statistic, scale', [('mean', 1.0), ('sum', 1_000.0)])
+def test_interval_coverage(statistic, scale):
+    """
+    Sur des tests simulés à effet connu, l'intervalle à 95 % contient la vraie
+    différence relative dans environ 95 % des cas (bootstrap des percentiles).
+    """
+    rng = np.random.default_rng(2024)
+    n, simulations = 400, 200
+    ctrl_mean, var_mean = 40.0, 44.0
+    true_diff = (var_mean - ctrl_mean) / ctrl_mean * 100
+
+    covered = 0
+    for seed in range(simulations):
+        ctrl = rng.exponential(ctrl_mean, n)
+        var = rng.exponential(var_mean, n)
+        engine = BootstrapEngine(n_bootstrap=500, random_state=seed)
+        lower, upper = engine.relative_diff_interval(var, ctrl, statistic, var_scale=scale, ctrl_scale=scale)
+        covered += lower <= true_diff <= upper
+
+    assert 0.88 <= covered / simulations <= 0.99
+
+
+def test_interval_of_identical_arms_contains_zero():
+    values = np.random.default_rng(4).exponential(30, 1_000)
+    lower, upper = BootstrapEngine(random_state=0).relative_diff_interval(values, values.copy())
+    assert lower < 0 < upper
+
+
+def test_confidence_from_replicates():
+    rng = np.random.default_rng(5)
+    ctrl = rng.normal(100, 1, 1_000)
+    assert BootstrapEngine.confidence_from_replicates(ctrl + 10, ctrl) == 100.0
+    assert BootstrapEngine.confidence_from_replicates(rng.normal(100, 1, 1_000), ctrl) < 90.0
+    assert BootstrapEngine.confidence_from_replicates(np.array([]), np.array([])) == 0.0
+
+
+def test_poisson_states_merge():
+    values = np.random.default_rng(6).exponential(20, 900)
+    first = PoissonBootstrapState(['revenue'], n_bootstrap=100, seed=1).update({'revenue': values[:400]})
+    second = PoissonBootstrapState(['revenue'], n_bootstrap=100, seed=2).update({'revenue': values[400:]})
+    merged = first.merge(second)
+    assert merged.n_rows == len(values)
+    assert merged.totals['revenue'] == pytest.approx(values.sum())
+    # Poids Poisson(1) : chaque rééchantillonnage compte environ n observations
+    assert merged.weights.mean() == pytest.approx(len(values), rel=0.02)
+    assert merged.to_replicates().mean('revenue').mean() == pytest.approx(values.mean(), rel=0.02)
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        BootstrapEngine(n_bootstrap=0)
+    with pytest.raises(ValueError):
+        BootstrapEngine().replicates(np.array([]))
+    with pytest.raises(ValueError):
+        BootstrapEngine().replicates(np.array([1.0]), statistic='median')
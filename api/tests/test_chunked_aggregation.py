@@ -0,0 +1,91 @@
+# test_chunked_aggregation.py
+
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.benchmarks.workload import make_frames
+from api.processors.chunked_aggregation import UnsortedChunksError, iter_hash_aggregates
+from api.processors.data_processor import DataProcessor
+
+
+@pytest.fixture
+def processor():
+    return DataProcessor()
+
+
+@pytest.fixture
+def items():
+    """Lignes article avec clés et variations nulles et valeurs vides."""
+    _, transaction = make_frames(transactions=150, users=1_000, items_per_order=3, seed=22)
+    rng = np.random.default_rng(22)
+    n = len(transaction)
+    transaction['item_bundle'] = rng.choice(np.array(['Bundle A', 'Bundle B', '', None], dtype=object), n)
+    transaction.loc[rng.random(n) < 0.03, 'variation'] = None
+    transaction.loc[rng.random(n) < 0.02, 'transaction_id'] = None
+    return transaction
+
+
+def _chunks(df: pd.DataFrame, rows: int):
+    return [df.iloc[start:start + rows] for start in range(0, len(df), rows)]
+
+
+def _normalized(records):
+    # NaN != NaN : valeurs manquantes ramenées à None pour comparer les enregistrements
+    return [
+        {key: None if isinstance(value, float) and math.isnan(value) else value for key, value in record.items()}
+        for record in records
+    ]
+
+
+@pytest.mark.parametrize('chunk_rows', [2, 7, 100, 100_000])
+def test_sorted_mode_matches_in_memory(processor, items, chunk_rows):
+    sorted_items = items.sort_values('transaction_id', kind='stable', na_position='first')
+    expected = processor.aggregate_transactions(sorted_items.to_dict('records'))
+    result = list(processor.aggregate_transactions_chunked(_chunks(sorted_items, chunk_rows), mode='sorted'))
+    assert _normalized(result) == _normalized(expected)
+
+
+@pytest.mark.parametrize('chunk_rows', [2, 7, 100])
+def test_hash_mode_matches_in_memory_on_shuffled_rows(processor, items, chunk_rows):
+    shuffled = items.sample(frac=1.0, random_state=22)
+    expected = processor.aggregate_transactions(shuffled.to_dict('records'))
+    result = list(processor.aggregate_transactions_chunked(_chunks(shuffled, chunk_rows), mode='hash'))
+    assert _normalized(result) == _normalized(expected)
+
+
+@pytest.mark.parametrize('partitions', [1, 3, 64])
+def test_hash_mode_partition_count(processor, items, partitions):
+    shuffled = items.sample(frac=1.0, random_state=5)
+    expected = processor.aggregate_transactions(shuffled.to_dict('records'))
+    result = list(iter_hash_aggregates(_chunks(shuffled, 50), partitions=partitions))
+    assert _normalized(result) == _normalized(expected)
+
+
+def test_sorted_mode_rejects_unsorted_rows(processor, items):
+    shuffled = items.sample(frac=1.0, random_state=1)
+    with pytest.raises(UnsortedChunksError):
+        list(processor.aggregate_transactions_chunked(_chunks(shuffled, 100), mode='sorted'))
+
+
+def test_unknown_mode(processor, items):
+    with pytest.raises(ValueError):
+        processor.aggregate_transactions_chunked(_chunks(items, 100), mode='merge')
+
+
+@pytest.mark.parametrize('mode', ['sorted', 'hash'])
+def test_file_export_matches_in_memory(processor, items, tmp_path, mode):
+    source = tmp_path / 'items.csv'
+    items.sort_values('transaction_id', kind='stable').to_csv(source, index=False)
+    output = tmp_path / 'transactions.ndjson'
+
+    summary = processor.aggregate_transactions_file(str(source), 'items.csv', str(output), mode=mode, chunk_rows=64)
+
+    expected = processor.aggregate_transactions(pd.read_csv(source).to_dict('records'))
+    with open(output, encoding='utf-8') as f:
+        result = [json.loads(line) for line in f]
+    assert summary == {'mode': mode, 'input_records': len(items), 'output_records': len(expected)}
+    assert result == _normalized(expected)
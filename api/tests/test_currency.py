@@ -0,0 +1,88 @@
+# test_currency.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.processors.currency import parse_revenue_series
+
+MALFORMED = [
+    '3 items @ 4.00',   # chiffres séparés par du texte
+    '1a2',
+    'N/A 5',            # préfixe qui n'est ni une devise ni un signe
+    'abc',
+    '12.5.',            # séparateur final / décimale répétée
+    '12..5',
+    '12.',
+    '1,2,3',            # groupes de milliers différents de 3 chiffres
+    '1, 234',
+    '1.23,4.5',         # décimale répétée avec les deux séparateurs
+    '1.5 000',          # décimale suivie d'un séparateur de milliers
+    '--5',              # signes répétés ou mal placés
+    '-(5)',
+    '12-',
+    '(12',              # parenthèses non appariées
+    '12)',
+    '1e3x',
+]
+
+VALID = [
+    ('€1,234.56', 'USD', 1234.56),
+    ('$ 1,234.00', 'USD', 1234.0),
+    ('USD 12.00', 'USD', 12.0),
+    ('1234.56', 'EUR', 1234.56),
+    ('1.234,56', 'EUR', 1234.56),
+    ('1 234,56 €', 'EUR', 1234.56),
+    ('12,50 EUR', 'EUR', 12.5),
+    ('1.234.567,89', 'EUR', 1234567.89),
+    ('1,234,567', 'USD', 1234567.0),
+    ("1'234.50", 'CHF', 1234.5),
+    ('1,234', 'USD', 1234.0),
+    ('1,234', 'EUR', 1.234),
+    ('1.234', 'EUR', 1234.0),
+    ('.50', 'USD', 0.5),
+    ('(12)', 'USD', -12.0),
+    ('-12', 'USD', -12.0),
+    ('€ -12.50', 'EUR', -12.5),
+    ('-€12.50', 'EUR', -12.5),
+    ('+5', 'USD', 5.0),
+    ('1e3', 'USD', 1000.0),
+]
+
+
+@pytest.mark.parametrize('cell', MALFORMED)
+@pytest.mark.parametrize('currency', ['USD', 'EUR'])
+def test_malformed_cells_are_invalid(cell, currency):
+    values, invalid = parse_revenue_series(pd.Series([cell], dtype=object), currency)
+    assert np.isnan(values.iloc[0])
+    assert invalid.iloc[0]
+
+
+@pytest.mark.parametrize('cell,currency,expected', VALID)
+def test_valid_cells(cell, currency, expected):
+    values, invalid = parse_revenue_series(pd.Series([cell], dtype=object), currency)
+    assert values.iloc[0] == expected
+    assert not invalid.iloc[0]
+
+
+def test_blank_cells_are_missing_not_invalid():
+    values, invalid = parse_revenue_series(pd.Series(['', '  ', None, '12'], dtype=object), 'USD')
+    assert values.isna().tolist() == [True, True, True, False]
+    assert not invalid.any()
+
+
+def test_mixed_column_matches_cell_by_cell_parsing():
+    cells = MALFORMED + [cell for cell, currency, _ in VALID if currency == 'USD'] + [12.5, 3]
+    values, invalid = parse_revenue_series(pd.Series(cells, dtype=object), 'USD')
+    for position, cell in enumerate(cells):
+        single, single_invalid = parse_revenue_series(pd.Series([cell], dtype=object), 'USD')
+        assert np.isnan(values.iloc[position]) == np.isnan(single.iloc[0])
+        if not np.isnan(single.iloc[0]):
+            assert values.iloc[position] == single.iloc[0]
+        assert invalid.iloc[position] == single_invalid.iloc[0]
+
+
+def test_numeric_column_fast_path():
+    values, invalid = parse_revenue_series(pd.Series([1.5, 2.0, np.nan]), 'EUR')
+    assert values.tolist()[:2] == [1.5, 2.0]
+    assert not invalid.any()
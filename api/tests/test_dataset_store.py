@@ -0,0 +1,72 @@
+# test_dataset_store.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from starlette.testclient import TestClient
+
+from api import main
+from api.services.dataset_store import DatasetStore
+
+
+def _frames(revenue: float):
+    return {
+        'overall': pd.DataFrame({'variation': ['Control', 'B'], 'users': [100, 110]}),
+        'transaction': pd.DataFrame({
+            'transaction_id': ['t1', 't2', 't3'],
+            'variation': pd.Categorical(['Control', 'B', 'B']),
+            'revenue': np.full(3, revenue)
+        })
+    }
+
+
+def test_save_load_round_trip(tmp_path):
+    store = DatasetStore(str(tmp_path))
+    store.save('test-1', _frames(10.0), {'name': 'Test 1'})
+    loaded = store.load('test-1')
+    # Colonnes projetées en mémoire (memmap) : comparaison des valeurs
+    assert loaded['overall'].to_dict('records') == _frames(10.0)['overall'].to_dict('records')
+    assert list(loaded['transaction']['revenue']) == [10.0] * 3
+    assert store.describe('test-1')['metadata'] == {'name': 'Test 1'}
+
+
+def test_load_retries_when_a_concurrent_save_replaces_the_version(tmp_path, monkeypatch):
+    store = DatasetStore(str(tmp_path))
+    store.save('test-1', _frames(10.0))
+    stale = store._manifest('test-1')
+    # Une autre écriture remplace la version 1 (supprimée) par la version 2
+    store.save('test-1', _frames(20.0))
+
+    manifests = iter([stale])
+    original = store._manifest
+    monkeypatch.setattr(store, '_manifest', lambda test_id: next(manifests, None) or original(test_id))
+    loaded = store.load('test-1')
+    assert list(loaded['transaction']['revenue']) == [20.0] * 3
+
+
+def test_load_of_a_dataset_deleted_while_loading(tmp_path, monkeypatch):
+    store = DatasetStore(str(tmp_path))
+    store.save('test-1', _frames(10.0))
+    stale = store._manifest('test-1')
+    store.delete('test-1')
+
+    monkeypatch.setattr(store, '_manifest', lambda test_id, manifests=iter([stale]): next(manifests, None))
+    assert store.load('test-1') is None
+
+
+@pytest.mark.parametrize('method, path', [('post', '/datasets/bad id'), ('post', '/datasets/bad id/open')])
+def test_invalid_ids_do_not_leave_locks(method, path, tmp_path, monkeypatch):
+    monkeypatch.setattr(main.dataset_store, 'root', str(tmp_path))
+    locks = dict(main.dataset_locks)
+    client = TestClient(main.app)
+    response = client.request(method, path, json={'session_id': 'unknown'})
+    assert response.status_code == 400
+    assert main.dataset_locks == locks
+
+
+def test_unknown_dataset_open_is_404_without_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.dataset_store, 'root', str(tmp_path))
+    locks = dict(main.dataset_locks)
+    response = TestClient(main.app).post('/datasets/missing-test/open')
+    assert response.status_code == 404
+    assert main.dataset_locks == locks
@@ -0,0 +1,75 @@
+# test_executor.py
+
+import asyncio
+import os
+import signal
+import time
+
+import pandas as pd
+import pytest
+
+from api.services.executor import AnalysisExecutor, AnalysisTimeoutError, ExecutorUnavailableError
+
+FRAME = pd.DataFrame({'device_category': ['mobile', 'desktop'], 'item_category2': ['Beds', 'Sofas|Beds']})
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.fixture
+def executor():
+    executor = AnalysisExecutor(kind='process', max_workers=1, max_queue=2, timeout=30, recycle_after_timeouts=2)
+    yield executor
+    executor.shutdown()
+
+
+def _wait_for_release(executor, deadline=10.0):
+    start = time.monotonic()
+    while executor.stats()['in_flight'] and time.monotonic() - start < deadline:
+        time.sleep(0.05)
+
+
+def test_broken_pool_is_replaced(executor):
+    assert _run(executor.run('build_segment_index', FRAME)).n_rows == 2
+    pool = executor._executor
+    for process in list(pool._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+
+    with pytest.raises(ExecutorUnavailableError):
+        # Le pool peut n'être détecté cassé qu'à la soumission suivante
+        for _ in range(50):
+            _run(executor.run('build_segment_index', FRAME))
+            time.sleep(0.05)
+
+    assert executor._executor is None
+    assert _run(executor.run('build_segment_index', FRAME)).n_rows == 2
+    assert executor._executor is not pool
+    assert executor.stats()['recycled'] == 1
+    _wait_for_release(executor)
+    assert executor.stats()['in_flight'] == 0
+
+
+def test_consecutive_timeouts_recycle_the_pool(executor):
+    _run(executor.run('build_segment_index', FRAME))
+    pool = executor._executor
+
+    for _ in range(2):
+        with pytest.raises(AnalysisTimeoutError):
+            _run(executor.run('build_segment_index', FRAME, timeout=0))
+
+    assert executor.stats()['timed_out'] == 2
+    assert executor.stats()['recycled'] == 1
+    assert _run(executor.run('build_segment_index', FRAME)).n_rows == 2
+    assert executor._executor is not pool
+    _wait_for_release(executor)
+    assert executor.stats()['in_flight'] == 0
+
+
+def test_success_resets_the_timeout_streak(executor):
+    with pytest.raises(AnalysisTimeoutError):
+        _run(executor.run('build_segment_index', FRAME, timeout=0))
+    _run(executor.run('build_segment_index', FRAME))
+    with pytest.raises(AnalysisTimeoutError):
+        _run(executor.run('build_segment_index', FRAME, timeout=0))
+    assert executor.stats()['recycled'] == 0
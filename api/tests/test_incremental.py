@@ -0,0 +1,134 @@
+# test_incremental.py
+
+import os
+
+import numpy as np
+import pytest
+
+from api.benchmarks.workload import make_frames
+from api.processors.data_processor import DataProcessor
+from api.processors.moments import RunningMoments, merge_runs, value_runs
+from api.services import incremental_store
+from api.services.incremental_store import STATE_FILE, IncrementalStore
+
+METRICS = ('transaction_rate', 'aov', 'avg_products', 'total_revenue', 'arpu')
+
+
+@pytest.fixture(scope='module')
+def processor():
+    return DataProcessor()
+
+
+@pytest.fixture(scope='module')
+def batches():
+    """Un test complet et ses deux moitiés (transactions et utilisateurs répartis entre deux exports)."""
+    overall, transaction = make_frames(transactions=600, users=3_000, seed=18)
+    ids = transaction['transaction_id'].unique()
+    first = transaction['transaction_id'].isin(set(ids[::2]))
+    overall_1 = overall.copy()
+    overall_1[['users', 'user_add_to_carts']] //= 2
+    overall_2 = overall.copy()
+    overall_2[['users', 'user_add_to_carts']] -= overall_1[['users', 'user_add_to_carts']]
+
+    def raw(o, t):
+        return {'overall': o.to_dict('records'), 'transaction': t.to_dict('records')}
+    return raw(overall, transaction), [raw(overall_1, transaction[first]), raw(overall_2, transaction[~first])]
+
+
+def _append_all(processor, batches, store=None):
+    state = None
+    for day, raw_data in enumerate(batches):
+        result = processor.append_test_batch(state, 'test-1', {'raw_data': raw_data, 'batch_id': f"day-{day}"})
+        assert result['success'], result.get('error')
+        state = result['state']
+        if store is not None:
+            store.save(state)
+            state = store.load('test-1')
+    return result, state
+
+
+def test_two_batches_match_full_data(processor, batches):
+    full, halves = batches
+    expected = processor.calculate_revenue_metrics({'raw_data': full})['data']
+    result, _ = _append_all(processor, halves)
+    for variation, metrics in expected.items():
+        assert result['data'][variation]['users']['value'] == metrics['users']['value']
+        for metric in METRICS:
+            assert result['data'][variation][metric]['value'] == pytest.approx(metrics[metric]['value'])
+            assert result['data'][variation][metric]['confidence'] == metrics[metric]['confidence']
+
+
+def test_duplicate_batch_is_rejected(processor, batches):
+    _, halves = batches
+    _, state = _append_all(processor, halves[:1])
+    result = processor.append_test_batch(state, 'test-1', {'raw_data': halves[1], 'batch_id': 'day-0'})
+    assert not result['success']
+    assert 'already appended' in result['error']
+
+
+def test_running_moments_merge_matches_numpy():
+    rng = np.random.default_rng(18)
+    parts = [rng.lognormal(3, 1, 500), rng.normal(50, 5, 3), np.array([]), rng.exponential(20, 1_200)]
+    merged = RunningMoments()
+    for part in parts:
+        merged = merged.merge(RunningMoments.from_values(part))
+    values = np.concatenate(parts)
+    assert merged.count == len(values)
+    assert merged.total == pytest.approx(values.sum())
+    assert merged.mean == pytest.approx(values.mean())
+    assert merged.variance == pytest.approx(np.var(values, ddof=1))
+    assert RunningMoments.from_dict(merged.to_dict()).to_dict() == merged.to_dict()
+
+
+def test_padded_moments_count_zeros():
+    values = np.array([10.0, 20.0, 35.0])
+    padded = RunningMoments.from_values(values).padded(10)
+    with_zeros = np.concatenate((values, np.zeros(7)))
+    assert padded.mean == pytest.approx(with_zeros.mean())
+    assert padded.variance == pytest.approx(np.var(with_zeros, ddof=1))
+    assert np.isnan(RunningMoments.from_values([1.0]).variance)
+
+
+def test_merge_runs_matches_unique_of_concatenation():
+    rng = np.random.default_rng(3)
+    a, b = rng.integers(0, 20, 300).astype(float), rng.integers(10, 40, 200).astype(float)
+    values, counts = merge_runs(*value_runs(a), *value_runs(b))
+    expected_values, expected_counts = np.unique(np.concatenate((a, b)), return_counts=True)
+    np.testing.assert_array_equal(values, expected_values)
+    np.testing.assert_array_equal(counts, expected_counts)
+
+
+def test_store_round_trip(processor, batches, tmp_path):
+    _, halves = batches
+    store = IncrementalStore(str(tmp_path))
+    in_memory, _ = _append_all(processor, halves)
+    reloaded, state = _append_all(processor, halves, store)
+
+    assert reloaded['data'] == in_memory['data']
+    assert state.version == 2
+    assert state.batches == ['day-0', 'day-1']
+    # Seuls state.json et les runs de la dernière version restent sur disque
+    files = sorted(os.listdir(tmp_path / 'test-1'))
+    assert files == sorted([STATE_FILE] + [f"arm{i}.v2.npz" for i in range(len(state.arms))])
+    for arm in state.arms.values():
+        for column in ('revenue', 'quantity'):
+            assert arm.runs[column][1].sum() == arm.moments[column].count
+
+
+def test_interrupted_save_keeps_previous_state(processor, batches, tmp_path, monkeypatch):
+    _, halves = batches
+    store = IncrementalStore(str(tmp_path))
+    _, state = _append_all(processor, halves[:1], store)
+
+    state = processor.append_test_batch(state, 'test-1', {'raw_data': halves[1], 'batch_id': 'day-1'})['state']
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(incremental_store.json, 'dump', fail)
+    with pytest.raises(OSError):
+        store.save(state)
+    monkeypatch.undo()
+
+    previous = store.load('test-1')
+    assert previous.version == 1
+    assert previous.batches == ['day-0']
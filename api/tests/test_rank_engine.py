@@ -0,0 +1,75 @@
+# test_rank_engine.py
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.stats as stats
+
+from api.processors.rank_engine import (
+    EXACT_MAX_SIZE, RankEngine, SortedSample, mann_whitney, mann_whitney_samples, mann_whitney_sorted
+)
+
+rng = np.random.default_rng(15)
+
+# (x, y) : continues, nombreux ex-aequo, montants arrondis, tailles déséquilibrées,
+# petits échantillons (délégués à scipy) et échantillons identiques
+SAMPLES = {
+    'continuous': (rng.normal(10, 2, 500), rng.normal(10.3, 2, 450)),
+    'integer_ties': (rng.integers(1, 5, 800).astype(float), rng.integers(1, 6, 700).astype(float)),
+    'rounded_revenue': (np.round(rng.lognormal(4, 1, 1_000), 0), np.round(rng.lognormal(4.05, 1, 1_200), 0)),
+    'unbalanced': (rng.exponential(50, 12), rng.exponential(60, 3_000)),
+    'shifted': (rng.normal(0, 1, 200) + 1, rng.normal(0, 1, 200)),
+    'small': (np.array([3.0, 1.0, 4.0, 1.0, 5.0]), np.array([9.0, 2.0, 6.0, 5.0, 3.0, 5.0, 8.0])),
+    'exact_boundary': (rng.normal(0, 1, EXACT_MAX_SIZE + 1), rng.normal(0.5, 1, 40)),
+    'all_equal': (np.full(30, 2.0), np.full(25, 2.0)),
+}
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_matches_scipy_mannwhitneyu(name):
+    x, y = SAMPLES[name]
+    expected = stats.mannwhitneyu(x, y, alternative='two-sided')
+    result = mann_whitney(x, y)
+    assert result.statistic == pytest.approx(expected.statistic)
+    assert result.pvalue == pytest.approx(min(expected.pvalue, 1.0), rel=1e-9, abs=1e-12)
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_samples_built_from_runs_match_observations(name):
+    x, y = SAMPLES[name]
+    x_runs = np.unique(x, return_counts=True)
+    y_runs = np.unique(y, return_counts=True)
+    from_runs = mann_whitney_samples(SortedSample.from_runs(*x_runs), SortedSample.from_runs(*y_runs))
+    assert from_runs == pytest.approx(tuple(mann_whitney(x, y)))
+
+
+def test_nan_propagates_like_scipy():
+    x = np.array([1.0, np.nan] + list(range(20)))
+    y = np.arange(30, dtype=float)
+    assert np.isnan(stats.mannwhitneyu(x, y, alternative='two-sided').pvalue)
+    assert np.isnan(mann_whitney(x, y).pvalue)
+
+
+def test_empty_sample():
+    with pytest.raises(ValueError):
+        mann_whitney(np.array([]), np.array([1.0, 2.0]))
+    assert mann_whitney_sorted(np.array([]), np.array([1.0, 2.0])) == 1.0
+
+
+def test_engine_caches_sorted_arms():
+    x, y = SAMPLES['rounded_revenue']
+    engine = RankEngine()
+    first = engine.mann_whitney(x, y, 'B', 'Control')
+    # Le contrôle trié est réutilisé, le résultat du couple est mis en cache
+    assert engine.sample(None, 'Control') is engine.sample(y, 'Control')
+    assert engine.mann_whitney(x, y, 'B', 'Control') is first
+    assert first == pytest.approx(tuple(mann_whitney(x, y)))
+
+
+def test_arm_pair_tests_each_column():
+    var = pd.DataFrame({'revenue': SAMPLES['continuous'][0][:300], 'quantity': SAMPLES['integer_ties'][0][:300]})
+    ctrl = pd.DataFrame({'revenue': SAMPLES['continuous'][1][:280], 'quantity': SAMPLES['integer_ties'][1][:280]})
+    pair = RankEngine().pair(var, ctrl, 'B', 'Control')
+    for column in ('revenue', 'quantity'):
+        expected = stats.mannwhitneyu(var[column], ctrl[column], alternative='two-sided')
+        assert pair.mann_whitney(column).pvalue == pytest.approx(expected.pvalue, rel=1e-9)
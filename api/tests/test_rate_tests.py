@@ -0,0 +1,74 @@
+# test_rate_tests.py
+
+import numpy as np
+import pytest
+import scipy.stats as stats
+
+from api.processors.rate_tests import CHI_SQUARE, FISHER_EXACT, RateTestEngine, chi_square_yates
+
+# (succès, total) variation puis contrôle
+TABLES = [
+    (0, 10, 3, 12),
+    (5, 40, 9, 38),
+    (120, 2_000, 150, 2_100),
+    (1_480, 25_000, 1_610, 25_300),
+    (30_000, 400_000, 30_950, 401_000),
+    (1, 60_000, 3, 59_000),
+    (7, 9, 2, 11),
+]
+
+
+def _reference(a, n1, c, n2, exact):
+    table = [[a, n1 - a], [c, n2 - c]]
+    if exact:
+        return stats.fisher_exact(table)[1]
+    return stats.chi2_contingency(table, correction=True)[1]
+
+
+@pytest.mark.parametrize('table', TABLES)
+def test_matches_scipy_reference(table):
+    engine = RateTestEngine()
+    p_value, method = engine.test_one(*table)
+    assert method in (FISHER_EXACT, CHI_SQUARE)
+    assert p_value == pytest.approx(_reference(*table, exact=method == FISHER_EXACT), rel=1e-9, abs=1e-300)
+
+
+def test_method_selection():
+    engine = RateTestEngine(exact_max_total=10_000)
+    _, methods = engine.test(*np.array(TABLES).T)
+    assert list(methods) == [
+        FISHER_EXACT, FISHER_EXACT, FISHER_EXACT, CHI_SQUARE, CHI_SQUARE,
+        # Cellule attendue < MIN_EXPECTED_COUNT : test exact malgré l'effectif
+        FISHER_EXACT,
+        FISHER_EXACT
+    ]
+
+
+def test_vectorized_equals_one_by_one():
+    engine = RateTestEngine(exact_max_total=100)
+    a, n1, c, n2 = np.array(TABLES).T
+    p_values, methods = engine.test(a, n1, c, n2)
+    for i, table in enumerate(TABLES):
+        p_value, method = engine.test_one(*table)
+        assert p_values[i] == p_value
+        assert methods[i] == method
+
+
+@pytest.mark.parametrize('table', TABLES)
+def test_chi_square_yates_matches_chi2_contingency(table):
+    a, n1, c, n2 = (float(x) for x in table)
+    p_value = chi_square_yates(np.array([a]), np.array([n1 - a]), np.array([c]), np.array([n2 - c]))[0]
+    assert p_value == pytest.approx(_reference(*table, exact=False), rel=1e-9)
+
+
+def test_degenerate_table_gives_p_one():
+    # chi2_contingency refuse une ligne ou colonne nulle ; le test rend p = 1
+    p_value = chi_square_yates(np.array([0.0]), np.array([100.0]), np.array([0.0]), np.array([90.0]))[0]
+    assert p_value == 1.0
+
+
+def test_negative_cell_raises_like_fisher_exact():
+    with pytest.raises(ValueError):
+        stats.fisher_exact([[12, -2], [3, 7]])
+    with pytest.raises(ValueError):
+        RateTestEngine().test_one(12, 10, 3, 10)
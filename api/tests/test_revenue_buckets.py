@@ -0,0 +1,123 @@
+# test_revenue_buckets.py
+
+import numpy as np
+import pytest
+
+from api.benchmarks.workload import make_frames
+from api.processors.data_processor import DataProcessor
+from api.processors.revenue_buckets import MAX_BINS, auto_edges, bucket_counts, explicit_edges, wilson_interval
+
+
+@pytest.fixture(scope='module')
+def processor():
+    return DataProcessor()
+
+
+@pytest.fixture(scope='module')
+def data():
+    overall, transaction = make_frames(transactions=800, users=4_000, seed=20)
+    return {'raw_data': {'overall': overall.to_dict('records'), 'transaction': transaction.to_dict('records')}}
+
+
+def _wilson_reference(k: int, n: int, z: float = 1.96):
+    # Formule fermée : (p + z²/2n ± z·sqrt(p(1-p)/n + z²/4n²)) / (1 + z²/n)
+    p = k / n
+    center = p + z * z / (2 * n)
+    half_width = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    return (center - half_width) / (1 + z * z / n), (center + half_width) / (1 + z * z / n)
+
+
+def test_bucket_counts_are_half_open():
+    values = np.sort(np.array([0.0, 10.0, 10.0, 15.0, 20.0, 30.0, -5.0, 99.0, np.nan]))
+    counts, below, above = bucket_counts(values, np.array([0.0, 10.0, 20.0, 30.0]))
+    # [0, 10[, [10, 20[, [20, 30] : une valeur sur une borne intérieure va dans la tranche supérieure
+    assert counts.tolist() == [1, 3, 2]
+    assert (below, above) == (1, 1)
+
+    counts, below, above = bucket_counts(values, np.array([-np.inf, 10.0, np.inf]))
+    assert counts.tolist() == [2, 6]
+    assert (below, above) == (0, 0)
+
+
+def test_explicit_edges():
+    np.testing.assert_array_equal(explicit_edges([None, 0, 50, None]), [-np.inf, 0.0, 50.0, np.inf])
+    for edges in ([10], [0, 50, 50], [0, None, 100], [100, 0]):
+        with pytest.raises(ValueError):
+            explicit_edges(edges)
+
+
+def test_auto_edges():
+    rng = np.random.default_rng(20)
+    values = np.round(rng.lognormal(3.5, 1, 5_000), 2)
+    for mode in ('quantile', 'log'):
+        edges = auto_edges(values, mode, 10)
+        assert edges[0] <= values.min() and edges[-1] >= values.max()
+        assert np.all(np.diff(edges) > 0)
+        assert len(edges) <= 11
+        np.testing.assert_array_equal(edges, np.round(edges, 2))
+
+    # Tranches quantiles : effectifs équilibrés
+    counts, below, above = bucket_counts(np.sort(values), auto_edges(values, 'quantile', 4))
+    assert (below, above) == (0, 0)
+    assert counts.sum() == len(values)
+    assert np.all(np.abs(counts - len(values) / 4) < len(values) * 0.01)
+
+    # Tranches log : rapport constant entre bornes intérieures
+    edges = auto_edges(values, 'log', 5)
+    ratios = edges[2:-1] / edges[1:-2]
+    np.testing.assert_allclose(ratios, ratios[0], rtol=0.01)
+
+    np.testing.assert_array_equal(auto_edges(np.array([12.5, 12.5]), 'quantile', 5), [12.5, 12.5])
+    np.testing.assert_array_equal(auto_edges(np.array([])), [0.0, 0.0])
+    with pytest.raises(ValueError):
+        auto_edges(values, 'linear')
+    with pytest.raises(ValueError):
+        auto_edges(values, 'quantile', MAX_BINS + 1)
+
+
+def test_wilson_interval_matches_closed_form():
+    successes = np.array([0, 1, 17, 250, 999, 1_000])
+    totals = np.array([40, 40, 120, 1_000, 1_000, 1_000])
+    lower, upper = wilson_interval(successes, totals)
+    for i, (k, n) in enumerate(zip(successes, totals)):
+        expected_lower, expected_upper = _wilson_reference(int(k), int(n))
+        assert lower[i] == pytest.approx(expected_lower, abs=1e-12)
+        assert upper[i] == pytest.approx(expected_upper, abs=1e-12)
+    assert lower[0] == pytest.approx(0.0, abs=1e-12) and upper[-1] == pytest.approx(1.0, abs=1e-12)
+
+    lower, upper = wilson_interval(np.array([0]), np.array([0]))
+    assert np.isnan(lower[0]) and np.isnan(upper[0])
+
+
+def test_distribution_matches_per_range_path(processor, data):
+    context = processor.build_analysis_context(data)
+    # Bornes au demi-centime : aucun revenu sur une borne, [min, max] et [min, max[ coïncident
+    edges = [0.005, 25.005, 60.005, 150.005, 10_000.005]
+    result = processor.calculate_revenue_distribution({**data, 'edges': edges})
+    assert result['success'], result.get('error')
+
+    ctrl = context.control_transactions
+    for variation, distribution in result['data'].items():
+        var = context.transactions(variation)
+        for bucket, low, high in zip(distribution['buckets'], edges[:-1], edges[1:]):
+            expected = processor.calculate_revenue_distribution_stats(var, ctrl, {'min': low, 'max': high})
+            assert bucket['details']['variation']['count'] == expected['details']['variation']['count']
+            assert bucket['details']['control']['count'] == expected['details']['control']['count']
+            assert bucket['details']['variation']['total'] == expected['details']['variation']['total']
+            assert bucket['value'] == pytest.approx(expected['value'])
+            assert bucket['control_value'] == pytest.approx(expected['control_value'])
+            assert bucket['uplift'] == pytest.approx(expected['uplift'])
+            assert bucket['confidence_interval'] == expected['confidence_interval']
+
+            # Confiance par tranche (test de taux) et non plus celle du MWU sur toute la distribution
+            k, n = bucket['details']['variation']['count'], bucket['details']['variation']['total']
+            p_values, methods = processor.rate_tests.test(
+                np.array([k]), n, np.array([bucket['details']['control']['count']]), len(ctrl)
+            )
+            assert bucket['confidence'] == round((1 - p_values[0]) * 100, 2)
+            assert bucket['test_method'] == methods[0]
+            lower, upper = _wilson_reference(k, n)
+            assert bucket['details']['variation']['wilson_interval'] == {
+                'lower': round(lower * 100, 2), 'upper': round(upper * 100, 2)
+            }
+        assert distribution['distribution_confidence'] == expected['confidence']
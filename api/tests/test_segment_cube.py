@@ -0,0 +1,93 @@
+# test_segment_cube.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.benchmarks.workload import make_frames
+from api.processors.data_processor import DataProcessor
+from api.processors.segment_cube import ALL_SEGMENTS, CUBE_METRICS, build_segment_cube
+
+
+@pytest.fixture
+def processor():
+    return DataProcessor()
+
+
+@pytest.fixture
+def data():
+    overall, transaction = make_frames(transactions=400, users=2_000, seed=3)
+    rng = np.random.default_rng(1)
+    multi = rng.random(len(transaction)) < 0.3
+    transaction.loc[multi, 'item_category2'] += '|Sofa Beds'
+    lower = rng.random(len(transaction)) < 0.2
+    transaction.loc[lower, 'item_category2'] = transaction.loc[lower, 'item_category2'].str.lower()
+    return {'raw_data': {'overall': overall.to_dict('records'), 'transaction': transaction.to_dict('records')}}
+
+
+def test_cells_match_filtered_revenue_metrics(processor, data):
+    cube = processor.calculate_segment_cube(data)
+    assert cube['success']
+
+    for device in ('mobile', ALL_SEGMENTS):
+        for category in ('Beds', 'Sofa Beds', ALL_SEGMENTS):
+            filters = {
+                'device_category': [] if device == ALL_SEGMENTS else [device],
+                'item_category2': [] if category == ALL_SEGMENTS else [category]
+            }
+            expected = processor.calculate_revenue_metrics({**data, 'filters': filters})
+            assert expected['success']
+            cells = cube['cube'][device][category]
+            for variation, metrics in expected['data'].items():
+                for metric in CUBE_METRICS:
+                    for field in ('value', 'control_value', 'confidence'):
+                        assert cells[variation][metric][field] == pytest.approx(metrics[metric][field])
+
+
+def test_multi_category_rows_count_in_each_category(processor):
+    transaction = pd.DataFrame({
+        'transaction_id': ['t1', 't1', 't2'],
+        'variation': ['A', 'A', 'A'],
+        'device_category': ['mobile'] * 3,
+        'item_category2': ['Beds|Sofas', 'Lighting', 'beds'],
+        'revenue': [10.0, 5.0, 7.0],
+        'quantity': [1, 1, 1]
+    })
+    cube = build_segment_cube(transaction, {'A': 100.0}, 'A')
+    beds = cube['cube']['mobile']['Beds']['A']
+    # Seuls les articles de la catégorie comptent dans le revenu de t1
+    assert beds['transactions'] == 2
+    assert beds['total_revenue']['value'] == 17.0
+    assert cube['cube']['mobile']['Lighting']['A']['total_revenue']['value'] == 5.0
+    assert cube['cube'][ALL_SEGMENTS][ALL_SEGMENTS]['A']['total_revenue']['value'] == 22.0
+
+
+def test_variation_missing_from_overall_is_skipped():
+    transaction = pd.DataFrame({
+        'transaction_id': ['t1', 't2', 't3'],
+        'variation': ['A', 'B', 'C'],
+        'device_category': ['mobile'] * 3,
+        'item_category2': ['Beds'] * 3,
+        'revenue': [10.0, 12.0, 9.0],
+        'quantity': [1, 2, 1]
+    })
+    cube = build_segment_cube(transaction, {'A': 100.0, 'B': 100.0}, 'A')
+    assert cube['variations'] == ['A', 'B']
+    assert set(cube['cube']['mobile']['Beds']) == {'A', 'B'}
+
+
+def test_invalid_rate_table_only_affects_its_segment():
+    # B : 3 transactions pour 2 utilisateurs sur la marge, 1 par catégorie
+    transaction = pd.DataFrame({
+        'transaction_id': ['a1', 'a2', 'b1', 'b2', 'b3'],
+        'variation': ['A', 'A', 'B', 'B', 'B'],
+        'device_category': ['mobile'] * 5,
+        'item_category2': ['Beds', 'Sofas', 'Beds', 'Sofas', 'Tables'],
+        'revenue': [10.0, 12.0, 9.0, 11.0, 8.0],
+        'quantity': [1] * 5
+    })
+    cube = build_segment_cube(transaction, {'A': 100.0, 'B': 2.0}, 'A')
+    overall_cell = cube['cube'][ALL_SEGMENTS][ALL_SEGMENTS]['B']['transaction_rate']
+    assert overall_cell['confidence'] == 0
+    assert overall_cell['test_method'] is None
+    assert cube['cube']['mobile']['Beds']['B']['transaction_rate']['test_method'] is not None
@@ -0,0 +1,72 @@
+# test_segment_index.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.processors.data_processor import DataProcessor
+from api.processors.segment_index import SegmentIndex
+
+
+def client_filter(row, devices, categories):
+    """Filtre de revenue-analysis.tsx (fetchRevenueData), transcrit ligne à ligne."""
+    if devices and row.get('device_category') not in devices:
+        return False
+    if not categories:
+        return True
+    value = row.get('item_category2')
+    tokens = [cat.strip() for cat in value.split('|') if cat.strip()] if isinstance(value, str) else []
+    return all(any(selected.lower() in cat.lower() for cat in tokens) for selected in categories)
+
+
+@pytest.fixture
+def processor():
+    return DataProcessor()
+
+
+def test_multi_category_rows_match_case_insensitively(processor):
+    rows = [{'item_category2': 'Beds|Sofas'}, {'item_category2': 'beds'}]
+    filtered = processor.apply_filters(rows, {'item_category2': ['Beds']})
+    assert len(filtered) == 2
+
+
+def test_selected_categories_are_all_required(processor):
+    rows = [
+        {'item_category2': 'Beds|Sofas'},
+        {'item_category2': 'Beds'},
+        {'item_category2': ' Sofa Beds | Lighting '},
+        {'item_category2': None}
+    ]
+    filtered = processor.apply_filters(rows, {'item_category2': ['beds', 'SOFA']})
+    assert filtered.index.tolist() == [0, 2]
+
+
+def test_index_stores_normalized_categories():
+    df = pd.DataFrame({'item_category2': ['Beds|Sofas', 'beds', None, ' Lighting |']})
+    assert SegmentIndex(df).values('item_category2') == ['beds', 'lighting', 'sofas']
+
+
+def test_matches_client_filter_on_random_rows(processor):
+    rng = np.random.default_rng(7)
+    labels = ['Beds', 'Sofas', 'Sofa Beds', 'pillows', 'Tables']
+    rows = []
+    for _ in range(500):
+        picked = rng.choice(labels, rng.integers(0, 4), replace=False)
+        rows.append({
+            'device_category': str(rng.choice(['mobile', 'desktop', 'tablet'])),
+            'item_category2': '|'.join(picked) if len(picked) else None
+        })
+    index = SegmentIndex(pd.DataFrame(rows))
+
+    for devices, categories in [
+        ([], ['Beds']),
+        ([], ['bed', 'sofa']),
+        (['mobile'], ['PILLOWS']),
+        (['mobile', 'tablet'], []),
+        (['desktop'], ['tables', 'Beds', 'sofas']),
+        ([], ['unknown'])
+    ]:
+        filters = {'device_category': devices, 'item_category2': categories}
+        filtered = processor.apply_filters(rows, filters, index)
+        expected = [i for i, row in enumerate(rows) if client_filter(row, devices, categories)]
+        assert filtered.index.tolist() == expected
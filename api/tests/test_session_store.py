@@ -0,0 +1,62 @@
+# test_session_store.py
+
+import numpy as np
+import pandas as pd
+
+from api.services.session_store import SessionStore, frame_bytes
+
+
+def _frame(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({'revenue': np.arange(rows, dtype=np.float64), 'quantity': np.ones(rows, dtype=np.int64)})
+
+
+def test_cached_virtual_table_counts_in_session_and_store():
+    store = SessionStore(max_bytes=10 ** 9)
+    session = store.create(_frame(10), _frame(1_000))
+    base = session.size_bytes
+
+    first = _frame(500)
+    assert store.cache_virtual_table(session, 'a', first)
+    assert session.size_bytes == base + frame_bytes(first)
+    assert store.stats()['size_bytes'] == session.size_bytes
+
+    # La nouvelle table remplace l'ancienne dans le décompte
+    second = _frame(200)
+    assert store.cache_virtual_table(session, 'b', second)
+    assert session.cached_virtual_table('a') is None
+    assert session.cached_virtual_table('b') is second
+    assert session.size_bytes == base + frame_bytes(second)
+    assert store.stats()['size_bytes'] == session.size_bytes
+
+
+def test_caching_evicts_least_recently_used_sessions():
+    transaction = _frame(1_000)
+    store = SessionStore(max_bytes=3 * frame_bytes(transaction))
+    old = store.create(_frame(1), transaction)
+    recent = store.create(_frame(1), transaction)
+
+    assert store.cache_virtual_table(recent, 'a', _frame(1_000))
+    assert store.get(old.session_id) is None
+    assert store.get(recent.session_id) is recent
+    assert store.stats()['size_bytes'] == recent.size_bytes
+    assert store.stats()['evicted'] == 1
+
+
+def test_table_over_budget_is_not_cached():
+    transaction = _frame(1_000)
+    store = SessionStore(max_bytes=2 * frame_bytes(transaction))
+    session = store.create(_frame(1), transaction)
+    size = session.size_bytes
+
+    assert not store.cache_virtual_table(session, 'a', _frame(5_000))
+    assert session.cached_virtual_table('a') is None
+    assert session.size_bytes == size
+    assert store.stats()['size_bytes'] == size
+
+
+def test_deleted_session_does_not_change_store_size():
+    store = SessionStore(max_bytes=10 ** 9)
+    session = store.create(_frame(1), _frame(100))
+    store.delete(session.session_id)
+    assert store.cache_virtual_table(session, 'a', _frame(100))
+    assert store.stats()['size_bytes'] == 0
@@ -0,0 +1,99 @@
+# test_shard_summary.py
+
+import json
+
+import numpy as np
+import pytest
+
+from api.benchmarks.workload import make_frames
+from api.processors.data_processor import DataProcessor
+from api.processors.shard_summary import QuantileSketch, ShardSummary
+
+QUANTILES = (0.0, 0.01, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0)
+
+
+@pytest.fixture(scope='module')
+def processor():
+    return DataProcessor()
+
+
+@pytest.fixture(scope='module')
+def shards(processor):
+    """Un export complet et sa partition en deux tranches (transactions et utilisateurs répartis)."""
+    overall, transaction = make_frames(transactions=600, users=3_000, seed=19)
+    ids = transaction['transaction_id'].unique()
+    first = transaction['transaction_id'].isin(set(ids[::2]))
+    overall_1 = overall.copy()
+    overall_1[['users', 'user_add_to_carts']] //= 2
+    overall_2 = overall.copy()
+    overall_2[['users', 'user_add_to_carts']] -= overall_1[['users', 'user_add_to_carts']]
+
+    def summary(o, t):
+        table = processor.create_analysis_table({'raw_data': {'overall': o.to_dict('records'), 'transaction': t.to_dict('records')}})
+        return ShardSummary.from_frames(o, table), table
+    whole, table = summary(overall, transaction)
+    return whole, table, [summary(overall_1, transaction[first])[0], summary(overall_2, transaction[~first])[0]]
+
+
+def _assert_within_accuracy(sketch: QuantileSketch, values: np.ndarray) -> None:
+    # Le sketch renvoie l'observation de rang floor(q * (n - 1)) à l'erreur relative près
+    for q in QUANTILES:
+        expected = np.quantile(values, q, method='lower')
+        assert abs(sketch.quantile(q) - expected) <= sketch.relative_accuracy * abs(expected) + 1e-9
+
+
+def test_merged_shards_match_whole_data(shards):
+    whole, table, parts = shards
+    merged = ShardSummary.merge_all(parts)
+    assert merged.control_variation == whole.control_variation == 'Control'
+    assert set(merged.variations) == set(whole.variations)
+    for variation, expected in whole.variations.items():
+        arm = merged.variations[variation]
+        assert arm.users == expected.users
+        assert arm.add_to_carts == expected.add_to_carts
+        assert arm.transactions == expected.transactions
+        for column in ('revenue', 'quantity'):
+            values = table.loc[table['variation'] == variation, column].to_numpy(dtype=np.float64)
+            moments = getattr(arm, column)
+            assert moments.count == len(values)
+            assert moments.total == pytest.approx(values.sum())
+            assert moments.mean == pytest.approx(values.mean())
+            assert moments.variance == pytest.approx(np.var(values, ddof=1))
+        # Fusionner les compteurs revient à construire le sketch sur toutes les données
+        assert arm.revenue_sketch.to_dict() == expected.revenue_sketch.to_dict()
+
+
+@pytest.mark.parametrize('relative_accuracy', [0.01, 0.05])
+def test_quantiles_within_relative_accuracy(relative_accuracy):
+    rng = np.random.default_rng(19)
+    first = rng.lognormal(3, 1.2, 2_000)
+    second = np.concatenate((rng.lognormal(5, 0.5, 700), np.zeros(50), -rng.exponential(10, 30)))
+
+    sketch = QuantileSketch(relative_accuracy).add(first)
+    _assert_within_accuracy(sketch, first)
+
+    merged = sketch.merge(QuantileSketch(relative_accuracy).add(second))
+    assert merged.count == len(first) + len(second)
+    _assert_within_accuracy(merged, np.concatenate((first, second)))
+
+
+def test_sketch_edge_cases():
+    assert QuantileSketch().quantile(0.5) is None
+    assert QuantileSketch().add(np.array([np.nan, 0.0])).quantile(0.5) == 0.0
+    with pytest.raises(ValueError):
+        QuantileSketch(0.01).add([1.0]).merge(QuantileSketch(0.02).add([1.0]))
+    with pytest.raises(ValueError):
+        QuantileSketch(1.5)
+
+
+def test_to_dict_from_dict_round_trip(shards):
+    _, _, parts = shards
+    merged = ShardSummary.merge_all(parts)
+    # Le résumé transite en JSON entre processus
+    restored = ShardSummary.from_dict(json.loads(json.dumps(merged.to_dict())))
+    assert restored.to_dict() == merged.to_dict()
+    for variation, arm in merged.variations.items():
+        assert restored.variations[variation].revenue_quantiles() == arm.revenue_quantiles()
+
+    with pytest.raises(ValueError):
+        ShardSummary.from_dict({**merged.to_dict(), 'format_version': 0})
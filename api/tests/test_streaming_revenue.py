@@ -0,0 +1,64 @@
+# test_streaming_revenue.py
+
+import pytest
+
+from api.benchmarks.workload import make_frames
+from api.processors.data_processor import DataProcessor
+
+METRICS = ('aov', 'arpu', 'total_revenue')
+
+
+@pytest.fixture
+def processor():
+    return DataProcessor()
+
+
+@pytest.fixture
+def frames():
+    return make_frames(transactions=800, users=5_000, seed=5)
+
+
+def _write(tmp_path, overall, transaction):
+    overall_path, transaction_path = tmp_path / 'overall.csv', tmp_path / 'transaction.csv'
+    overall.to_csv(overall_path, index=False)
+    transaction.to_csv(transaction_path, index=False)
+    return str(overall_path), str(transaction_path)
+
+
+@pytest.mark.parametrize('mode', ['hash', 'sorted'])
+def test_file_values_match_in_memory_metrics(processor, frames, tmp_path, mode):
+    overall, transaction = frames
+    shuffled = transaction if mode == 'sorted' else transaction.sample(frac=1, random_state=0)
+    paths = _write(tmp_path, overall, shuffled.assign(revenue=[f"€{v:,.2f}" for v in shuffled['revenue']]))
+
+    result = processor.calculate_streaming_revenue_file(*paths, 'overall.csv', 'transaction.csv', 'USD', mode, 250)
+    expected = processor.calculate_revenue_metrics({
+        'raw_data': {'overall': overall.to_dict('records'), 'transaction': transaction.to_dict('records')}
+    })
+
+    assert result['transactions'] == 800
+    assert result['input_records'] == len(transaction)
+    for metric in METRICS:
+        streamed = result['data']['B'][metric]
+        assert streamed['value'] == pytest.approx(expected['data']['B'][metric]['value'])
+        assert streamed['control_value'] == pytest.approx(expected['data']['B'][metric]['control_value'])
+        assert 0 <= streamed['confidence'] <= 100
+        assert streamed['confidence_interval']['lower'] <= streamed['confidence_interval']['upper']
+
+
+def test_zero_users_and_missing_arms_are_guarded(processor, frames):
+    overall, transaction = frames
+    states = processor.stream_bootstrap_states([processor.create_analysis_table({
+        'raw_data': {'overall': overall, 'transaction': transaction}
+    })])
+    result = processor.calculate_streaming_intervals(states, {'Control': 0.0}, 'Control')
+    assert list(result) == ['Control']
+    assert result['Control']['arpu']['value'] == 0
+    assert result['Control']['arpu']['confidence_interval'] == {'lower': 0, 'upper': 0}
+
+
+def test_control_without_transactions_is_rejected(processor, frames, tmp_path):
+    overall, transaction = frames
+    paths = _write(tmp_path, overall, transaction[transaction['variation'] != 'Control'])
+    with pytest.raises(ValueError):
+        processor.calculate_streaming_revenue_file(*paths, 'overall.csv', 'transaction.csv', 'USD')
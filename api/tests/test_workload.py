@@ -0,0 +1,15 @@
+# test_workload.py
+
+import pytest
+
+from api.benchmarks.workload import make_frames
+
+
+@pytest.mark.parametrize('items_per_order, products', [(2.0, 200), (4.0, 200), (5.0, 3)])
+def test_orders_contain_distinct_products(items_per_order, products):
+    _, transaction = make_frames(transactions=2_000, users=10_000, items_per_order=items_per_order, products=products, seed=24)
+    assert not transaction.duplicated(['transaction_id', 'item_name']).any()
+    lines = transaction.groupby('transaction_id').size()
+    assert lines.max() <= products
+    if products > 10 * items_per_order:
+        assert lines.mean() == pytest.approx(items_per_order, rel=0.05)
@@ -429,6 +429,51 @@ const groupTransactionsByID = (transactions: any[]) => {
   }, {});
 };
 
+// Taille des pages de la table virtuelle (maximum accepté par l'API)
+const VIRTUAL_TABLE_PAGE_ROWS = 10000;
+
+interface RevenueFilters {
+  device_category: string[];
+  item_category2: string[];
+}
+
+// Filtres du serveur ("all" : aucune restriction sur la dimension)
+const toRevenueFilters = (deviceFilter: string, categoryFilter: string[]): RevenueFilters => ({
+  device_category: deviceFilter === "all" ? [] : [deviceFilter],
+  item_category2: categoryFilter.includes("all") ? [] : categoryFilter,
+});
+
+// Table virtuelle de la session, page par page (curseur), filtrée côté serveur.
+// Renvoie null si la session a expiré ou n'existe plus.
+const fetchSessionVirtualTable = async (
+  apiUrl: string | undefined,
+  sessionId: string,
+  filters: RevenueFilters
+): Promise<any[] | null> => {
+  const rows: any[] = [];
+  let cursor: string | null = null;
+
+  do {
+    const params = new URLSearchParams({ limit: String(VIRTUAL_TABLE_PAGE_ROWS) });
+    filters.device_category.forEach((device) => params.append("device_category", device));
+    filters.item_category2.forEach((cat) => params.append("item_category2", cat));
+    if (cursor) params.set("cursor", cursor);
+
+    const response = await fetch(`${apiUrl}/sessions/${sessionId}/virtual-table?${params}`);
+    if (response.status === 404) return null;
+    if (!response.ok) {
+      const errorData = await response.json();
+      throw new Error(errorData.detail || "Failed to fetch virtual table");
+    }
+
+    const page = await response.json();
+    rows.push(...page.data);
+    cursor = page.next_cursor;
+  } while (cursor);
+
+  return rows;
+};
+
 interface Transaction {
   transaction_id: string;
   variation: string;
@@ -543,53 +588,81 @@ export function RevenueAnalysis({ data, isLoading = false }: RevenueAnalysisProp
       setIsCalculating(true);
       setError(null);
 
-      // Filtrer les transactions
-      const filteredTransactions =
-        data?.analysisData?.raw_data?.transaction.filter((t: any) => {
-          const matchesDevice = deviceFilter === "all" || t.device_category === deviceFilter;
+      const apiUrl = process.env.NEXT_PUBLIC_API_URL;
+      const sessionId: string | undefined = data?.analysisData?.session_id;
+
+      const postRevenue = async (body: Record<string, any>) => {
+        const response = await fetch(`${apiUrl}/calculate-revenue`, {  // Utilisation des backticks pour interpoler la variable
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify(body),
+        });
+
+        if (!response.ok) {
+          const errorData = await response.json();
+          throw new Error(errorData.detail || "Failed to fetch revenue data");
+        }
+        return response.json();
+      };
+
+      const showNoTransactions = () => {
+        setError("No transactions found with the selected filters");
+        setRevenueData(null);
+        setAggregatedTransactions([]);
+      };
 
-          if (categoryFilter.includes("all")) {
-            return matchesDevice;
+      let result: any = null;
+
+      // Avec une session, les données sont déjà sur le serveur : seuls les filtres
+      // sont envoyés, et la table virtuelle est lue par pages avec les mêmes filtres
+      if (sessionId) {
+        const filters = toRevenueFilters(deviceFilter, categoryFilter);
+        const virtualTable = await fetchSessionVirtualTable(apiUrl, sessionId, filters);
+        if (virtualTable) {
+          if (virtualTable.length === 0) {
+            showNoTransactions();
+            return;
           }
+          result = { ...(await postRevenue({ session_id: sessionId, filters })), virtual_table: virtualTable };
+        }
+      }
 
-          const transactionCategories = t.item_category2?.split("|")
-            .map((cat: string) => cat.trim())
-            .filter(Boolean) || [];
+      // Sans session (ou session expirée) : transactions filtrées dans le navigateur
+      if (!result) {
+        const filteredTransactions =
+          data?.analysisData?.raw_data?.transaction.filter((t: any) => {
+            const matchesDevice = deviceFilter === "all" || t.device_category === deviceFilter;
 
-          const allSelectedCategoriesPresent = categoryFilter.every((selectedCat) =>
-            transactionCategories.some((cat) => cat.toLowerCase().includes(selectedCat.toLowerCase()))
-          );
+            if (categoryFilter.includes("all")) {
+              return matchesDevice;
+            }
 
-          return matchesDevice && allSelectedCategoriesPresent;
-        }) || [];
+            const transactionCategories = t.item_category2?.split("|")
+              .map((cat: string) => cat.trim())
+              .filter(Boolean) || [];
 
-      // Vérifier s'il y a des transactions après filtrage
-      if (filteredTransactions.length === 0) {
-        setError("No transactions found with the selected filters");
-        setRevenueData(null);
-        setAggregatedTransactions([]);
-        return;
-      }
+            const allSelectedCategoriesPresent = categoryFilter.every((selectedCat) =>
+              transactionCategories.some((cat) => cat.toLowerCase().includes(selectedCat.toLowerCase()))
+            );
 
-      const requestData = {
-        raw_data: {
-          transaction: filteredTransactions,
-          overall: data?.analysisData?.raw_data?.overall,
-        },
-      };
-      const apiUrl = process.env.NEXT_PUBLIC_API_URL;
-      const response = await fetch(`${apiUrl}/calculate-revenue`, {  // Utilisation des backticks pour interpoler la variable
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(requestData),
-      });
-      
-      if (!response.ok) {
-        const errorData = await response.json();
-        throw new Error(errorData.detail || "Failed to fetch revenue data");
+            return matchesDevice && allSelectedCategoriesPresent;
+          }) || [];
+
+        // Vérifier s'il y a des transactions après filtrage
+        if (filteredTransactions.length === 0) {
+          showNoTransactions();
+          return;
+        }
+
+        result = await postRevenue({
+          raw_data: {
+            transaction: filteredTransactions,
+            overall: data?.analysisData?.raw_data?.overall,
+          },
+          include_virtual_table: true,
+        });
       }
 
-      const result = await response.json();
       setRevenueData(result);
       setAggregatedTransactions(result.virtual_table || []);
     } catch (error) {